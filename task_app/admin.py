@@ -30,6 +30,7 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ("name", "id",  "owner", "created_at")
     search_fields = ("name", "owner__username", "owner__email")
     list_filter = ("created_at",)
+    readonly_fields = Project.COUNTER_FIELDS
 
 
 @admin.register(ProjectMember)
@@ -51,3 +52,31 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ("task", "id", "user", "created_at")
     search_fields = ("task__title", "user__username", "content")
     list_filter = ("created_at",)
+
+
+@admin.register(ProjectStats)
+class ProjectStatsAdmin(admin.ModelAdmin):
+    list_display = ("project", "dimension", "key", "count")
+    list_filter = ("dimension",)
+    search_fields = ("project__name",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "id", "status", "attempts", "run_at", "locked_by")
+    list_filter = ("status", "name")
+    search_fields = ("name", "key", "last_error")
+
+
+@admin.register(Deletion)
+class DeletionAdmin(admin.ModelAdmin):
+    list_display = ("kind", "object_id", "id", "status", "requested_by", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+
+
+@admin.register(InboxItem)
+class InboxItemAdmin(admin.ModelAdmin):
+    list_display = ("user", "id", "kind", "task", "comment", "created_at")
+    list_filter = ("kind",)
+    search_fields = ("user__username", "user__email", "task__title")
+    raw_id_fields = ("user", "project", "task", "comment")
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _restore_search_index(sender, using, **kwargs):
+    # SQLite loses the FTS triggers whenever a migration rebuilds task_app_task.
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import install_search_index
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ("task_app", "0004_task_full_text_search") in applied:
+        install_search_index(connection)
 
 
 class TaskAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'task_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import deletion, notifications  # noqa: F401  (register job handlers)
+        from . import db_routers, hashers  # noqa: F401  (system checks)
+        from . import metrics  # noqa: F401  (query timing on new connections)
+        post_migrate.connect(_restore_search_index, sender=self)
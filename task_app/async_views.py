@@ -0,0 +1,284 @@
+import asyncio
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import ClaimsJWTAuthentication
+from .feed import stream_events
+from .membership import aget_project_roles
+from .metrics import count_queries, measure_render
+from .query_budget import check_query_budget
+from .renderers import FastJSONRenderer
+from .models import Project
+from .views import CommentViewSet, ProjectViewSet, TaskViewSet
+
+
+class AsyncReadView(View):
+    """
+    Native async GET endpoint that answers exactly like `viewset_class`'s
+    `action` ("list" or "retrieve").
+
+    The viewset still builds the queryset, filters, paginator and
+    serializer; those are lazy or pure Python, so only evaluation moves to
+    the async ORM.  Authentication (ClaimsJWTAuthentication.aauthenticate),
+    role lookups and queries never block a worker thread, so one ASGI
+    worker can hold many slow clients.  List responses are not served from
+    the response cache here.
+    """
+    viewset_class = None
+    action = "list"
+    renderer = FastJSONRenderer()
+    authenticator = ClaimsJWTAuthentication()
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request, authenticators=())
+        drf_request.accepted_renderer = self.renderer
+        drf_request.accepted_media_type = self.renderer.media_type
+        view = self.get_viewset(drf_request, args, kwargs)
+        with count_queries() as counter:
+            try:
+                await self.aauthenticate(drf_request)
+                await self.acheck_permissions(view, drf_request)
+                await self.acheck_throttles(view, drf_request)
+                # get_queryset() scopes rows with the role map; load it without blocking
+                if not drf_request.user.is_superuser:
+                    await aget_project_roles(drf_request)
+                if self.action == "retrieve":
+                    data = await self.aretrieve(view, drf_request)
+                else:
+                    data = await self.alist(view, drf_request)
+            except Exception as exc:
+                return self.handle_exception(exc, view, drf_request)
+        # The viewset's query_budget covers its async mirror too
+        check_query_budget(view, counter.count)
+        response = self.render(data)
+        etag = view.get_etag() if hasattr(view, "get_etag") else None
+        if etag is not None:
+            response["ETag"] = etag
+        return response
+
+    def get_viewset(self, request, args, kwargs):
+        view = self.viewset_class(request=request, args=args, kwargs=kwargs, format_kwarg=None)
+        view.action = self.action
+        view.headers = {}
+        return view
+
+    async def aauthenticate(self, request):
+        result = await self.authenticator.aauthenticate(request._request)
+        if result is None:
+            request.user, request.auth = AnonymousUser(), None
+        else:
+            request.user, request.auth = result
+
+    async def acheck_permissions(self, view, request):
+        for permission in view.get_permissions():
+            check = getattr(permission, "ahas_permission", None)
+            allowed = await check(request, view) if check else permission.has_permission(request, view)
+            if not allowed:
+                self.permission_denied(request, permission)
+
+    async def acheck_throttles(self, view, request):
+        waits = []
+        for throttle in view.get_throttles():
+            check = getattr(throttle, "aallow_request", None)
+            allowed = await check(request, view) if check else throttle.allow_request(request, view)
+            if not allowed:
+                waits.append(throttle.wait())
+        if waits:
+            waits = [wait for wait in waits if wait is not None]
+            raise exceptions.Throttled(max(waits, default=None))
+
+    async def acheck_object_permissions(self, view, request, obj):
+        for permission in view.get_permissions():
+            check = getattr(permission, "ahas_object_permission", None)
+            if check:
+                allowed = await check(request, view, obj)
+            else:
+                allowed = permission.has_object_permission(request, view, obj)
+            if not allowed:
+                self.permission_denied(request, permission)
+
+    def permission_denied(self, request, permission):
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        raise exceptions.PermissionDenied(
+            detail=getattr(permission, "message", None),
+            code=getattr(permission, "code", None),
+        )
+
+    async def alist(self, view, request):
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        fast = view.get_fast_serializer() if hasattr(view, "get_fast_serializer") else None
+        if fast is not None:
+            queryset = queryset.values(*view.get_fast_columns(fast, queryset))
+            serialize = fast.serialize
+        else:
+            serialize = lambda rows: view.get_serializer(rows, many=True).data  # noqa: E731
+        if paginator is None:
+            return serialize([obj async for obj in queryset])
+        page = await paginator.apaginate_queryset(queryset, request, view=view)
+        return paginator.get_paginated_response(serialize(page)).data
+
+    async def aretrieve(self, view, request):
+        queryset = view.filter_queryset(view.get_queryset())
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except ObjectDoesNotExist:
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        await self.acheck_object_permissions(view, request, obj)
+        view.versioned_object = obj
+        return view.get_serializer(obj).data
+
+    def handle_exception(self, exc, view, request):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = self.authenticator.authenticate_header(request)
+        response = exception_handler(exc, {"view": view, "request": request})
+        if response is None:
+            raise exc
+        rendered = self.render(response.data, response.status_code)
+        for header, value in response.headers.items():
+            if header.lower() != "content-type":
+                rendered[header] = value
+        return rendered
+
+    def render(self, data, status=200):
+        with measure_render():
+            content = self.renderer.render(data, self.renderer.media_type)
+        return HttpResponse(content, status=status, content_type=self.renderer.media_type)
+
+
+# /api/async/... mirrors of the read routes in urls.py
+task_list = AsyncReadView.as_view(viewset_class=TaskViewSet, action="list")
+task_detail = AsyncReadView.as_view(viewset_class=TaskViewSet, action="retrieve")
+comment_list = AsyncReadView.as_view(viewset_class=CommentViewSet, action="list")
+project_list = AsyncReadView.as_view(viewset_class=ProjectViewSet, action="list")
+
+
+class ProjectFeedView(AsyncReadView):
+    """
+    Live change feed of one project (task_app/feed.py) as Server-Sent Events.
+
+    Each event carries its per-project sequence number as the SSE id, so a
+    reconnecting EventSource resumes through Last-Event-ID (or ?since=<seq>)
+    without re-fetching.  "reset" means the position is no longer
+    available: re-fetch, then continue from the reset's id.  EventSource
+    cannot send headers, so ?token=<access token> is accepted too.  Needs
+    an ASGI server; the same path also speaks WebSocket (feed_websocket).
+    """
+    keepalive = 15
+
+    async def get(self, request, project_pk):
+        drf_request = Request(request, authenticators=())
+        drf_request.accepted_renderer = self.renderer
+        drf_request.accepted_media_type = self.renderer.media_type
+        try:
+            since = await self.authorize(drf_request, project_pk)
+        except Exception as exc:
+            return self.handle_exception(exc, self, drf_request)
+        response = StreamingHttpResponse(self.stream(project_pk, since), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def authorize(self, request, project_pk):
+        """Authenticate, check project access and return the resume position."""
+        meta = request._request.META
+        if "HTTP_AUTHORIZATION" not in meta and request.query_params.get("token"):
+            meta["HTTP_AUTHORIZATION"] = f"Bearer {request.query_params['token']}"
+        await self.aauthenticate(request)
+        if not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        if not await Project.objects.filter(pk=project_pk, deleted_at__isnull=True).aexists():
+            raise exceptions.NotFound("Project not found.")
+        if not request.user.is_superuser and project_pk not in await aget_project_roles(request):
+            raise exceptions.PermissionDenied("You are not a member of this project.")
+        since = meta.get("HTTP_LAST_EVENT_ID") or request.query_params.get("since")
+        if since is None:
+            return None
+        try:
+            return int(since)
+        except ValueError:
+            raise exceptions.ValidationError({"since": "Must be a sequence number."})
+
+    async def stream(self, project_pk, since):
+        yield "retry: 3000\n\n"
+        async for kind, payload in stream_events(project_pk, since, self.keepalive):
+            if kind == "keepalive":
+                yield ": keepalive\n\n"
+            else:
+                seq = payload["seq"]
+                yield f"id: {seq}\nevent: {kind}\ndata: {encode_event(payload)}\n\n"
+
+
+def encode_event(payload):
+    return json.dumps(payload, separators=(",", ":"))
+
+
+async def feed_websocket(scope, receive, send):
+    """
+    ASGI WebSocket endpoint on the ProjectFeedView path.
+
+    Auth and resume work as for SSE (?token=, ?since=); events are sent as
+    JSON text frames {"event": "change"|"reset", ...payload}.  Refusals
+    close with 4000 + the HTTP status (4401, 4403, 4404, 4400).
+    """
+    await receive()  # websocket.connect
+    try:
+        match = resolve(scope["path"])
+    except Resolver404:
+        match = None
+    if match is None or getattr(match.func, "view_class", None) is not ProjectFeedView:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    view = ProjectFeedView()
+    request = Request(ASGIRequest({**scope, "method": "GET"}, io.BytesIO()), authenticators=())
+    project_pk = match.kwargs["project_pk"]
+    try:
+        since = await view.authorize(request, project_pk)
+    except exceptions.APIException as exc:
+        await send({"type": "websocket.close", "code": 4000 + exc.status_code})
+        return
+    finally:
+        # No request_finished here: release the connection the checks used
+        await sync_to_async(close_old_connections)()
+    await send({"type": "websocket.accept"})
+
+    events = stream_events(project_pk, since, view.keepalive)
+    incoming = asyncio.ensure_future(receive())
+    outgoing = asyncio.ensure_future(anext(events))
+    try:
+        while True:
+            await asyncio.wait({incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED)
+            if incoming.done():
+                if incoming.result()["type"] == "websocket.disconnect":
+                    return
+                incoming = asyncio.ensure_future(receive())  # client frames are ignored
+            if outgoing.done():
+                kind, payload = outgoing.result()
+                outgoing = asyncio.ensure_future(anext(events))
+                if kind != "keepalive":
+                    await send({"type": "websocket.send", "text": encode_event({"event": kind, **payload})})
+    finally:
+        incoming.cancel()
+        outgoing.cancel()
+        await asyncio.gather(incoming, outgoing, return_exceptions=True)
+        await events.aclose()
+
+
+project_feed = ProjectFeedView.as_view()
@@ -0,0 +1,133 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Claims CustomTokenObtainPairSerializer embeds, mapped onto User fields
+CLAIM_FIELDS = ("username", "email", "is_superuser", "is_staff")
+STAMP_CLAIM = "mv"
+
+
+def _config():
+    return getattr(settings, "JWT_FAST_PATH", {})
+
+
+def _cache():
+    return caches[_config().get("CACHE_ALIAS", "default")]
+
+
+def _stamp_timeout():
+    # Never cache stamps forever: per-process caches miss other workers' refreshes
+    return _config().get("STAMP_TIMEOUT") or 60
+
+
+def _stamp_key(user_id):
+    return f"auth:stamp:{user_id}"
+
+
+def user_stamp(user):
+    """Digest of everything the fast path trusts from the token, plus is_active."""
+    raw = "|".join(str(getattr(user, field)) for field in CLAIM_FIELDS + ("is_active",))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def remember_stamp(user):
+    stamp = user_stamp(user)
+    _cache().set(_stamp_key(user.pk), stamp, _stamp_timeout())
+    return stamp
+
+
+def forget_stamp(user_id):
+    _cache().delete(_stamp_key(user_id))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from the token's claims.
+
+    The token carries a stamp of the user's claim fields (see user_stamp);
+    while the cached stamp for that user still matches, no user row is
+    fetched.  A User save/delete refreshes or drops the cached stamp, and a
+    token whose stamp no longer matches (or predates this scheme) falls back
+    to the regular database lookup.  Stamps expire after STAMP_TIMEOUT
+    seconds, so a worker that missed the change re-reads the user by then.
+
+    The claims user is a real User instance whose other fields are deferred,
+    so FK assignment and `obj == request.user` work, and touching e.g.
+    `request.user.date_joined` loads the row on demand.
+    """
+
+    def get_user(self, validated_token):
+        stamp = validated_token.get(STAMP_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if stamp is None or user_id is None or any(c not in validated_token for c in CLAIM_FIELDS):
+            return super().get_user(validated_token)
+
+        current = _cache().get(_stamp_key(user_id))
+        if current is None:
+            # Cache lost the stamp: this lookup puts it back for later requests
+            user = super().get_user(validated_token)
+            remember_stamp(user)
+            return user
+
+        if current != stamp:
+            return super().get_user(validated_token)
+        return self.get_claims_user(validated_token)
+
+    # ----- async variant, used by task_app/async_views.py -----
+    async def aauthenticate(self, request):
+        """authenticate() for async views; takes a plain HttpRequest."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        stamp = validated_token.get(STAMP_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if stamp is None or user_id is None or any(c not in validated_token for c in CLAIM_FIELDS):
+            return await self.aget_db_user(validated_token)
+
+        current = await _cache().aget(_stamp_key(user_id))
+        if current is None:
+            user = await self.aget_db_user(validated_token)
+            await _cache().aset(_stamp_key(user.pk), user_stamp(user), _stamp_timeout())
+            return user
+
+        if current != stamp:
+            return await self.aget_db_user(validated_token)
+        return self.get_claims_user(validated_token)
+
+    async def aget_db_user(self, validated_token):
+        # Mirrors JWTAuthentication.get_user() with the async ORM
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def get_claims_user(self, validated_token):
+        known = {claim: validated_token[claim] for claim in CLAIM_FIELDS}
+        known[api_settings.USER_ID_FIELD] = validated_token[api_settings.USER_ID_CLAIM]
+        known["is_active"] = True
+        # from_db expects values in concrete field order
+        fields = [f for f in self.user_model._meta.concrete_fields if f.attname in known]
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, [f.attname for f in fields], [known[f.attname] for f in fields]
+        )
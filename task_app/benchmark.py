@@ -0,0 +1,698 @@
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from itertools import count
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import URLResolver, get_resolver, resolve
+
+from .metrics import count_queries
+from .models import *
+from .seeding import seed
+from .serializers import CustomTokenObtainPairSerializer
+from .signals import tasks_bulk_changed
+from .sync import stamp_tasks
+
+
+# Load test for the REST API: `manage.py benchmark_api` seeds a synthetic
+# data set, sends every scenario below through the in-process test client
+# (sync views) or ASGI client (async views) and reports latency
+# percentiles, queries and allocations per request as JSON, so runs on two
+# commits can be compared with --compare.  Register a scenario for every
+# new route; routes without one are listed as "uncovered" in the report.
+SCENARIOS = {}
+
+SCALES = {
+    "small": {"users": 20, "projects": 5, "members_per_project": 5, "tasks_per_project": 200, "comments_per_task": 2},
+    "medium": {"users": 200, "projects": 20, "members_per_project": 10, "tasks_per_project": 1000, "comments_per_task": 3},
+    "large": {"users": 1000, "projects": 50, "members_per_project": 20, "tasks_per_project": 4000, "comments_per_task": 5},
+}
+
+BULK_SIZE = 50
+
+
+class Scenario:
+    def __init__(self, name, method, build, as_user="member", expect=200, client="sync", stream=False):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.as_user = as_user
+        self.expect = expect
+        self.client = client
+        self.stream = stream
+
+
+def scenario(name, method="GET", as_user="member", expect=200, client="sync", stream=False):
+    """
+    Register a request.  The function receives the BenchmarkData and
+    returns the path, or (path, JSON body); it runs before every request,
+    untimed, so it may create the rows the request consumes.
+    `as_user` is "member" (owner of the main project), "admin" (a
+    superuser) or "anon".
+    """
+    def register(func):
+        SCENARIOS[name] = Scenario(name, method, func, as_user, expect, client, stream)
+        return func
+    return register
+
+
+class BenchmarkData:
+    """The seeded data set plus the ids and helpers scenarios build requests from."""
+    password = "bench-password-1"
+
+    def __init__(self, rng_seed=0, **scale):
+        created = seed(prefix="bench", rng=random.Random(rng_seed), **scale)
+        self.unique = count(1).__next__
+        self.comments_per_task = scale.get("comments_per_task", 0)
+        self.unusable = make_password(None)
+        self.project = created["projects"][0]
+        self.member = self.project.owner
+        self.admin = User.objects.create_superuser("bench-admin@example.com", "bench-admin", self.password)
+        self.login_user = User.objects.create_user("bench-login@example.com", "bench-login", self.password)
+        self.task = Task.objects.filter(project=self.project).order_by("id").first()
+        self.comment = Comment.objects.filter(task=self.task).order_by("id").first() or self.new_comment()
+        self.membership = ProjectMember.objects.create(project=self.project, user=self.new_user(), role=ProjectMember.MEMBER)
+        # Whatever the seed drew, so scenarios on this task cost the same at every size
+        self.task.assigned_to_id, self.task.status, self.task.priority = self.membership.user_id, Task.TODO, Task.MEDIUM
+        self.task.save()
+        self.bulk_ids = list(
+            Task.objects.filter(project=self.project).order_by("id").values_list("id", flat=True)[:BULK_SIZE]
+        )
+        self.deletion = Deletion.objects.create(
+            kind=Deletion.PROJECT, object_id=0, requested_by=self.member, status=Deletion.DONE
+        )
+        self.tokens = {
+            "member": CustomTokenObtainPairSerializer.get_token(self.member),
+            "admin": CustomTokenObtainPairSerializer.get_token(self.admin),
+        }
+
+    def headers(self, as_user):
+        if as_user == "anon":
+            return {}
+        return {"Authorization": f"Bearer {self.tokens[as_user].access_token}"}
+
+    def new_user(self):
+        n = self.unique()
+        return User.objects.create(email=f"bench-user{n}@example.com", username=f"bench-user{n}", password=self.unusable)
+
+    def new_project(self):
+        return Project.objects.create(name=f"bench project {self.unique()}", owner=self.member)
+
+    def new_task(self):
+        return Task.objects.create(project=self.project, title=f"bench task {self.unique()}")
+
+    def new_tasks(self, n):
+        # As /tasks/bulk/ writes them, so the counters and sync versions stay right
+        tasks = [Task(project=self.project, title=f"bench task {self.unique()}") for _ in range(n)]
+        stamp_tasks(tasks)
+        tasks = Task.objects.bulk_create(tasks)
+        tasks_bulk_changed.send(sender=Task, action="create", tasks=tasks)
+        return tasks
+
+    def new_comment(self, task=None):
+        return Comment.objects.create(task=task or self.task, user=self.member, content=f"bench comment {self.unique()}")
+
+    def new_task_with_comments(self):
+        # Deleting a task cascades to its comments, as many as the seeded tasks have
+        task = self.new_task()
+        for _ in range(self.comments_per_task):
+            self.new_comment(task)
+        return task
+
+    def task_assignee(self):
+        return Task.objects.filter(pk=self.task.pk).values_list("assigned_to_id", flat=True).get()
+
+    def bulk_priority(self):
+        # One the bulk tasks do not all have already, so every request changes rows and counters
+        current = set(Task.objects.filter(pk__in=self.bulk_ids).values_list("priority", flat=True))
+        return next(priority for priority, _ in Task.PRIORITY_CHOICES if {priority} != current)
+
+    def task_body(self, **fields):
+        return {"project": self.project.pk, "title": f"bench task {self.unique()}", "description": "",
+                "status": Task.TODO, "priority": Task.MEDIUM, "assigned_to": self.member.pk, **fields}
+
+
+# ----- scenarios: one per route and method in task_app/urls.py -----
+@scenario("auth.register", "POST", as_user="anon", expect=201)
+def _register(data):
+    n = data.unique()
+    return "/api/users/register/", {"username": f"bench-new{n}", "email": f"bench-new{n}@example.com",
+                                    "password": data.password}
+
+
+@scenario("auth.login", "POST", as_user="anon")
+def _login(data):
+    return "/api/users/login/", {"email": data.login_user.email, "password": data.password}
+
+
+@scenario("auth.refresh", "POST", as_user="anon")
+def _refresh(data):
+    return "/api/token/refresh/", {"refresh": str(data.tokens["member"])}
+
+
+@scenario("api.root")
+def _root(data):
+    return "/api/"
+
+
+@scenario("users.list", expect=403)
+def _users_list(data):
+    return "/api/users/"
+
+
+@scenario("users.create", "POST", expect=201)
+def _users_create(data):
+    n = data.unique()
+    return "/api/users/", {"username": f"bench-new{n}", "email": f"bench-new{n}@example.com"}
+
+
+@scenario("users.retrieve")
+def _users_retrieve(data):
+    return f"/api/users/{data.member.pk}/"
+
+
+@scenario("users.update", "PUT")
+def _users_update(data):
+    user = data.member
+    return f"/api/users/{user.pk}/", {"username": user.username, "email": user.email,
+                                      "first_name": user.first_name, "last_name": user.last_name}
+
+
+@scenario("users.partial_update", "PATCH")
+def _users_partial_update(data):
+    return f"/api/users/{data.member.pk}/", {"last_name": data.member.last_name}
+
+
+@scenario("users.destroy", "DELETE", as_user="admin", expect=202)
+def _users_destroy(data):
+    return f"/api/users/{data.new_user().pk}/"
+
+
+@scenario("inbox.list")
+def _inbox_list(data):
+    return "/api/me/inbox/"
+
+
+@scenario("projects.list")
+def _projects_list(data):
+    return "/api/projects/"
+
+
+@scenario("projects.create", "POST", expect=201)
+def _projects_create(data):
+    return "/api/projects/", {"name": f"bench project {data.unique()}", "description": ""}
+
+
+@scenario("projects.retrieve")
+def _projects_retrieve(data):
+    return f"/api/projects/{data.project.pk}/"
+
+
+@scenario("projects.update", "PUT")
+def _projects_update(data):
+    return f"/api/projects/{data.project.pk}/", {"name": data.project.name, "description": "updated"}
+
+
+@scenario("projects.partial_update", "PATCH")
+def _projects_partial_update(data):
+    return f"/api/projects/{data.project.pk}/", {"description": "patched"}
+
+
+@scenario("projects.destroy", "DELETE", expect=202)
+def _projects_destroy(data):
+    return f"/api/projects/{data.new_project().pk}/"
+
+
+@scenario("projects.stats")
+def _projects_stats(data):
+    return f"/api/projects/{data.project.pk}/stats/"
+
+
+@scenario("projects.sync")
+def _projects_sync(data):
+    return f"/api/projects/{data.project.pk}/sync/"
+
+
+@scenario("projects.export", stream=True)
+def _projects_export(data):
+    return f"/api/projects/{data.project.pk}/export/"
+
+
+@scenario("project_members.list")
+def _members_list(data):
+    return "/api/project_members/"
+
+
+@scenario("project_members.create", "POST", as_user="admin", expect=201)
+def _members_create(data):
+    return "/api/project_members/", {"project": data.project.pk, "user": data.new_user().pk, "role": "member"}
+
+
+@scenario("project_members.retrieve")
+def _members_retrieve(data):
+    return f"/api/project_members/{data.membership.pk}/"
+
+
+@scenario("project_members.update", "PUT", as_user="admin")
+def _members_update(data):
+    membership = data.membership
+    return f"/api/project_members/{membership.pk}/", {"project": membership.project_id, "user": membership.user_id,
+                                                      "role": "member"}
+
+
+@scenario("project_members.partial_update", "PATCH", as_user="admin")
+def _members_partial_update(data):
+    return f"/api/project_members/{data.membership.pk}/", {"role": "member"}
+
+
+@scenario("project_members.destroy", "DELETE", as_user="admin", expect=204)
+def _members_destroy(data):
+    membership = ProjectMember.objects.create(project=data.project, user=data.new_user(), role=ProjectMember.MEMBER)
+    return f"/api/project_members/{membership.pk}/"
+
+
+@scenario("tasks.list")
+def _tasks_list(data):
+    return "/api/tasks/"
+
+
+@scenario("tasks.list_filtered")
+def _tasks_list_filtered(data):
+    return f"/api/tasks/?project={data.project.pk}&status=todo&ordering=due_date"
+
+
+@scenario("tasks.list_expanded")
+def _tasks_list_expanded(data):
+    return f"/api/projects/{data.project.pk}/tasks/?expand=assigned_to,comments.user"
+
+
+@scenario("tasks.create", "POST", expect=201)
+def _tasks_create(data):
+    return "/api/tasks/", data.task_body()
+
+
+@scenario("tasks.retrieve")
+def _tasks_retrieve(data):
+    return f"/api/tasks/{data.task.pk}/"
+
+
+@scenario("tasks.update", "PUT")
+def _tasks_update(data):
+    return f"/api/tasks/{data.task.pk}/", data.task_body(assigned_to=data.task_assignee())
+
+
+@scenario("tasks.reassign", "PUT")
+def _tasks_reassign(data):
+    # Hands the task to the other assignee on every request, so each one moves inbox entries and queues a notice
+    other = data.membership.user_id if data.task_assignee() == data.member.pk else data.member.pk
+    return f"/api/tasks/{data.task.pk}/", data.task_body(assigned_to=other)
+
+
+@scenario("tasks.partial_update", "PATCH")
+def _tasks_partial_update(data):
+    return f"/api/tasks/{data.task.pk}/", {"title": f"bench task {data.unique()}"}
+
+
+@scenario("tasks.destroy", "DELETE", expect=204)
+def _tasks_destroy(data):
+    return f"/api/tasks/{data.new_task_with_comments().pk}/"
+
+
+@scenario("tasks.bulk_create", "POST", expect=201)
+def _tasks_bulk_create(data):
+    return "/api/tasks/bulk/", [data.task_body() for _ in range(BULK_SIZE)]
+
+
+@scenario("tasks.bulk_update", "PATCH")
+def _tasks_bulk_update(data):
+    priority = data.bulk_priority()
+    return "/api/tasks/bulk/", [{"id": pk, "priority": priority} for pk in data.bulk_ids]
+
+
+@scenario("tasks.bulk_destroy", "DELETE")
+def _tasks_bulk_destroy(data):
+    return "/api/tasks/bulk/", [task.pk for task in data.new_tasks(BULK_SIZE)]
+
+
+@scenario("project_tasks.list")
+def _project_tasks_list(data):
+    return f"/api/projects/{data.project.pk}/tasks/"
+
+
+@scenario("project_tasks.create", "POST", expect=201)
+def _project_tasks_create(data):
+    return f"/api/projects/{data.project.pk}/tasks/", data.task_body()
+
+
+@scenario("project_tasks.retrieve")
+def _project_tasks_retrieve(data):
+    return f"/api/projects/{data.project.pk}/tasks/{data.task.pk}/"
+
+
+@scenario("project_tasks.update", "PUT")
+def _project_tasks_update(data):
+    return f"/api/projects/{data.project.pk}/tasks/{data.task.pk}/", data.task_body(assigned_to=data.task_assignee())
+
+
+@scenario("project_tasks.partial_update", "PATCH")
+def _project_tasks_partial_update(data):
+    return f"/api/projects/{data.project.pk}/tasks/{data.task.pk}/", {"title": f"bench task {data.unique()}"}
+
+
+@scenario("project_tasks.destroy", "DELETE", expect=204)
+def _project_tasks_destroy(data):
+    return f"/api/projects/{data.project.pk}/tasks/{data.new_task_with_comments().pk}/"
+
+
+@scenario("project_tasks.bulk_create", "POST", expect=201)
+def _project_tasks_bulk_create(data):
+    return f"/api/projects/{data.project.pk}/tasks/bulk/", [
+        {"title": f"bench task {data.unique()}"} for _ in range(BULK_SIZE)
+    ]
+
+
+@scenario("project_tasks.bulk_update", "PATCH")
+def _project_tasks_bulk_update(data):
+    priority = data.bulk_priority()
+    return f"/api/projects/{data.project.pk}/tasks/bulk/", [{"id": pk, "priority": priority} for pk in data.bulk_ids]
+
+
+@scenario("project_tasks.bulk_destroy", "DELETE")
+def _project_tasks_bulk_destroy(data):
+    return f"/api/projects/{data.project.pk}/tasks/bulk/", [task.pk for task in data.new_tasks(BULK_SIZE)]
+
+
+@scenario("comments.list")
+def _comments_list(data):
+    return "/api/comments/"
+
+
+@scenario("comments.retrieve")
+def _comments_retrieve(data):
+    return f"/api/comments/{data.comment.pk}/"
+
+
+@scenario("comments.update", "PUT")
+def _comments_update(data):
+    return f"/api/comments/{data.comment.pk}/", {"content": f"bench comment {data.unique()}"}
+
+
+@scenario("comments.partial_update", "PATCH")
+def _comments_partial_update(data):
+    return f"/api/comments/{data.comment.pk}/", {"content": f"bench comment {data.unique()}"}
+
+
+@scenario("comments.destroy", "DELETE", expect=204)
+def _comments_destroy(data):
+    return f"/api/comments/{data.new_comment().pk}/"
+
+
+@scenario("task_comments.list")
+def _task_comments_list(data):
+    return f"/api/tasks/{data.task.pk}/comments/"
+
+
+@scenario("task_comments.create", "POST", expect=201)
+def _task_comments_create(data):
+    return f"/api/tasks/{data.task.pk}/comments/", {"content": f"bench comment {data.unique()}"}
+
+
+@scenario("task_comments.retrieve")
+def _task_comments_retrieve(data):
+    return f"/api/tasks/{data.task.pk}/comments/{data.comment.pk}/"
+
+
+@scenario("task_comments.update", "PUT")
+def _task_comments_update(data):
+    return f"/api/tasks/{data.task.pk}/comments/{data.comment.pk}/", {"content": f"bench comment {data.unique()}"}
+
+
+@scenario("task_comments.partial_update", "PATCH")
+def _task_comments_partial_update(data):
+    return f"/api/tasks/{data.task.pk}/comments/{data.comment.pk}/", {"content": f"bench comment {data.unique()}"}
+
+
+@scenario("task_comments.destroy", "DELETE", expect=204)
+def _task_comments_destroy(data):
+    return f"/api/tasks/{data.task.pk}/comments/{data.new_comment().pk}/"
+
+
+@scenario("deletions.list")
+def _deletions_list(data):
+    return "/api/deletions/"
+
+
+@scenario("deletions.retrieve")
+def _deletions_retrieve(data):
+    return f"/api/deletions/{data.deletion.pk}/"
+
+
+@scenario("async.tasks.list", client="async")
+def _async_tasks_list(data):
+    return "/api/async/tasks/"
+
+
+@scenario("async.tasks.retrieve", client="async")
+def _async_tasks_retrieve(data):
+    return f"/api/async/tasks/{data.task.pk}/"
+
+
+@scenario("async.projects.list", client="async")
+def _async_projects_list(data):
+    return "/api/async/projects/"
+
+
+@scenario("async.project_tasks.list", client="async")
+def _async_project_tasks_list(data):
+    return f"/api/async/projects/{data.project.pk}/tasks/"
+
+
+@scenario("async.comments.list", client="async")
+def _async_comments_list(data):
+    return "/api/async/comments/"
+
+
+@scenario("async.task_comments.list", client="async")
+def _async_task_comments_list(data):
+    return f"/api/async/tasks/{data.task.pk}/comments/"
+
+
+@scenario("feed.open", client="async", stream=True)
+def _feed_open(data):
+    # Time to the first event of the SSE stream; the stream is then closed
+    return f"/api/projects/{data.project.pk}/feed/"
+
+
+# ----- running -----
+# Routes that are deliberately not driven, with the reason
+NOT_DRIVEN = {
+    ("comments-list", "post"): "comments need a task; created through task-comments-list",
+}
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(max(math.ceil(p / 100 * len(ordered)), 1), len(ordered)) - 1]
+
+
+class Runner:
+    """Sends a scenario's requests and collects its timings, queries and allocations."""
+
+    def __init__(self, data):
+        self.data = data
+        self.client = Client(raise_request_exception=False)
+        self.async_client = AsyncClient(raise_request_exception=False)
+
+    def prepare(self, scenario):
+        """Run the scenario's (untimed) build step; returns (path, client kwargs)."""
+        built = scenario.build(self.data)
+        path, body = built if isinstance(built, tuple) else (built, None)
+        kwargs = {"headers": self.data.headers(scenario.as_user)}
+        if body is not None:
+            kwargs.update(data=json.dumps(body), content_type="application/json")
+        return path, kwargs
+
+    def send(self, scenario, path, kwargs):
+        """Send a prepared request; returns (response, elapsed seconds)."""
+        if scenario.client == "async":
+            return async_to_sync(self.asend)(scenario, path, kwargs)
+        start = time.perf_counter()
+        response = getattr(self.client, scenario.method.lower())(path, **kwargs)
+        if scenario.stream and response.streaming:
+            b"".join(response.streaming_content)
+        return response, time.perf_counter() - start
+
+    def request(self, scenario):
+        """Prepare and send one request; returns (response, elapsed seconds, path)."""
+        path, kwargs = self.prepare(scenario)
+        return self.send(scenario, path, kwargs) + (path,)
+
+    async def asend(self, scenario, path, kwargs):
+        start = time.perf_counter()
+        response = await getattr(self.async_client, scenario.method.lower())(path, **kwargs)
+        if scenario.stream and response.streaming:
+            # Streams may never end (the feed): read the first chunk only
+            chunks = response.streaming_content.__aiter__()
+            await anext(chunks, None)
+            await chunks.aclose()
+        return response, time.perf_counter() - start
+
+    def run(self, scenario, iterations, warmup, profile):
+        for _ in range(warmup):
+            self.request(scenario)
+        gc.collect()
+
+        timings, statuses, path = [], Counter(), None
+        for _ in range(iterations):
+            response, elapsed, path = self.request(scenario)
+            timings.append(elapsed * 1000)
+            statuses[response.status_code] += 1
+
+        queries, peaks, retained = [], [], []
+        for _ in range(profile):
+            path, kwargs = self.prepare(scenario)
+            with count_queries() as counter:
+                tracemalloc.start()
+                try:
+                    before, _ = tracemalloc.get_traced_memory()
+                    response, _ = self.send(scenario, path, kwargs)
+                    after, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+            statuses[response.status_code] += 1
+            queries.append(counter.count)
+            peaks.append((peak - before) / 1024)
+            retained.append((after - before) / 1024)
+
+        timings.sort()
+        unexpected = sum(n for code, n in statuses.items() if code != scenario.expect)
+        return {
+            "method": scenario.method,
+            "path": path,
+            "route": resolve(path.split("?")[0]).url_name,
+            "client": scenario.client,
+            "expect": scenario.expect,
+            "statuses": {str(code): n for code, n in sorted(statuses.items())},
+            "unexpected": unexpected,
+            "n": len(timings),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "max_ms": round(timings[-1], 3),
+            "queries": statistics.median(queries) if queries else None,
+            "queries_max": max(queries) if queries else None,
+            "alloc_peak_kib": round(statistics.median(peaks), 1) if peaks else None,
+            "alloc_retained_kib": round(statistics.median(retained), 1) if retained else None,
+        }
+
+
+def run_benchmark(names, iterations=50, warmup=5, profile=5, scale=None, rng_seed=0, progress=None):
+    """
+    Seed the data set and run the named scenarios in order.  Must run in a
+    throwaway database (the command sets up a test database).  Returns the
+    report dict.
+    """
+    scale = scale or SCALES["small"]
+    started = time.perf_counter()
+    data = BenchmarkData(rng_seed=rng_seed, **scale)
+    seeded_s = time.perf_counter() - started
+
+    runner = Runner(data)
+    routes = {}
+    for name in names:
+        routes[name] = runner.run(SCENARIOS[name], iterations, warmup, profile)
+        if progress is not None:
+            progress(name, routes[name])
+
+    return {
+        "meta": environment(),
+        "config": {"iterations": iterations, "warmup": warmup, "profile": profile, "scale": scale, "seed": rng_seed,
+                   "api_cache": settings.API_CACHE.get("ENABLED", True),
+                   "fast_serialization": getattr(settings, "FAST_SERIALIZATION", {}).get("ENABLED", False),
+                   "seed_seconds": round(seeded_s, 2)},
+        "routes": routes,
+        "uncovered": uncovered_routes(routes.values()) if set(names) == set(SCENARIOS) else [],
+    }
+
+
+def api_routes():
+    """(url name, method) of every route in task_app/urls.py, format-suffix variants folded in."""
+    found = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            callback = pattern.callback
+            if not pattern.name or not callback.__module__.startswith(("task_app", "rest_framework")):
+                continue
+            actions = getattr(callback, "actions", None)
+            if actions:
+                methods = actions
+            else:
+                view_class = getattr(callback, "view_class", None) or getattr(callback, "cls", None)
+                methods = [m for m in ("get", "post", "put", "patch", "delete") if hasattr(view_class, m)]
+            # HEAD runs the GET code path
+            found.update((pattern.name, method) for method in methods if method != "head")
+
+    api = next(p for p in get_resolver().url_patterns if isinstance(p, URLResolver) and str(p.pattern) == "api/")
+    walk(api.url_patterns)
+    return found
+
+
+def uncovered_routes(results):
+    driven = {(row["route"], row["method"].lower()) for row in results}
+    return [
+        {"route": route, "method": method.upper(), "reason": NOT_DRIVEN.get((route, method), "no scenario")}
+        for route, method in sorted(api_routes() - driven)
+    ]
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connections["default"].vendor,
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+    }
+
+
+def compare(baseline, current):
+    """Per-route change of p50/p95 (ratio) and queries (difference), for routes in both reports."""
+    rows = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        rows.append({
+            "scenario": name,
+            "p50_ratio": round(now["p50_ms"] / before["p50_ms"], 2) if before["p50_ms"] else None,
+            "p95_ratio": round(now["p95_ms"] / before["p95_ms"], 2) if before["p95_ms"] else None,
+            "queries_delta": (now["queries"] - before["queries"])
+            if now["queries"] is not None and before["queries"] is not None else None,
+        })
+    return rows
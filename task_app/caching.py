@@ -0,0 +1,117 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+
+GLOBAL_SCOPE = "global"
+
+
+def _config():
+    return getattr(settings, "API_CACHE", {})
+
+
+def get_cache():
+    return caches[_config().get("ALIAS", "default")]
+
+
+def project_scope(project_id):
+    return f"project:{project_id}"
+
+
+def _version_key(scope):
+    return f"api:v:{scope}"
+
+
+def get_versions(scopes):
+    """
+    Return {scope: version} for the given scopes.
+
+    A version is the time.time_ns() of the last bump, so it doubles as the
+    Last-Modified stamp.  Scopes missing from the cache (never bumped, or
+    evicted) start at "now", which only ever causes a miss.
+    """
+    cache = get_cache()
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, value in missing.items():
+        cache.add(key, value, timeout=None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {scope: found.get(key, missing.get(key)) for key, scope in keys.items()}
+
+
+def bump_versions(*scopes):
+    """Invalidate every cached response that depends on `scopes`, once the transaction commits."""
+    scopes = set(scopes) | {GLOBAL_SCOPE}
+
+    def bump():
+        now = time.time_ns()
+        get_cache().set_many({_version_key(scope): now for scope in scopes}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+class ListCacheMixin:
+    """
+    Caches rendered list() responses per user, query string and media type.
+
+    The cache key embeds the current version of every scope the list reads
+    from (see get_cache_scopes), so signal-driven bumps in task_app/signals.py
+    make stale entries unreachable instead of deleting them.  Responses carry
+    an ETag and Last-Modified, and conditional GETs get a 304 without
+    touching the database.
+    """
+    def get_cache_scopes(self):
+        return [GLOBAL_SCOPE]
+
+    def list(self, request, *args, **kwargs):
+        if not _config().get("ENABLED", True):
+            return super().list(request, *args, **kwargs)
+
+        cache = get_cache()
+        versions = get_versions(self.get_cache_scopes())
+        last_modified = max(versions.values()) // 1_000_000_000
+        key = self.get_cache_key(request, versions)
+
+        entry = cache.get(key)
+        if entry is not None:
+            response = HttpResponse(entry["content"], content_type=entry["content_type"])
+            self.set_cache_headers(response, entry["etag"], last_modified, "HIT")
+            return get_conditional_response(request._request, entry["etag"], last_modified, response)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            def store(rendered):
+                etag = quote_etag(hashlib.md5(rendered.content, usedforsecurity=False).hexdigest())
+                cache.set(key, {
+                    "content": rendered.content,
+                    "content_type": rendered["Content-Type"],
+                    "etag": etag,
+                }, _config().get("TIMEOUT", 300))
+                self.set_cache_headers(rendered, etag, last_modified, "MISS")
+            response.add_post_render_callback(store)
+        return response
+
+    def get_cache_key(self, request, versions):
+        parts = [
+            self.basename,
+            str(request.user.pk),
+            request.accepted_media_type or "",
+            request.get_full_path(),
+        ] + [f"{scope}={version}" for scope, version in sorted(versions.items())]
+        digest = hashlib.sha1("\n".join(parts).encode("utf-8"), usedforsecurity=False).hexdigest()
+        return f"api:list:{digest}"
+
+    @staticmethod
+    def set_cache_headers(response, etag, last_modified, state):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["X-Cache"] = state
+        patch_vary_headers(response, ("Authorization", "Accept"))
@@ -0,0 +1,147 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+from .throttling import PROCESS_LOCAL_CACHES
+
+
+# Per-request routing state; outside a request (management commands, shells,
+# workers) everything goes to the primary.
+_state = ContextVar("db_routing_state", default=None)
+
+
+class _RoutingState:
+    __slots__ = ("use_replicas", "wrote")
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+def _config():
+    return getattr(settings, "DATABASE_ROUTING", {})
+
+
+def replica_aliases():
+    return _config().get("REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random replica while the current request allows it
+    (see ReplicaRoutingMiddleware) and everything else to "default".
+
+    The first write in a request pins the rest of that request to the
+    primary, so a view never reads back stale data it just wrote.  The
+    state ends with the view: a StreamingHttpResponse generator runs after
+    it and would read from the primary, so streaming views pick an alias
+    with db_for_read() up front and read through .using() (see
+    ProjectViewSet.export).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = replica_aliases()
+        if state is None or not state.use_replicas or state.wrote or not replicas:
+            return "default"
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets SAFE_METHODS requests read from replicas.
+
+    After a request writes, the same client (keyed by its Authorization
+    header) stays on the primary for PIN_SECONDS, which covers replication
+    lag for read-your-own-writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            # Stay on the async path so async views are not pushed into a thread
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        pin_key = self.get_pin_key(request)
+        pinned = bool(pin_key) and bool(replica_aliases()) and self.cache().get(pin_key)
+        state = self.start(request, pinned)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and pin_key and replica_aliases():
+            self.cache().set(pin_key, 1, _config().get("PIN_SECONDS", 5))
+        return response
+
+    async def __acall__(self, request):
+        pin_key = self.get_pin_key(request)
+        pinned = bool(pin_key) and bool(replica_aliases()) and await self.cache().aget(pin_key)
+        state = self.start(request, pinned)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and pin_key and replica_aliases():
+            await self.cache().aset(pin_key, 1, _config().get("PIN_SECONDS", 5))
+        return response
+
+    @staticmethod
+    def start(request, pinned):
+        return _RoutingState(
+            request.method in SAFE_METHODS and bool(replica_aliases()) and not pinned
+        )
+
+    @staticmethod
+    def cache():
+        return caches[_config().get("CACHE_ALIAS", "default")]
+
+    @staticmethod
+    def get_pin_key(request):
+        credentials = request.META.get("HTTP_AUTHORIZATION")
+        if not credentials:
+            return None
+        return "db:pin:" + hashlib.sha1(credentials.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+@checks.register(checks.Tags.database, deploy=True)
+def check_shared_pin_cache(app_configs, **kwargs):
+    if not replica_aliases():
+        return []
+    alias = _config().get("CACHE_ALIAS", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [checks.Error(
+            f"Read-your-writes pins are kept in the process-local {alias!r} cache, so a client whose "
+            "next request lands on another worker can read stale rows from a replica.",
+            hint="Give DATABASE_ROUTING[\"CACHE_ALIAS\"] a shared cache (API_CACHE_BACKEND=redis).",
+            id="task_app.E003",
+        )]
+    return []
@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import bump_versions, project_scope
+from .jobs import enqueue, job
+from .membership import resolver
+from .models import *
+from .signals import tasks_bulk_changed
+from .sync import stamp_tasks
+
+
+# Deleting a project or user through the ORM makes Django's collector load
+# every dependent task and comment and delete them in one transaction.
+# Instead the request only marks the root (deleted_at) and queues a purge;
+# the worker then removes the rows in bounded batches, each in its own
+# short transaction, recording progress on a Deletion row.
+
+def _config():
+    return getattr(settings, "DELETION", {})
+
+
+def delete_rows(model, ids):
+    """DELETE ... WHERE id IN (...): no rows loaded, no collector, no signals."""
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", list(ids))
+        return cursor.rowcount
+
+
+class Progress:
+    """Per-model counters of a purge, written to its Deletion row after every batch."""
+
+    def __init__(self, deletion_id=None):
+        self.deletion_id = deletion_id
+        self.deleted = {}
+        if deletion_id is not None:
+            row = Deletion.objects.filter(pk=deletion_id).values_list("deleted", flat=True).first()
+            self.deleted = row or {}
+
+    def start(self, total):
+        self.save(status=Deletion.RUNNING, total=total)
+
+    def add(self, name, count):
+        self.deleted[name] = self.deleted.get(name, 0) + count
+        self.save(deleted=self.deleted)
+
+    def finish(self):
+        self.save(status=Deletion.DONE, finished_at=timezone.now(), error="")
+
+    def save(self, **fields):
+        if self.deletion_id is not None:
+            Deletion.objects.filter(pk=self.deletion_id).update(**fields)
+
+
+def purge_in_batches(queryset, batch_size, progress=None, name=None):
+    """Delete the queryset's rows `batch_size` at a time, each batch in its own short transaction."""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            count = delete_rows(queryset.model, ids)
+        deleted += count
+        if progress is not None:
+            progress.add(name or queryset.model._meta.model_name, count)
+
+
+def project_rows(project_ids):
+    """The large per-project tables, children first."""
+    return [
+        # by task too: entries of a task moved in from another project may still name that one
+        ("inbox_items", InboxItem.objects.filter(Q(project_id__in=project_ids) | Q(task__project_id__in=project_ids))),
+        ("comments", Comment.objects.filter(task__project_id__in=project_ids)),
+        ("tasks", Task.objects.filter(project_id__in=project_ids)),
+        ("tombstones", Tombstone.objects.filter(project_id__in=project_ids)),
+    ]
+
+
+def purge_projects(project_ids, batch_size, progress):
+    """
+    Empty the projects in batches, then delete them normally, so their
+    members and counters cascade and the usual signals (caches, change
+    feed) fire once per project.
+    """
+    for name, queryset in project_rows(project_ids):
+        purge_in_batches(queryset, batch_size, progress, name)
+    for project in Project.objects.filter(pk__in=project_ids):
+        project.delete()
+        progress.add("projects", 1)
+
+
+# ----- requests (called by the views) -----
+def request_project_deletion(project, requested_by=None):
+    """Hide the project now and queue its purge; returns the Deletion to poll."""
+    with transaction.atomic():
+        project.deleted_at = timezone.now()
+        project.save(update_fields=["deleted_at"])
+        deletion = Deletion.objects.create(kind=Deletion.PROJECT, object_id=project.pk, requested_by=requested_by)
+        enqueue("purge_project", {"project_id": project.pk, "deletion_id": deletion.pk})
+    invalidate_members(ProjectMember.objects.filter(project=project))
+    return deletion
+
+
+def request_user_deletion(user, requested_by=None):
+    """Deactivate the user, hide their projects and queue the purge; returns the Deletion to poll."""
+    now = timezone.now()
+    with transaction.atomic():
+        user.is_active = False
+        user.deleted_at = now
+        user.save(update_fields=["is_active", "deleted_at"])
+        owned = list(Project.objects.filter(owner=user, deleted_at__isnull=True).values_list("pk", flat=True))
+        Project.objects.filter(pk__in=owned).update(deleted_at=now)
+        bump_versions(*(project_scope(project_id) for project_id in owned))
+        deletion = Deletion.objects.create(kind=Deletion.USER, object_id=user.pk, requested_by=requested_by)
+        enqueue("purge_user", {"user_id": user.pk, "deletion_id": deletion.pk})
+    invalidate_members(ProjectMember.objects.filter(project__owner=user))
+    return deletion
+
+
+def invalidate_members(memberships):
+    # Cached roles still list the hidden projects
+    for user_id in set(memberships.values_list("user_id", flat=True)):
+        resolver.invalidate(user_id)
+
+
+# ----- jobs (run by `manage.py runworker`) -----
+def deletion_failed(error, deletion_id=None, **payload):
+    if deletion_id is not None:
+        Deletion.objects.filter(pk=deletion_id).update(
+            status=Deletion.FAILED, error=error, finished_at=timezone.now()
+        )
+
+
+@job("purge_project", on_failure=deletion_failed)
+def purge_project(project_id, deletion_id=None, batch_size=None):
+    batch_size = batch_size or _config().get("BATCH_SIZE", 1000)
+    progress = Progress(deletion_id)
+    progress.start({name: queryset.count() for name, queryset in project_rows([project_id])})
+    purge_projects([project_id], batch_size, progress)
+    progress.finish()
+
+
+@job("purge_user", on_failure=deletion_failed)
+def purge_user(user_id, deletion_id=None, batch_size=None):
+    """
+    Owned projects go like purge_project().  The user's comments elsewhere
+    are deleted, and their tasks unassigned, through the ORM a batch at a
+    time, so other projects' counters, sync versions and feeds stay right.
+    """
+    batch_size = batch_size or _config().get("BATCH_SIZE", 1000)
+    progress = Progress(deletion_id)
+    project_ids = list(Project.objects.filter(owner_id=user_id).values_list("pk", flat=True))
+    comments = Comment.objects.filter(user_id=user_id).exclude(task__project_id__in=project_ids)
+    assigned = Task.objects.filter(assigned_to_id=user_id).exclude(project_id__in=project_ids)
+    total = {name: queryset.count() for name, queryset in project_rows(project_ids)}
+    total.update(projects=len(project_ids), comments=total["comments"] + comments.count(), unassigned=assigned.count())
+    progress.start(total)
+
+    purge_projects(project_ids, batch_size, progress)
+    while True:
+        ids = list(comments.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            count, _ = Comment.objects.filter(pk__in=ids).delete()
+        progress.add("comments", count)
+    while True:
+        tasks = list(assigned.order_by("pk")[:batch_size])
+        if not tasks:
+            break
+        with transaction.atomic():
+            for task in tasks:
+                task.assigned_to = None
+            stamp_tasks(tasks)
+            Task.bulk_update_versioned(tasks, ["assigned_to", "sync_version", "updated_at"])
+            tasks_bulk_changed.send(sender=Task, action="update", tasks=tasks)
+        progress.add("unassigned", len(tasks))
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        user.delete()
+    progress.finish()
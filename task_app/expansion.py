@@ -0,0 +1,233 @@
+import sys
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_list(value):
+    return [name.strip() for name in value.split(",") if name.strip()] if value else []
+
+
+def split_expand(names):
+    """["comments.user", "project"] -> {"comments": ["user"], "project": []}"""
+    tree = {}
+    for name in names:
+        head, _, rest = name.partition(".")
+        tree.setdefault(head, [])
+        if rest:
+            tree[head].append(rest)
+    return tree
+
+
+def get_expandable_fields(serializer_class):
+    """`expandable_fields` with class names (forward references) resolved in the serializer's module."""
+    module = sys.modules[serializer_class.__module__]
+    return {
+        name: (getattr(module, nested) if isinstance(nested, str) else nested, options)
+        for name, (nested, options) in getattr(serializer_class, "expandable_fields", {}).items()
+    }
+
+
+def count_name(name):
+    return f"{name}_count"
+
+
+def limited_name(name):
+    # Sliced prefetches need a to_attr
+    return f"limited_{name}"
+
+
+class LimitedListSerializer(serializers.ListSerializer):
+    """
+    A capped to-many expansion: the first `limit` rows by `ordering`.
+    shape_queryset() prefetches exactly those; a row read without that
+    prefetch (an expansion nested in another) fetches its own slice.
+    """
+
+    def __init__(self, *args, limit, ordering, **kwargs):
+        self.limit, self.ordering = limit, ordering
+        super().__init__(*args, **kwargs)
+
+    def get_attribute(self, instance):
+        rows = getattr(instance, limited_name(self.field_name), None)
+        if rows is None:
+            rows = getattr(instance, self.field_name).order_by(*self.ordering)[:self.limit]
+        return rows
+
+
+class RelatedCountField(serializers.ReadOnlyField):
+    """`<name>_count` next to a capped expansion: annotated by shape_queryset(), else counted."""
+
+    def __init__(self, relation, **kwargs):
+        self.relation = relation
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        count = getattr(instance, count_name(self.relation), None)
+        return getattr(instance, self.relation).count() if count is None else count
+
+
+class ExpandableFieldsMixin:
+    """
+    Sparse fieldsets and embedded expansion for ModelSerializers.
+
+    `expandable_fields` maps a field name to (serializer class or its name
+    in the same module, options); when the name is expanded the serializer
+    replaces the bare id.  A to-many expansion with a "limit" option
+    embeds only the first `limit` rows by its "ordering" and adds their
+    total as `<name>_count`, so one busy row cannot blow up a page.  The
+    top-level serializer reads "fields" and "expand" from its context (set
+    by ExpandableViewMixin); embedded serializers are handed their part of
+    a dotted path ("comments.user") directly and always keep every field.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, expand=None, **kwargs):
+        self._expand = expand
+        super().__init__(*args, **kwargs)
+
+    def get_expand(self):
+        if self._expand is not None:
+            return split_expand(self._expand)
+        return split_expand(self.context.get("expand") or ())
+
+    def get_requested_fields(self):
+        if self._expand is not None:
+            return None
+        return self.context.get("fields")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.get_requested_fields()
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        expandable = get_expandable_fields(type(self))
+        for name, nested in self.get_expand().items():
+            if name in expandable and (not requested or name in requested):
+                serializer_class, options = expandable[name]
+                if "limit" in options:
+                    fields[name] = LimitedListSerializer(
+                        child=serializer_class(expand=nested), read_only=True,
+                        limit=options["limit"], ordering=options["ordering"],
+                    )
+                    fields[count_name(name)] = RelatedCountField(name)
+                else:
+                    fields[name] = serializer_class(read_only=True, expand=nested, **options)
+        return fields
+
+
+class ExpandableViewMixin:
+    """
+    ?fields=a,b and ?expand=x,y.z on GET requests.
+
+    The queryset is shaped to match: expanded foreign keys are joined with
+    select_related(), expanded reverse relations are prefetched in one
+    query each, and with ?fields= only the needed columns are loaded, so an
+    expanded page costs a constant number of queries.  Writes ignore both
+    parameters.  `required_fields` are always loaded (permission checks
+    read them).
+    """
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+    required_fields = ()
+
+    def shapes_response(self):
+        return self.request is not None and self.request.method in SAFE_METHODS
+
+    def get_requested_fields(self):
+        fields = parse_list(self.request.query_params.get(self.fields_query_param))
+        return set(fields) or None
+
+    def get_requested_expand(self):
+        return parse_list(self.request.query_params.get(self.expand_query_param))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.shapes_response():
+            context["fields"] = self.get_requested_fields()
+            context["expand"] = self.get_requested_expand()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.shapes_response():
+            return queryset
+        serializer_class = self.get_serializer_class()
+        extra = set(self.required_fields)
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, "get_ordering"):
+            extra.add(paginator.get_ordering(self.request, queryset, self)[0])
+        return shape_queryset(
+            queryset.select_related(None),
+            serializer_class,
+            self.get_requested_fields(),
+            split_expand(self.get_requested_expand()),
+            extra,
+        )
+
+
+def shape_queryset(queryset, serializer_class, requested, expand, extra=()):
+    """Apply select_related/prefetch_related/only() for a serializer's output."""
+    model = queryset.model
+    expandable = get_expandable_fields(serializer_class)
+    declared = list(serializer_class.Meta.fields)
+    declared += [name for name in expandable if name not in declared]
+    wanted = [name for name in declared if not requested or name in requested]
+
+    columns = {model._meta.pk.name, *extra}
+    joined = []
+    for name in wanted:
+        field = _model_field(model, name)
+        if field is None:
+            continue
+        if name in expand and name in expandable:
+            nested_class = expandable[name][0]
+            if field.many_to_one or field.one_to_one:
+                columns.add(name)
+                joined.append(name)
+                queryset = queryset.select_related(name)
+                columns.update(f"{name}__{column}" for column in _nested_columns(field.related_model, nested_class))
+                continue
+            if field.one_to_many:
+                options = expandable[name][1]
+                related_model, parent = field.related_model, field.field.name
+                ordering = options.get("ordering") or related_model._meta.ordering or ["pk"]
+                related = shape_queryset(
+                    related_model._default_manager.order_by(*ordering),
+                    nested_class, None, split_expand(expand[name]), {parent},
+                )
+                if "limit" in options:
+                    # Sliced per parent row (ROW_NUMBER() OVER (PARTITION BY ...)), counted by a subquery
+                    counts = (related_model._default_manager.filter(**{parent: OuterRef("pk")})
+                              .order_by().values(parent).annotate(n=Count("pk")).values("n"))
+                    queryset = queryset.annotate(**{count_name(name): Coalesce(Subquery(counts), Value(0))})
+                    prefetch = Prefetch(name, queryset=related[:options["limit"]], to_attr=limited_name(name))
+                else:
+                    prefetch = Prefetch(name, queryset=related)
+                queryset = queryset.prefetch_related(prefetch)
+                continue
+        if field.concrete:
+            columns.add(name)
+
+    if requested or joined:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _nested_columns(model, serializer_class):
+    columns = [model._meta.pk.name]
+    for name in serializer_class.Meta.fields:
+        field = _model_field(model, name)
+        if field is not None and field.concrete:
+            columns.append(name)
+    return columns
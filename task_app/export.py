@@ -0,0 +1,54 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import *
+from .serializers import CommentSerializer, TaskSerializer
+
+
+CSV_COLUMNS = [
+    "type", "id", "project", "task", "title", "description", "status", "priority",
+    "assigned_to", "user", "content", "created_at", "due_date",
+]
+
+
+def iter_project_records(project_id, chunk_size=1000, using=None):
+    """
+    Yield {"type": "task"|"comment", ...} dicts for a project, each task
+    followed by its comments, read from database `using` (the router's
+    choice when None).
+
+    Tasks are read with iterator(chunk_size) and comments are prefetched per
+    chunk, so memory stays bounded by one chunk no matter the project size.
+    """
+    task_serializer = TaskSerializer()
+    comment_serializer = CommentSerializer()
+    comments = Prefetch("comments", queryset=Comment.objects.order_by("created_at", "id"))
+    tasks = (
+        Task.objects.using(using).filter(project_id=project_id)
+        .order_by("id")
+        .prefetch_related(comments)
+    )
+    for task in tasks.iterator(chunk_size=chunk_size):
+        yield {"type": "task", **task_serializer.to_representation(task)}
+        for comment in task.comments.all():
+            yield {"type": "comment", **comment_serializer.to_representation(comment)}
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class _Echo:
+    # csv.writer needs a file; this one hands each row straight back
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
@@ -0,0 +1,167 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def _config():
+    return getattr(settings, "FAST_SERIALIZATION", {})
+
+
+# ----- per-field converters, mirroring each DRF field's to_representation() -----
+def _identity(value):
+    return value
+
+
+def _convert_choice(field):
+    mapping = field.choice_strings_to_values
+
+    def convert(value):
+        if value == "":
+            return value
+        return mapping.get(str(value), value)
+    return convert
+
+
+def _convert_datetime(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None:
+        return _identity
+    if output_format.lower() != ISO_8601:
+        return None
+    tz = getattr(field, "timezone", None)
+
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        if timezone.is_aware(value):
+            value = value.astimezone(tz or timezone.get_current_timezone())
+        value = value.isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+    return convert
+
+
+def _convert_date(field):
+    output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+    if output_format is None:
+        return _identity
+    if output_format.lower() != ISO_8601:
+        return None
+    return lambda value: value if isinstance(value, str) else value.isoformat()
+
+
+def field_converter(field):
+    """Converter for a model column feeding `field`, or None if the field needs the full path."""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return _identity if field.pk_field is None else None
+    if isinstance(field, serializers.MultipleChoiceField):
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        return _convert_choice(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _convert_datetime(field)
+    if isinstance(field, serializers.DateField):
+        return _convert_date(field)
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.CharField):
+        return str
+    return None
+
+
+class FastSerializer:
+    """
+    List output of a ModelSerializer computed from .values() rows.
+
+    Compiled once from the serializer's (already trimmed) fields into
+    (key, column, converter) triples; serialize() is then a tight loop
+    producing exactly what serializer.data would, without model instances
+    or per-field method dispatch.  compile() returns None for serializers
+    it cannot reproduce (nested or method fields, dotted sources, custom
+    to_representation()), which then take the normal path.
+    """
+    _plans = {}
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.columns = [column for _, column, _ in plan]
+
+    @classmethod
+    def compile(cls, serializer):
+        if not _config().get("ENABLED", False):
+            return None
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            return None
+        fields = [field for field in serializer.fields.values() if not field.write_only]
+        key = (type(serializer), tuple((field.field_name, type(field), field.source) for field in fields))
+        if key not in cls._plans:
+            cls._plans[key] = cls.build_plan(serializer.Meta.model, fields)
+        plan = cls._plans[key]
+        return cls(plan) if plan is not None else None
+
+    @staticmethod
+    def build_plan(model, fields):
+        plan = []
+        for field in fields:
+            if "." in field.source or field.source == "*":
+                return None
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            converter = field_converter(field)
+            if converter is None or not model_field.concrete:
+                return None
+            plan.append((field.field_name, model_field.attname, converter))
+        return plan
+
+    def serialize(self, rows):
+        plan = self.plan
+        return [
+            {key: None if row[column] is None else convert(row[column]) for key, column, convert in plan}
+            for row in rows
+        ]
+
+
+class FastListMixin:
+    """
+    Serve list() through FastSerializer when the serializer allows it.
+
+    The filtered queryset is switched to .values() with just the columns
+    the output needs (plus the pagination ordering column), so rows never
+    become model instances.  Anything the fast path cannot reproduce falls
+    back to the regular list().
+    """
+
+    def get_fast_serializer(self):
+        if getattr(self, "get_requested_expand", None) and self.get_requested_expand():
+            return None
+        return FastSerializer.compile(self.get_serializer())
+
+    def get_fast_columns(self, fast, queryset):
+        columns = dict.fromkeys(fast.columns)
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, "get_ordering"):
+            name = paginator.get_ordering(self.request, queryset, self)[0]
+            columns[queryset.model._meta.get_field(name).attname] = None
+            columns[queryset.model._meta.pk.attname] = None
+        return list(columns)
+
+    def list(self, request, *args, **kwargs):
+        fast = self.get_fast_serializer()
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*self.get_fast_columns(fast, queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def _config():
+    return getattr(settings, "CHANGE_FEED", {})
+
+
+def feed_enabled():
+    return _config().get("ENABLED", True)
+
+
+def make_event(project_id, model, action, pk, data=None):
+    """Compact change event; the broker stamps it with the project's next "seq"."""
+    return {"project": project_id, "model": model, "action": action, "id": pk, "data": data}
+
+
+def publish(project_id, model, action, pk, data=None):
+    """Queue an event for the project; it is published once the write commits."""
+    if project_id is None or not feed_enabled():
+        return
+    event = make_event(project_id, model, action, pk, data)
+    transaction.on_commit(lambda: get_broker().publish(project_id, event))
+
+
+class Subscription:
+    """Queue of live events for one project, fed from any thread."""
+
+    def __init__(self, broker, project_id):
+        self.broker = broker
+        self.project_id = project_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def push(self, event):
+        # Called from whichever thread published; hop onto the subscriber's loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Per-process broker: sequence counters, a bounded replay log per project
+    and fan-out to subscribers in this process.  Fine for a single worker;
+    use RedisBroker when events must cross processes.
+    """
+
+    def __init__(self, history=1000, max_projects=10000):
+        self.history = history
+        self.max_projects = max_projects
+        self._logs = OrderedDict()       # project_id -> [last seq, deque of events]
+        self._subscribers = {}           # project_id -> set of Subscription
+        self._lock = threading.Lock()
+
+    def publish(self, project_id, event):
+        with self._lock:
+            log = self._logs.get(project_id)
+            if log is None:
+                log = self._logs[project_id] = [0, deque(maxlen=self.history)]
+                while len(self._logs) > self.max_projects:
+                    self._logs.popitem(last=False)
+            self._logs.move_to_end(project_id)
+            log[0] += 1
+            event = {"seq": log[0], **event}
+            log[1].append(event)
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+        return event["seq"]
+
+    def last_seq(self, project_id):
+        with self._lock:
+            return self._logs.get(project_id, (0,))[0]
+
+    def replay(self, project_id, since):
+        """Events after `since`, or None if they are no longer all available."""
+        with self._lock:
+            last, events = self._logs.get(project_id, (0, ()))
+            return _replay_from(list(events), last, since)
+
+    def subscribe(self, project_id):
+        subscription = Subscription(self, project_id)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.project_id]
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Broker backed by a Redis-protocol server: INCR for sequence numbers, a
+    capped list per project for replay and PUBLISH for fan-out, so every
+    worker sees every event.  `client` is anything redis-py compatible
+    (redis.Redis, or an in-process stand-in in tests).
+    """
+
+    def __init__(self, client=None, url="redis://127.0.0.1:6379/0", prefix="feed", **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._listener = None
+
+    def key(self, kind, project_id):
+        return f"{self.prefix}:{kind}:{project_id}"
+
+    def publish(self, project_id, event):
+        seq = self.client.incr(self.key("seq", project_id))
+        payload = json.dumps({"seq": seq, **event})
+        pipe = self.client.pipeline()
+        pipe.rpush(self.key("log", project_id), payload)
+        pipe.ltrim(self.key("log", project_id), -self.history, -1)
+        pipe.publish(self.key("channel", project_id), payload)
+        pipe.execute()
+        return seq
+
+    def last_seq(self, project_id):
+        return int(self.client.get(self.key("seq", project_id)) or 0)
+
+    def replay(self, project_id, since):
+        last = self.last_seq(project_id)
+        events = [json.loads(raw) for raw in self.client.lrange(self.key("log", project_id), 0, -1)]
+        return _replay_from(events, last, since)
+
+    def subscribe(self, project_id):
+        subscription = super().subscribe(project_id)
+        self._ensure_listener()
+        return subscription
+
+    def _ensure_listener(self):
+        # One background thread per process relays Redis messages to local subscribers
+        with self._lock:
+            if self._listener is not None:
+                return
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(self.key("channel", "*"))
+            self._listener = threading.Thread(target=self._listen, args=(pubsub,), daemon=True)
+            self._listener.start()
+
+    def _listen(self, pubsub):
+        for message in pubsub.listen():
+            if message.get("type") != "pmessage":
+                continue
+            event = json.loads(message["data"])
+            with self._lock:
+                subscribers = list(self._subscribers.get(event["project"], ()))
+            for subscription in subscribers:
+                subscription.push(event)
+
+
+def _replay_from(events, last, since):
+    if since is None or since == last:
+        return []
+    if since > last:
+        # Client is ahead of us (e.g. the broker restarted): it must resync
+        return None
+    if not events or events[0]["seq"] > since + 1:
+        return None
+    return [event for event in events if event["seq"] > since]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = _config()
+            broker_class = import_string(config.get("BROKER", "task_app.feed.InProcessBroker"))
+            _broker = broker_class(**config.get("OPTIONS", {}))
+        return _broker
+
+
+def set_broker(broker):
+    """Swap the process-wide broker (e.g. for a Redis stand-in in tests)."""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+async def stream_events(project_id, since=None, keepalive=15):
+    """
+    Yield ("reset", {"seq": n}), ("change", event) or ("keepalive", None).
+
+    Subscribes before replaying so nothing published in between is lost;
+    replayed and live events are de-duplicated by seq.  A "reset" means the
+    requested position is gone and the client must re-fetch, then resume
+    from the given seq.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(project_id)
+    try:
+        backlog = await asyncio.to_thread(broker.replay, project_id, since)
+        if backlog is None:
+            backlog = []
+            since = await asyncio.to_thread(broker.last_seq, project_id)
+            yield "reset", {"seq": since}
+        for event in backlog:
+            since = event["seq"]
+            yield "change", event
+        while True:
+            try:
+                event = await subscription.get(timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+                continue
+            if since is not None and event["seq"] <= since:
+                continue
+            since = event["seq"]
+            yield "change", event
+    finally:
+        subscription.close()
+
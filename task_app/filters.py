@@ -0,0 +1,55 @@
+import django_filters
+from django.db import connections
+from rest_framework.filters import BaseFilterBackend
+
+from .models import *
+from .search import full_text_search
+
+
+class TaskFilter(django_filters.FilterSet):
+    """
+    ?status=todo&status=in_progress        any of the given statuses
+    ?priority=high
+    ?assigned_to=<user id>   ?unassigned=true
+    ?project=<project id>
+    ?due_date_after=…&due_date_before=…    ISO 8601, inclusive
+    ?created_at_after=…&created_at_before=…
+    """
+    status = django_filters.MultipleChoiceFilter(choices=Task.STATUS_CHOICES)
+    priority = django_filters.MultipleChoiceFilter(choices=Task.PRIORITY_CHOICES)
+    # Plain id filters: validating through a ModelChoiceFilter would cost a query per request
+    assigned_to = django_filters.NumberFilter(field_name="assigned_to_id")
+    unassigned = django_filters.BooleanFilter(field_name="assigned_to", lookup_expr="isnull")
+    project = django_filters.NumberFilter(field_name="project_id")
+    due_date = django_filters.IsoDateTimeFromToRangeFilter()
+    created_at = django_filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Task
+        fields = ["status", "priority", "assigned_to", "unassigned", "project", "due_date", "created_at"]
+
+
+class TaskSearchFilter(BaseFilterBackend):
+    """
+    ?search=<text> full-text search over title and description.
+
+    Backed by an FTS5 table on SQLite and a GIN tsvector index on PostgreSQL
+    (see task_app/search.py), never by an icontains scan on those backends.
+    Text without a single word character (`?search=!!!`) matches nothing.
+    """
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+        if not text:
+            return queryset
+        return full_text_search(queryset, text, connections[queryset.db])
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            "name": self.search_param,
+            "required": False,
+            "in": "query",
+            "description": "Full-text search over task title and description.",
+            "schema": {"type": "string"},
+        }]
@@ -0,0 +1,104 @@
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core import checks
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+# Django's hashers with their cost taken from PASSWORD_HASHING in settings,
+# so the cost can be tuned per deployment (see `manage.py benchmark_hashers`).
+# Algorithm names are unchanged: existing hashes keep verifying, and a hash
+# made with other parameters, or by a hasher that is no longer preferred,
+# is re-encoded on the user's next successful login (check_password()).
+
+def _config():
+    return getattr(settings, "PASSWORD_HASHING", {})
+
+
+class TunedHasherMixin:
+    """Sets the hasher's cost attributes from PASSWORD_HASHING[profile] (keys upper-cased)."""
+    profile = None
+
+    def __init__(self, **params):
+        configured = {name.lower(): value for name, value in _config().get(self.profile.upper(), {}).items()}
+        for name, value in {**configured, **params}.items():
+            if not hasattr(type(self), name):
+                raise ValueError(f"{type(self).__name__} has no parameter {name!r}")
+            setattr(self, name, value)
+
+    def cost(self):
+        """The parameters new hashes are made with."""
+        return {name: getattr(self, name) for name in self.cost_parameters}
+
+
+class Argon2PasswordHasher(TunedHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2id (needs argon2-cffi)."""
+    profile = "argon2"
+    cost_parameters = ("time_cost", "memory_cost", "parallelism")
+
+
+class ScryptPasswordHasher(TunedHasherMixin, hashers.ScryptPasswordHasher):
+    profile = "scrypt"
+    cost_parameters = ("work_factor", "block_size", "parallelism")
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n, r, p = n or self.work_factor, r or self.block_size, p or self.parallelism
+        # OpenSSL refuses more than 32 MiB unless told otherwise, i.e. any n above
+        # 2**14.  Sized from this hash's n, r and p: verify() passes the ones stored
+        # in the hash, which may cost more than the configured ones.
+        maxmem = self.maxmem or 2 * 128 * n * r * p
+        hash_ = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=maxmem, dklen=64)
+        hash_ = base64.b64encode(hash_).decode("ascii").strip()
+        return "%s$%d$%s$%d$%d$%s" % (self.algorithm, n, salt, r, p, hash_)
+
+
+class BCryptSHA256PasswordHasher(TunedHasherMixin, hashers.BCryptSHA256PasswordHasher):
+    """bcrypt over a SHA-256 of the password (needs bcrypt)."""
+    profile = "bcrypt"
+    cost_parameters = ("rounds",)
+
+
+class PBKDF2PasswordHasher(TunedHasherMixin, hashers.PBKDF2PasswordHasher):
+    profile = "pbkdf2"
+    cost_parameters = ("iterations",)
+
+
+HASHERS = {
+    "argon2": Argon2PasswordHasher,
+    "scrypt": ScryptPasswordHasher,
+    "bcrypt": BCryptSHA256PasswordHasher,
+    "pbkdf2": PBKDF2PasswordHasher,
+}
+
+
+def hasher_available(hasher):
+    try:
+        if getattr(hasher, "library", None):
+            hasher._load_library()
+    except ValueError:
+        return False
+    return True
+
+
+@receiver(setting_changed)
+def reset_hashers(setting, **kwargs):
+    # Hasher instances are cached and read their cost when created
+    if setting == "PASSWORD_HASHING":
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
+
+
+@checks.register(checks.Tags.security)
+def check_preferred_hasher(app_configs, **kwargs):
+    hasher = hashers.get_hasher("default")
+    if not hasher_available(hasher):
+        return [checks.Error(
+            f"The preferred password hasher ({hasher.algorithm}) cannot load its library.",
+            hint="Install it (argon2-cffi or bcrypt) or choose another PASSWORD_HASHER.",
+            id="task_app.E001",
+        )]
+    return []
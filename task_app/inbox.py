@@ -0,0 +1,143 @@
+import heapq
+from collections import defaultdict
+from itertools import count
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import *
+
+
+# The "my work" inbox (/me/inbox/) is precomputed: the signals in
+# task_app/signals.py add an InboxItem when a task gets an assignee and when
+# someone else comments on an assigned task, so opening the app is one range
+# read of inbox_user_created_idx instead of a request per project and per
+# task.  Each user keeps only the newest MAX_ITEMS entries.
+
+def _config():
+    return getattr(settings, "INBOX", {})
+
+
+def max_items():
+    return _config().get("MAX_ITEMS", 500)
+
+
+def reassign_inbox(changes, created=False):
+    """
+    Apply assignee changes, [(task, previous assignee id), ...]: previous
+    assignees lose the task and its comments, new ones get an "assigned" entry
+    (replacing any they already had, e.g. when a stale instance is saved;
+    new tasks have none, so `created` skips that DELETE).
+    """
+    previous_tasks, current_tasks = defaultdict(list), defaultdict(list)
+    for task, previous in changes:
+        if previous is not None:
+            previous_tasks[previous].append(task.pk)
+        if task.assigned_to_id is not None and not created:
+            current_tasks[task.assigned_to_id].append(task.pk)
+    stale = Q()
+    for user_id, task_ids in previous_tasks.items():
+        stale |= Q(user_id=user_id, task_id__in=task_ids)
+    for user_id, task_ids in current_tasks.items():
+        stale |= Q(user_id=user_id, task_id__in=task_ids, kind=InboxItem.ASSIGNED)
+    if stale:
+        InboxItem.objects.filter(stale).delete()
+
+    now = timezone.now()
+    add_items([
+        InboxItem(user_id=task.assigned_to_id, kind=InboxItem.ASSIGNED, project_id=task.project_id,
+                  task_id=task.pk, created_at=now)
+        for task, _ in changes if task.assigned_to_id is not None
+    ])
+
+
+def add_comment(comment):
+    """Put a new comment in the inbox of its task's assignee, unless they wrote it."""
+    task = comment._state.fields_cache.get("task")
+    if task is not None:
+        project_id, assignee_id = task.project_id, task.assigned_to_id
+    else:
+        row = Task.objects.filter(pk=comment.task_id).values_list("project_id", "assigned_to_id").first()
+        if row is None:
+            return
+        project_id, assignee_id = row
+    if assignee_id is not None and assignee_id != comment.user_id:
+        add_items([InboxItem(user_id=assignee_id, kind=InboxItem.COMMENT, project_id=project_id,
+                             task_id=comment.task_id, comment=comment, created_at=comment.created_at)])
+
+
+def move_inbox(tasks):
+    """Give the entries of tasks that moved to another project their new project."""
+    moved = defaultdict(list)
+    for task in tasks:
+        moved[task.project_id].append(task.pk)
+    for project_id, task_ids in moved.items():
+        InboxItem.objects.filter(task_id__in=task_ids).update(project_id=project_id)
+
+
+def drop_member(user_id, project_id):
+    """Remove a former member's entries for the project, but not those of tasks still assigned to them."""
+    InboxItem.objects.filter(user_id=user_id, project_id=project_id).exclude(task__assigned_to_id=user_id).delete()
+
+
+def add_items(items):
+    if items:
+        InboxItem.objects.bulk_create(items, batch_size=500)
+        trim_inboxes({item.user_id for item in items})
+
+
+def trim_inboxes(user_ids):
+    """Evict all but the newest max_items() entries of each user: one DELETE each, seeking the index past the cap."""
+    limit = max_items()
+    for user_id in user_ids:
+        entries = InboxItem.objects.filter(user_id=user_id)
+        evicted = entries.order_by("-created_at", "-id").values("id")[limit:]
+        entries.filter(id__in=evicted).delete()
+
+
+def rebuild_inbox(user_ids=None, apps=global_apps):
+    """Recompute the inboxes from scratch (all users, or only `user_ids`), keeping the newest entries of each."""
+    inbox_model = apps.get_model("task_app", "InboxItem")
+    task_model = apps.get_model("task_app", "Task")
+    comment_model = apps.get_model("task_app", "Comment")
+
+    tasks = task_model.objects.filter(assigned_to__isnull=False)
+    comments = comment_model.objects.filter(task__assigned_to__isnull=False).exclude(user_id=F("task__assigned_to_id"))
+    existing = inbox_model.objects.all()
+    if user_ids is not None:
+        tasks = tasks.filter(assigned_to_id__in=user_ids)
+        comments = comments.filter(task__assigned_to_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    # A bounded min-heap per user keeps memory at max_items() rows each
+    limit, seq, newest = max_items(), count(), defaultdict(list)
+
+    def offer(user_id, created_at, fields):
+        heap = newest[user_id]
+        entry = (created_at, next(seq), fields)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    for task_id, project_id, user_id, created_at in tasks.values_list(
+        "id", "project_id", "assigned_to_id", "created_at"
+    ).iterator(chunk_size=2000):
+        offer(user_id, created_at, {"kind": "assigned", "project_id": project_id, "task_id": task_id})
+    for comment_id, task_id, project_id, user_id, created_at in comments.values_list(
+        "id", "task_id", "task__project_id", "task__assigned_to_id", "created_at"
+    ).iterator(chunk_size=2000):
+        offer(user_id, created_at, {"kind": "comment", "project_id": project_id, "task_id": task_id,
+                                    "comment_id": comment_id})
+
+    rows = [
+        inbox_model(user_id=user_id, created_at=created_at, **fields)
+        for user_id, heap in newest.items()
+        for created_at, _, fields in sorted(heap, key=lambda entry: entry[:2])
+    ]
+    with transaction.atomic():
+        existing.delete()
+        inbox_model.objects.bulk_create(rows, batch_size=1000)
@@ -0,0 +1,195 @@
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import *
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return getattr(settings, "JOBS", {})
+
+
+class Handler:
+    def __init__(self, func, every=None, on_failure=None):
+        self.func = func
+        self.every = every
+        self.on_failure = on_failure
+
+    def interval(self):
+        """Seconds between runs of a periodic job, or None."""
+        return self.every() if callable(self.every) else self.every
+
+
+_handlers = {}
+
+
+def job(name, every=None, on_failure=None):
+    """
+    Register a job handler, called with the job's payload as keyword
+    arguments.  Handlers must be idempotent: a job that fails, or whose
+    worker dies, runs again.  `on_failure(error, **payload)` is called
+    once the job has used up its attempts.
+
+    Periodic jobs (`every` seconds, or a callable returning it) are queued
+    by runworker; whatever the handler returns becomes the payload of the
+    next run, so it can carry a watermark forward.
+    """
+    def register(func):
+        _handlers[name] = Handler(func, every, on_failure)
+        return func
+    return register
+
+
+def get_handler(name):
+    return _handlers[name]
+
+
+def periodic_jobs():
+    return {name: handler for name, handler in _handlers.items() if handler.every is not None}
+
+
+def enqueue(name, payload=None, *, delay=0, key=None, max_attempts=None):
+    """
+    Queue job `name`, runnable after `delay` seconds.
+
+    The row is written in the caller's transaction, so the job only exists
+    once the request's writes commit, and costs the request one INSERT.
+    With a `key`, nothing is queued while a job with that key is pending.
+    """
+    if name not in _handlers:
+        raise ValueError(f"Unknown job {name!r}")
+    new = Job(
+        name=name,
+        payload=payload or {},
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or _config().get("MAX_ATTEMPTS", 5),
+    )
+    if key is None:
+        new.save()
+    else:
+        Job.objects.bulk_create([new], ignore_conflicts=True)
+    return new
+
+
+def enqueue_many(name, payloads, *, delay=0, max_attempts=None):
+    """enqueue() for many payloads of the same job, in one INSERT per batch."""
+    if name not in _handlers:
+        raise ValueError(f"Unknown job {name!r}")
+    run_at = timezone.now() + timedelta(seconds=delay)
+    max_attempts = max_attempts or _config().get("MAX_ATTEMPTS", 5)
+    return Job.objects.bulk_create(
+        [Job(name=name, payload=payload, run_at=run_at, max_attempts=max_attempts) for payload in payloads],
+        batch_size=500,
+    )
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: exponential, capped, with jitter."""
+    config = _config()
+    delay = min(config.get("BACKOFF_BASE", 10) * 2 ** (attempts - 1), config.get("BACKOFF_MAX", 3600))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_jobs(worker, limit):
+    """
+    Mark up to `limit` due jobs as running for `worker` and return them.
+
+    The claim is a conditional UPDATE on status, so two workers that read
+    the same candidates never both get a job; no row locks are held.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at", "id")
+    ids = list(due.values_list("pk", flat=True)[:limit])
+    if not ids:
+        return []
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now, attempts=F("attempts") + 1,
+    )
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by("run_at", "id"))
+
+
+def execute(job_id):
+    """Run a claimed job to completion or failure; safe to call in a pool process."""
+    close_old_connections()
+    try:
+        current = Job.objects.filter(pk=job_id, status=Job.RUNNING).first()
+        if current is None:
+            return None
+        try:
+            result = get_handler(current.name).func(**current.payload)
+        except Exception:
+            logger.exception("Job %s failed", current)
+            fail(current, traceback.format_exc())
+            return Job.FAILED
+        complete(current, result)
+        return "done"
+    finally:
+        close_old_connections()
+
+
+def complete(current, result=None):
+    with transaction.atomic():
+        Job.objects.filter(pk=current.pk).delete()
+        schedule_next(current, result)
+
+
+def fail(current, error):
+    """Retry after a backoff, or give up once max_attempts is used."""
+    fields = {"locked_by": "", "locked_at": None, "last_error": error}
+    with transaction.atomic():
+        if current.attempts < current.max_attempts:
+            fields.update(status=Job.QUEUED, run_at=timezone.now() + timedelta(seconds=backoff(current.attempts)))
+            Job.objects.filter(pk=current.pk).update(**fields)
+            return
+        Job.objects.filter(pk=current.pk).update(status=Job.FAILED, key=None, **fields)
+        schedule_next(current, None)
+        handler = _handlers.get(current.name)
+        if handler is not None and handler.on_failure is not None:
+            handler.on_failure(error, **current.payload)
+
+
+def schedule_next(current, result):
+    handler = _handlers.get(current.name)
+    if handler is not None and handler.every is not None:
+        payload = result if isinstance(result, dict) else current.payload
+        enqueue(current.name, payload, delay=handler.interval(), key=current.key)
+
+
+def schedule_periodic():
+    """Queue every periodic job that has no pending run (e.g. on a fresh install)."""
+    for name in periodic_jobs():
+        enqueue(name, key=f"periodic:{name}")
+
+
+def requeue_stale(timeout=None):
+    """Release jobs whose worker has held them longer than `timeout` seconds (it probably died)."""
+    timeout = timeout if timeout is not None else _config().get("LOCK_TIMEOUT", 1800)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    requeued = 0
+    for current in stale:
+        fail(current, f"Worker {current.locked_by} did not finish within {timeout}s")
+        requeued += 1
+    return requeued
+
+
+def run_jobs(worker="inline", limit=None):
+    """Run due jobs in this process until none are left (or `limit` ran); returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = claim_jobs(worker, 1)
+        if not claimed:
+            break
+        execute(claimed[0].pk)
+        ran += 1
+    return ran
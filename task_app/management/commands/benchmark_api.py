@@ -0,0 +1,107 @@
+import fnmatch
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from task_app.benchmark import SCALES, SCENARIOS, compare, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic data set in a throwaway test database and drive every API route through the "
+        "in-process client, reporting p50/p95/p99 latency, queries and allocations per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("routes", nargs="*", help="Scenario names or globs (default: all), e.g. 'tasks.*'.")
+        parser.add_argument("--list", action="store_true", help="List the scenarios and exit.")
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Data set size (default small).")
+        for name in SCALES["small"]:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name,
+                                help=f"Override the scale's {name}.")
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per scenario (default 50).")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests first (default 5).")
+        parser.add_argument("--profile", type=int, default=5,
+                            help="Extra requests counting queries and allocations (default 5).")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the data set (default 0).")
+        parser.add_argument("--no-cache", action="store_true", help="Disable the API response cache.")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument("--compare", metavar="BASELINE", help="Compare with an earlier JSON report.")
+
+    def handle(self, *args, **options):
+        names = self.select(options["routes"])
+        if options["list"]:
+            for name in names:
+                scenario = SCENARIOS[name]
+                self.stdout.write(f"{name:<34} {scenario.method:<6} {scenario.client}")
+            return
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+
+        scale = {**SCALES[options["scale"]]}
+        scale.update({name: options[name] for name in scale if options[name] is not None})
+        overrides = {"THROTTLING": {"ENABLED": False}}
+        if options["no_cache"]:
+            overrides["API_CACHE"] = {"ENABLED": False, "ALIAS": "api"}
+
+        # As the test runner does: test hosts allowed, locmem mail, a fresh database
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Expected 4xx responses (users.list) would log a warning per request
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(**overrides):
+                report = run_benchmark(
+                    names, iterations=options["iterations"], warmup=options["warmup"],
+                    profile=options["profile"], scale=scale, rng_seed=options["seed"], progress=self.progress,
+                )
+        finally:
+            request_logger.setLevel(level)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(text + "\n")
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(text)
+
+        for row in report["uncovered"]:
+            self.stderr.write(self.style.WARNING(f"Not driven: {row['method']} {row['route']} ({row['reason']})"))
+        if baseline is not None:
+            self.print_comparison(compare(baseline, report))
+
+    def select(self, patterns):
+        if not patterns:
+            return list(SCENARIOS)
+        names = [name for name in SCENARIOS if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+        if not names:
+            raise CommandError(f"No scenario matches {' '.join(patterns)}; see --list.")
+        return names
+
+    def progress(self, name, row):
+        line = (f"{name:<34} p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  "
+                f"p99 {row['p99_ms']:>8.2f} ms  {row['queries']} queries  {row['alloc_peak_kib']} KiB")
+        if row["unexpected"]:
+            line = self.style.ERROR(f"{line}  statuses {row['statuses']} (expected {row['expect']})")
+        self.stderr.write(line)
+
+    def print_comparison(self, rows):
+        self.stderr.write(f"{'scenario':<34}{'p50':>8}{'p95':>8}{'queries':>9}")
+        for row in rows:
+            delta = row["queries_delta"]
+            line = (f"{row['scenario']:<34}{row['p50_ratio'] or 0:>7.2f}x{row['p95_ratio'] or 0:>7.2f}x"
+                    f"{'' if delta is None else f'{delta:+g}':>9}")
+            self.stderr.write(self.style.WARNING(line) if delta and delta > 0 else line)
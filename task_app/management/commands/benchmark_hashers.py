@@ -0,0 +1,93 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+
+from task_app.hashers import HASHERS, hasher_available
+
+
+# Candidate costs per algorithm for --sweep, in increasing cost
+SWEEPS = {
+    "argon2": [{"time_cost": t, "memory_cost": m, "parallelism": 1}
+               for m, t in ((19456, 1), (19456, 2), (47104, 1), (19456, 3), (47104, 2), (65536, 2), (65536, 3))],
+    "scrypt": [{"work_factor": 2**n, "block_size": 8, "parallelism": 1} for n in (14, 15, 16, 17)],
+    "bcrypt": [{"rounds": r} for r in (10, 11, 12, 13, 14)],
+    "pbkdf2": [{"iterations": i} for i in (210000, 600000, 1000000)],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time password hashing with each hasher on this host, at the configured cost or, "
+        "with --sweep, at a range of costs, and show which fit a login latency budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("algorithms", nargs="*", help=f"Only these hashers: {', '.join(sorted(HASHERS))}.")
+        parser.add_argument("--sweep", action="store_true", help="Try a range of costs instead of the configured one.")
+        parser.add_argument("--runs", type=int, default=5, help="Hashes per setting (default 5); the median is kept.")
+        parser.add_argument("--budget", type=float, default=250.0, help="Login hashing budget in ms (default 250).")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        names = options["algorithms"] or sorted(HASHERS)
+        unknown = set(names) - set(HASHERS)
+        if unknown:
+            raise CommandError(f"Unknown hasher(s): {', '.join(sorted(unknown))}.")
+        results = []
+        for name in names:
+            settings_to_try = SWEEPS[name] if options["sweep"] else [{}]
+            for params in settings_to_try:
+                results.append(self.measure(name, params, options["runs"], options["budget"]))
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "budget_ms": options["budget"],
+                "preferred": get_hasher("default").algorithm,
+                "results": results,
+            }))
+            return
+        self.stdout.write(f"Preferred hasher: {get_hasher('default').algorithm}; budget {options['budget']:.0f} ms")
+        for row in results:
+            if row["ms"] is None:
+                self.stdout.write(f"{row['hasher']:<8} unavailable: {row['error']}")
+                continue
+            cost = ", ".join(f"{key}={value}" for key, value in row["params"].items())
+            verdict = "fits" if row["fits"] else "too slow"
+            self.stdout.write(f"{row['hasher']:<8} {row['ms']:>9.1f} ms  {verdict:<8}  {cost}")
+        best = self.strongest_fitting(results)
+        for name, row in best.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"Strongest {name} cost within budget: {row['params']} ({row['ms']:.1f} ms)"
+            ))
+
+    def measure(self, name, params, runs, budget):
+        try:
+            hasher = HASHERS[name](**params)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        row = {"hasher": name, "params": hasher.cost(), "ms": None, "fits": False, "error": ""}
+        if not hasher_available(hasher):
+            row["error"] = f"{hasher.library} is not installed"
+            return row
+        salt = hasher.salt()
+        hasher.encode("warm-up password", salt)
+        timings = []
+        for i in range(max(runs, 1)):
+            start = time.perf_counter()
+            hasher.encode(f"benchmark password {i}", salt)
+            timings.append((time.perf_counter() - start) * 1000)
+        row["ms"] = round(statistics.median(timings), 2)
+        row["fits"] = row["ms"] <= budget
+        return row
+
+    @staticmethod
+    def strongest_fitting(results):
+        # Sweeps run in increasing cost, so the last fitting row wins
+        best = {}
+        for row in results:
+            if row["fits"]:
+                best[row["hasher"]] = row
+        return best
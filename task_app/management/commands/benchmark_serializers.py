@@ -0,0 +1,105 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from task_app.fast_serializers import FastSerializer
+from task_app.models import *
+from task_app.renderers import FastJSONRenderer, orjson
+from task_app.seeding import seed
+from task_app.serializers import CommentSerializer, ProjectMemberSerializer, ProjectSerializer, TaskSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization (query + serialize + render) through the DRF serializers "
+        "and JSONRenderer against FastSerializer and FastJSONRenderer on seeded rows (rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows per model (default 10000).")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per path; the best is kept.")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        results = []
+        try:
+            # The fast path is measured whether or not FAST_SERIALIZATION is enabled here
+            with transaction.atomic(), override_settings(FAST_SERIALIZATION={"ENABLED": True}):
+                self.seed(rows)
+                for name, serializer_class, queryset in self.cases():
+                    results.append(self.compare(name, serializer_class, queryset, repeat))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"rows": rows, "orjson": orjson is not None, "results": results}))
+            return
+        self.stdout.write(f"{rows} rows per model, best of {repeat}, orjson {'on' if orjson else 'off'}")
+        self.stdout.write(f"{'serializer':<24}{'drf ms':>10}{'fast ms':>10}{'speedup':>9}  identical")
+        for row in results:
+            self.stdout.write(
+                f"{row['serializer']:<24}{row['drf_ms']:>10.1f}{row['fast_ms']:>10.1f}"
+                f"{row['speedup']:>8.1f}x  {'yes' if row['identical'] else 'NO'}"
+            )
+
+    def seed(self, rows):
+        people = seed(users=20, projects=1, members_per_project=5, tasks_per_project=rows,
+                      comments_per_task=1, prefix="bench")["users"]
+        projects = Project.objects.bulk_create([
+            Project(name=f"bench extra {i}", description="Synthetic project", owner=people[i % len(people)])
+            for i in range(rows - 1)
+        ], batch_size=1000)
+        ProjectMember.objects.bulk_create([
+            ProjectMember(project=project, user=people[(i + 1) % len(people)])
+            for i, project in enumerate(projects)
+        ], batch_size=1000)
+
+    def cases(self):
+        return [
+            ("TaskSerializer", TaskSerializer, Task.objects.order_by("id")),
+            ("CommentSerializer", CommentSerializer, Comment.objects.order_by("id")),
+            ("ProjectSerializer", ProjectSerializer, Project.objects.order_by("id")),
+            ("ProjectMemberSerializer", ProjectMemberSerializer, ProjectMember.objects.order_by("id")),
+        ]
+
+    def compare(self, name, serializer_class, queryset, repeat):
+        fast = FastSerializer.compile(serializer_class())
+        if fast is None:
+            raise CommandError(f"{name} cannot use the fast path.")
+
+        def drf():
+            return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+        def fast_path():
+            return FastJSONRenderer().render(fast.serialize(queryset.values(*fast.columns)))
+
+        drf_ms, drf_bytes = self.best(drf, repeat)
+        fast_ms, fast_bytes = self.best(fast_path, repeat)
+        return {
+            "serializer": name,
+            "rows": queryset.count(),
+            "drf_ms": round(drf_ms, 2),
+            "fast_ms": round(fast_ms, 2),
+            "speedup": round(drf_ms / fast_ms, 2) if fast_ms else None,
+            "bytes": len(drf_bytes),
+            "identical": drf_bytes == fast_bytes,
+        }
+
+    @staticmethod
+    def best(func, repeat):
+        timings, output = [], None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            output = func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings), output
@@ -0,0 +1,65 @@
+import fnmatch
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import TestCase
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from task_app.benchmark import SCENARIOS
+from task_app.query_budget import measure_budgets
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every viewset query_budget: run the benchmark scenarios of budgeted actions against data sets "
+        "of several sizes in a throwaway test database, and fail if a query count grows with the data "
+        "or exceeds its budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help="Benchmark scenario names or globs (default: all).")
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 20],
+                            help="Rows per list in each data set (default 1 5 20).")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        patterns = options["scenarios"] or ["*"]
+        names = [name for name in SCENARIOS if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+        if not names:
+            raise CommandError(f"No scenario matches {' '.join(patterns)}.")
+        sizes = sorted(set(options["sizes"]))
+        if len(sizes) < 2:
+            raise CommandError("Give at least two --sizes to compare.")
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            # The harness counts for itself; caches would hide queries
+            with override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False},
+                                   QUERY_BUDGET={"ENABLED": False}):
+                rows = measure_budgets(names, sizes, TestCase.captureOnCommitCallbacks)
+        finally:
+            request_logger.setLevel(level)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        failed = [row for row in rows if row["verdict"] not in ("ok", "no budget")]
+        if options["json"]:
+            self.stdout.write(json.dumps({"sizes": sizes, "results": rows}, indent=2))
+        else:
+            # warm/cold counts per size
+            header = "".join(f"{f'n={size}':>8}" for size in sizes)
+            self.stdout.write(f"{'scenario':<32}{'action':<34}{'budget':>7}{header}  verdict")
+            for row in rows:
+                counts = "".join(f"{'%s/%s' % (row['queries'][size], row['cold'][size]):>8}" for size in sizes)
+                line = (f"{row['scenario']:<32}{row['viewset'] + '.' + row['action']:<34}"
+                        f"{'-' if row['budget'] is None else row['budget']:>7}{counts}  {row['verdict']}")
+                self.stdout.write(self.style.ERROR(line) if row in failed else line)
+        if failed:
+            raise CommandError(f"{len(failed)} scenario(s) failed their query budget.")
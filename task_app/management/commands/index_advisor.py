@@ -0,0 +1,78 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from task_app.models import *
+from task_app.query_shapes import QUERY_SHAPES
+from task_app.seeding import seed
+
+
+# "SCAN task_app_task" is a full scan on SQLite; "SCAN ... USING INDEX" walks
+# an index in order and "SCAN ... VIRTUAL TABLE INDEX" is an FTS5 lookup.  PostgreSQL reports "Seq Scan on <table>".
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (\w+)(?! USING (?:COVERING )?INDEX| VIRTUAL TABLE INDEX)(?:\s|$)"),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the registered API query shapes and report the ones that hit a full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument("shapes", nargs="*", help="Only check these query shapes.")
+        parser.add_argument(
+            "--seed", type=int, default=0, metavar="TASKS",
+            help="Seed this many synthetic tasks per project first (rolled back afterwards).",
+        )
+        parser.add_argument("--fail-on-scan", action="store_true",
+                            help="Exit with an error if any shape does a full scan.")
+        parser.add_argument("--verbose-plan", action="store_true", help="Print the full query plan.")
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"index_advisor does not understand {connection.vendor} query plans.")
+
+        names = options["shapes"] or list(QUERY_SHAPES)
+        unknown = set(names) - set(QUERY_SHAPES)
+        if unknown:
+            raise CommandError(f"Unknown query shape(s): {', '.join(sorted(unknown))}")
+
+        scans = []
+        try:
+            with transaction.atomic():
+                if options["seed"]:
+                    seed(tasks_per_project=options["seed"], prefix="advisor")
+                    if connection.vendor == "sqlite":
+                        with connection.cursor() as cursor:
+                            cursor.execute("ANALYZE")
+                ctx = self.sample_context()
+                for name in names:
+                    plan = QUERY_SHAPES[name](ctx).explain()
+                    tables = sorted(set(pattern.findall(plan)))
+                    if tables:
+                        scans.append(name)
+                        self.stdout.write(self.style.WARNING(f"FULL SCAN  {name}: {', '.join(tables)}"))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"ok         {name}"))
+                    if options["verbose_plan"]:
+                        self.stdout.write(plan)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{len(names) - len(scans)}/{len(names)} query shapes use an index.")
+        if scans and options["fail_on_scan"]:
+            raise CommandError(f"Full table scans in: {', '.join(scans)}")
+
+    def sample_context(self):
+        task = Task.objects.select_related("project", "assigned_to").order_by("id").first()
+        if task is None:
+            raise CommandError("The database has no tasks; pass --seed to generate some.")
+        user = task.assigned_to or task.project.owner
+        return {"task": task, "project": task.project, "user": user}
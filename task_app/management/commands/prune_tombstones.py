@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from task_app.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync tombstones older than --days; older sync tokens then get a 410."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Keep tombstones this many days (default 30).")
+        parser.add_argument("project_ids", nargs="*", type=int, help="Only prune these projects.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        pruned = prune_tombstones(before, options["project_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} tombstones."))
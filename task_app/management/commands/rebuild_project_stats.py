@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from task_app.stats import rebuild_project_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the ProjectStats counters from the task and comment tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_ids", nargs="*", type=int, help="Only rebuild these projects.")
+
+    def handle(self, *args, **options):
+        rows = rebuild_project_stats(options["project_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt project stats ({rows} counter rows)."))
@@ -0,0 +1,117 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from task_app.jobs import claim_jobs, execute, fail, requeue_stale, schedule_periodic
+
+
+def _init_process():
+    # Forked children inherit the parent's settings; spawned ones start cold
+    if not apps.ready:
+        django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (notifications, overdue sweeps, project purges). "
+        "Jobs run in a pool of --concurrency processes; --concurrency 1 runs them in this process."
+    )
+
+    def add_arguments(self, parser):
+        jobs = getattr(settings, "JOBS", {})
+        parser.add_argument("--concurrency", type=int, default=jobs.get("CONCURRENCY", os.cpu_count() or 1),
+                            help="Jobs run at once (default JOBS['CONCURRENCY'] or the CPU count).")
+        parser.add_argument("--poll", type=float, default=jobs.get("POLL_INTERVAL", 1.0),
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.poll = options["poll"]
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        requeue_stale()
+        schedule_periodic()
+        concurrency = max(options["concurrency"], 1)
+        self.stdout.write(f"Worker {self.worker} running with concurrency {concurrency}.")
+        if concurrency == 1:
+            ran = self.run_inline(options["burst"])
+        else:
+            ran = self.run_pool(concurrency, options["burst"])
+        self.stdout.write(self.style.SUCCESS(f"Worker {self.worker} stopped after {ran} jobs."))
+
+    def stop(self, signum, frame):
+        # Finish the jobs in hand, claim nothing new
+        self.stopping = True
+
+    def housekeeping(self, state):
+        if time.monotonic() - state.get("stale_checked", 0) > 60:
+            requeue_stale()
+            state["stale_checked"] = time.monotonic()
+
+    def run_inline(self, burst):
+        ran, state = 0, {"stale_checked": time.monotonic()}
+        while not self.stopping:
+            close_old_connections()
+            self.housekeeping(state)
+            claimed = claim_jobs(self.worker, 1)
+            if not claimed:
+                if burst:
+                    break
+                time.sleep(self.poll)
+                continue
+            execute(claimed[0].pk)
+            ran += 1
+        return ran
+
+    def run_pool(self, concurrency, burst):
+        ran, state = 0, {"stale_checked": time.monotonic()}
+        in_flight = {}
+        pool = self.new_pool(concurrency)
+        try:
+            while not (self.stopping and not in_flight):
+                close_old_connections()
+                self.housekeeping(state)
+                free = 0 if self.stopping else concurrency - len(in_flight)
+                for claimed in claim_jobs(self.worker, free) if free else []:
+                    in_flight[pool.submit(execute, claimed.pk)] = claimed
+                if not in_flight:
+                    if burst:
+                        break
+                    time.sleep(self.poll)
+                    continue
+                done, _ = wait(in_flight, timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    claimed = in_flight.pop(future)
+                    ran += 1
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        # The process running it died; retry it and start a fresh pool
+                        fail(claimed, "Worker process died")
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        for other in in_flight.values():
+                            fail(other, "Worker process died")
+                        in_flight.clear()
+                        pool = self.new_pool(concurrency)
+                        break
+        finally:
+            pool.shutdown(wait=True)
+        return ran
+
+    @staticmethod
+    def new_pool(concurrency):
+        # Children must not share the parent's database connections
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process)
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q, Value
+
+from .models import *
+
+
+# Pseudo-role for the project owner; owners are not necessarily ProjectMember rows.
+OWNER = "owner"
+
+
+class MembershipResolver:
+    """
+    Resolves {project_id: role} for a user with one query, cached in a
+    process-local LRU keyed by user id.
+
+    Entries expire after `ttl` seconds and are dropped eagerly by the
+    ProjectMember/Project signals in task_app/signals.py.  The TTL bounds
+    how stale another worker process can be, since those signals only reach
+    the process that made the change.  A load that an invalidation overtook
+    is returned but not cached (see store()).
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidation sequence: the last one per user (bounded like the
+        # entries), and the newest one forgotten when a user was evicted
+        self._seq = 0
+        self._invalidated = OrderedDict()
+        self._forgotten = 0
+
+    def get(self, user_id):
+        roles = self.lookup(user_id)
+        if roles is None:
+            started = self.generation()
+            roles = self.store(user_id, self.collect(self.roles_queryset(user_id)), started)
+        return roles
+
+    async def aget(self, user_id):
+        """get() for async callers; a cache miss is loaded through the async ORM."""
+        roles = self.lookup(user_id)
+        if roles is None:
+            started = self.generation()
+            rows = [row async for row in self.roles_queryset(user_id)]
+            roles = self.store(user_id, self.collect(rows), started)
+        return roles
+
+    def lookup(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        return None
+
+    def generation(self):
+        """Take before loading roles from the database; pass to store()."""
+        with self._lock:
+            return self._seq
+
+    def store(self, user_id, roles, started=None):
+        """Cache `roles`, unless the user was invalidated since `started` (the rows may predate the change)."""
+        with self._lock:
+            if started is not None and self._invalidated.get(user_id, self._forgotten) > started:
+                return roles
+            self._entries[user_id] = (time.monotonic() + self.ttl, roles)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return roles
+
+    @staticmethod
+    def roles_queryset(user_id):
+        # Projects being deleted (task_app/deletion.py) grant nothing
+        memberships = ProjectMember.objects.filter(
+            user_id=user_id, project__deleted_at__isnull=True
+        ).values_list("project_id", "role")
+        owned = Project.objects.filter(owner_id=user_id, deleted_at__isnull=True).values_list("id", Value(OWNER))
+        return memberships.union(owned, all=True)
+
+    @staticmethod
+    def collect(rows):
+        roles = {}
+        for project_id, role in rows:
+            if roles.get(project_id) != OWNER:
+                roles[project_id] = role
+        return roles
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._seq += 1
+            self._invalidated[user_id] = self._seq
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > self.maxsize:
+                _, seq = self._invalidated.popitem(last=False)
+                self._forgotten = max(self._forgotten, seq)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seq += 1
+            self._invalidated.clear()
+            self._forgotten = self._seq
+
+
+_config = getattr(settings, "MEMBERSHIP_CACHE", {})
+resolver = MembershipResolver(
+    maxsize=_config.get("MAXSIZE", 10000),
+    ttl=_config.get("TTL", 60),
+)
+
+
+def get_project_roles(request):
+    """{project_id: role} for request.user, resolved at most once per request."""
+    http_request = getattr(request, "_request", request)
+    roles = getattr(http_request, "_project_roles", None)
+    if roles is None:
+        user = request.user
+        roles = resolver.get(user.pk) if user and user.is_authenticated else {}
+        http_request._project_roles = roles
+    return roles
+
+
+async def aget_project_roles(request):
+    """get_project_roles() for async views."""
+    http_request = getattr(request, "_request", request)
+    roles = getattr(http_request, "_project_roles", None)
+    if roles is None:
+        user = request.user
+        roles = await resolver.aget(user.pk) if user and user.is_authenticated else {}
+        http_request._project_roles = roles
+    return roles
+
+
+def get_project_role(request, project_id):
+    return get_project_roles(request).get(project_id)
+
+
+def has_project_role(request, project_id, *roles):
+    """True if the user has any of `roles` on the project (any role if none given)."""
+    role = get_project_role(request, project_id)
+    if role is None:
+        return False
+    return not roles or role in roles
+
+
+def is_project_member(request, project_id):
+    # Owners count as members even without a ProjectMember row
+    return has_project_role(request, project_id)
+
+
+def is_project_owner(request, project_id):
+    return has_project_role(request, project_id, OWNER)
+
+
+def filter_visible(queryset, request, project="", assignee=None):
+    """
+    Restrict `queryset` to rows of projects the user owns or is a member of,
+    and with `assignee` also to rows assigned to them; superusers see all.
+    `project` is the lookup prefix of the row's project ("" for projects
+    themselves, "project__" for tasks).
+
+    One predicate for the database: `project_id IN (...)` from the cached
+    role map, served by the per-project indexes, so a list costs what the
+    user's own projects hold.  Past INLINE_PROJECTS projects the ids come
+    from subqueries instead, driven by member_user_project_idx and the owner
+    index (a correlated EXISTS would be checked against every row).
+    """
+    user = request.user
+    if user.is_superuser:
+        return queryset
+    roles = get_project_roles(request)
+    if len(roles) <= _config.get("INLINE_PROJECTS", 1000):
+        visible = Q(**{f"{project}id__in": sorted(roles)})
+    else:
+        member = ProjectMember.objects.filter(user_id=user.pk, project__deleted_at__isnull=True).values("project_id")
+        owned = Project.objects.filter(owner_id=user.pk, deleted_at__isnull=True).values("id")
+        visible = Q(**{f"{project}id__in": member}) | Q(**{f"{project}id__in": owned})
+    if assignee:
+        visible |= Q(**{assignee: user.pk})
+    return queryset.filter(visible)
@@ -0,0 +1,399 @@
+import bisect
+import cProfile
+import hmac
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, JsonResponse, QueryDict
+from rest_framework import exceptions
+
+from .authentication import ClaimsJWTAuthentication
+
+
+# Per-route request metrics, kept in process memory and served at /metrics
+# in the Prometheus text format (each worker process reports its own).
+# The hot path is a few perf_counter() calls, one ContextVar lookup per
+# query and a locked bucket increment per histogram.
+
+def _config():
+    return getattr(settings, "METRICS", {})
+
+
+# Per-request counters; None outside an instrumented request
+_current = ContextVar("request_metrics", default=None)
+# Open count_queries() blocks
+_counters = ContextVar("query_counters", default=())
+
+
+class _RequestMetrics:
+    __slots__ = ("queries", "db_seconds", "render_seconds", "sql")
+
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.sql = [] if keep_sql else None
+
+
+# ----- collectors -----
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.values[labels] += amount
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), then the sum
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self.series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else _number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUTE = ("route", "method")
+
+REQUESTS = Counter("http_requests_total", "Requests by route, method and status.", ROUTE + ("status",))
+DURATION = Histogram("http_request_duration_seconds", "Time to build the response.", ROUTE, SECONDS)
+QUERIES = Histogram("http_request_db_queries", "Database queries per request.", ROUTE,
+                    (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+DB_TIME = Histogram("http_request_db_duration_seconds", "Time spent in database queries.", ROUTE, SECONDS)
+RENDER_TIME = Histogram("http_request_render_duration_seconds",
+                        "Time spent serializing the response body (renderer).", ROUTE, SECONDS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size (streamed bodies are not counted).",
+                          ROUTE, (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+
+COLLECTORS = [REQUESTS, DURATION, QUERIES, DB_TIME, RENDER_TIME, RESPONSE_SIZE]
+
+
+def expose():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for collector in COLLECTORS:
+        lines.extend(collector.expose())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    for collector in COLLECTORS:
+        collector.reset()
+
+
+# ----- hooks -----
+class QueryCount:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+@contextmanager
+def count_queries():
+    """Count the queries run inside the block, on any connection or sync_to_async thread."""
+    counter = QueryCount()
+    token = _counters.set(_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _counters.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper on every connection: counts and times queries of instrumented requests."""
+    for counter in _counters.get():
+        counter.count += 1
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        state.queries += 1
+        state.db_seconds += elapsed
+        if state.sql is not None:
+            state.sql.append((sql, elapsed))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Fires on every (re)connect of a connection object; install once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure_render():
+    """Count the enclosed rendering as the current request's serialization time."""
+    state = _current.get()
+    if state is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        state.render_seconds += time.perf_counter() - start
+
+
+# ----- middleware -----
+class MetricsMiddleware:
+    """
+    Records every request into the histograms above, labelled with its
+    resolved route name (e.g. "tasks-list") and method.
+
+    `?_profile=1` on a request authenticated as a superuser runs it under
+    cProfile with every SQL statement kept, and answers with that breakdown
+    as JSON instead of the normal response.  Profiled requests are left out
+    of the histograms.  Under ASGI only the event loop thread is profiled
+    (ORM calls made through sync_to_async show up in the SQL list only).
+    """
+
+    sync_capable = True
+    async_capable = True
+    authenticator = ClaimsJWTAuthentication()
+
+    def __init__(self, get_response):
+        if not _config().get("ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.wants_profile(request) and self.is_superuser(request):
+            return self.profile(request)
+        state = _RequestMetrics()
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, state, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if self.wants_profile(request) and await self.ais_superuser(request):
+            return await self.aprofile(request)
+        state = _RequestMetrics()
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, state, time.perf_counter() - start)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns
+        state = _current.get()
+        if state is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                state.render_seconds += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def record(request, response, state, elapsed):
+        labels = (route_name(request), request.method)
+        REQUESTS.inc(labels + (str(response.status_code),))
+        DURATION.observe(labels, elapsed)
+        QUERIES.observe(labels, state.queries)
+        DB_TIME.observe(labels, state.db_seconds)
+        RENDER_TIME.observe(labels, state.render_seconds)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(labels, len(response.content))
+
+    # ----- ?_profile=1 -----
+    @staticmethod
+    def wants_profile(request):
+        return _config().get("PROFILE", True) and request.GET.get("_profile") == "1"
+
+    def is_superuser(self, request):
+        try:
+            result = self.authenticator.authenticate(request)
+        except exceptions.APIException:
+            return False
+        return result is not None and result[0].is_superuser
+
+    async def ais_superuser(self, request):
+        try:
+            result = await self.authenticator.aauthenticate(request)
+        except exceptions.APIException:
+            return False
+        return result is not None and result[0].is_superuser
+
+    def profile(self, request):
+        strip_profile_param(request)
+        state, profiler = _RequestMetrics(keep_sql=True), cProfile.Profile()
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _current.reset(token)
+        return self.profile_report(request, response, state, profiler, time.perf_counter() - start)
+
+    async def aprofile(self, request):
+        strip_profile_param(request)
+        state, profiler = _RequestMetrics(keep_sql=True), cProfile.Profile()
+        token = _current.set(state)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _current.reset(token)
+        return self.profile_report(request, response, state, profiler, time.perf_counter() - start)
+
+    @staticmethod
+    def profile_report(request, response, state, profiler, elapsed):
+        limit = _config().get("PROFILE_LIMIT", 40)
+        repeated = defaultdict(lambda: [0, 0.0])
+        for sql, seconds in state.sql:
+            repeated[sql][0] += 1
+            repeated[sql][1] += seconds
+        stats = pstats.Stats(profiler).stats
+        functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return JsonResponse({
+            "route": route_name(request),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "total_ms": round(elapsed * 1000, 3),
+            "db_ms": round(state.db_seconds * 1000, 3),
+            "render_ms": round(state.render_seconds * 1000, 3),
+            "response_bytes": None if response.streaming else len(response.content),
+            "query_count": state.queries,
+            "queries": [{"sql": sql, "ms": round(seconds * 1000, 3)} for sql, seconds in state.sql],
+            "repeated_queries": [
+                {"sql": sql, "count": count, "ms": round(seconds * 1000, 3)}
+                for sql, (count, seconds) in sorted(repeated.items(), key=lambda item: -item[1][0])
+                if count > 1
+            ],
+            "profile": [
+                {
+                    "function": f"{filename}:{line}({name})",
+                    "calls": calls,
+                    "own_ms": round(own * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+                for (filename, line, name), (_, calls, own, cumulative, _) in functions
+            ],
+        })
+
+
+def route_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or "unnamed"
+
+
+def strip_profile_param(request):
+    # Keep _profile out of cache keys, pagination links and filters
+    query = request.GET.copy()
+    query.pop("_profile", None)
+    request.META["QUERY_STRING"] = query.urlencode()
+    request.GET = QueryDict(request.META["QUERY_STRING"])
+
+
+# ----- /metrics -----
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; needs "Authorization: Bearer <METRICS["TOKEN"]>".
+    Without a token it is open under DEBUG only, and otherwise not served (404).
+    """
+    token = _config().get("TOKEN")
+    if not token and not settings.DEBUG:
+        return HttpResponse("Not Found\n", status=404, content_type="text/plain")
+    if token and not hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"):
+        return HttpResponse("Unauthorized\n", status=401, content_type="text/plain")
+    return HttpResponse(expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
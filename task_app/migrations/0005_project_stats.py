@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    from task_app.stats import rebuild_project_stats
+    rebuild_project_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_app', '0004_task_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('tasks', 'Tasks'), ('comments', 'Comments'), ('status', 'Status'), ('priority', 'Priority'), ('assignee', 'Assignee')], max_length=10)),
+                ('key', models.CharField(blank=True, max_length=32)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'project stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('due_date__isnull', False), models.Q(('status', 'done'), _negated=True)), fields=['project', 'due_date'], name='task_project_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='projectstats',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='task_app.project'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='projectstats',
+            unique_together={('project', 'dimension', 'key')},
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
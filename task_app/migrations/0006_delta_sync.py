@@ -0,0 +1,88 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_sync_versions(apps, schema_editor):
+    # Spelled out against this migration's schema: task_app.sync.stamp_unversioned()
+    # follows the current one (Comment.project, SyncCounter)
+    Project = apps.get_model("task_app", "Project")
+    Task = apps.get_model("task_app", "Task")
+    Comment = apps.get_model("task_app", "Comment")
+    for project_id in list(Project.objects.values_list("pk", flat=True)):
+        tasks = list(Task.objects.filter(project_id=project_id).only("pk").order_by("pk"))
+        comments = list(Comment.objects.filter(task__project_id=project_id).only("pk").order_by("pk"))
+        for version, row in enumerate(tasks + comments, 1):
+            row.sync_version = version
+        Task.objects.bulk_update(tasks, ["sync_version"], batch_size=1000)
+        Comment.objects.bulk_update(comments, ["sync_version"], batch_size=1000)
+        Project.objects.filter(pk=project_id).update(sync_version=len(tasks) + len(comments))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_app', '0005_project_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('sync_version', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='sync_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='sync_floor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='sync_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='sync_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['task', 'sync_version'], name='comment_task_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'sync_version'], name='task_project_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='task_app.project'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['project', 'sync_version'], name='tombstone_project_sync_idx'),
+        ),
+        migrations.RunPython(backfill_sync_versions, migrations.RunPython.noop),
+    ]
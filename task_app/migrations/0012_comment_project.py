@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_comment_projects(apps, schema_editor):
+    Comment = apps.get_model("task_app", "Comment")
+    Task = apps.get_model("task_app", "Task")
+    Comment.objects.update(project_id=Subquery(Task.objects.filter(pk=OuterRef("task_id")).values("project_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_app', '0011_edit_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='project',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='task_app.project'),
+        ),
+        migrations.RunPython(backfill_comment_projects, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='project',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='task_app.project'),
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_task_sync_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', 'sync_version'], name='comment_project_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_sync_versions(apps, schema_editor):
+    Project = apps.get_model("task_app", "Project")
+    SyncCounter = apps.get_model("task_app", "SyncCounter")
+    SyncCounter.objects.bulk_create(
+        [SyncCounter(project_id=pk, value=value)
+         for pk, value in Project.objects.filter(sync_version__gt=0).values_list("pk", "sync_version")],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_app', '0012_comment_project'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sync_counter', serialize=False, to='task_app.project')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(copy_sync_versions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='project',
+            name='sync_version',
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
@@ -46,6 +47,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     is_active   = models.BooleanField(default=True)
     is_staff    = models.BooleanField(default=False)
+    # Set when the account's deletion was requested; the rows go in the background (task_app/deletion.py)
+    deleted_at  = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
@@ -66,10 +69,162 @@ class Project(models.Model):
         on_delete=models.CASCADE,
     )
     created_at  = models.DateTimeField(auto_now_add=True)
+    # Delta sync (task_app/sync.py): the version up to which tombstones have
+    # been pruned.  The versions themselves come from SyncCounter.
+    sync_floor   = models.BigIntegerField(default=0)
+    # Set when deletion was requested; the project is hidden and purged in the background
+    deleted_at   = models.DateTimeField(null=True, blank=True)
+
+    # Moved only in the database (prune_tombstones)
+    COUNTER_FIELDS = ("sync_floor",)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # A saved instance never writes its (possibly stale) counters back
+        if not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs["update_fields"] = [name for name in update_fields if name not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
+
+
+class SyncCounter(models.Model):
+    """
+    Last sync version handed out in a project.  A table of its own rather
+    than a column of Project: allocating takes this row's lock until commit,
+    and renaming the project, changing its members or marking it deleted
+    must not queue behind every task write in it (nor those behind them).
+    """
+    project = models.OneToOneField(
+        Project, primary_key=True, related_name="sync_counter", on_delete=models.CASCADE
+    )
+    value   = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project_id} at v{self.value}"
+
+
+def allocate_sync_versions(project_id, count=1):
+    """
+    Reserve `count` consecutive sync versions of a project; returns a range.
+
+    Must run inside the transaction that writes the versioned rows: the
+    counter's row lock then makes versions commit in order, so a client
+    that has seen version N can never miss a later commit below N.  Only
+    writers of the same project wait on each other, and only from here to
+    their commit.
+    """
+    connection = connections[router.db_for_write(SyncCounter)]
+    if connection.vendor in ("postgresql", "sqlite") and connection.features.can_return_columns_from_insert:
+        # One round trip, creating the counter on first use
+        table = connection.ops.quote_name(SyncCounter._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (project_id, value) VALUES (%s, %s) "
+                f"ON CONFLICT (project_id) DO UPDATE SET value = {table}.value + EXCLUDED.value RETURNING value",
+                [project_id, count],
+            )
+            last = cursor.fetchone()[0]
+    else:
+        SyncCounter.objects.get_or_create(project_id=project_id)
+        SyncCounter.objects.filter(pk=project_id).update(value=F("value") + count)
+        last = SyncCounter.objects.filter(pk=project_id).values_list("value", flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def current_sync_version(project_id):
+    """The last version handed out in a project (0 before the first write)."""
+    return SyncCounter.objects.filter(pk=project_id).values_list("value", flat=True).first() or 0
+
+
+class SyncVersionedModel(models.Model):
+    """Rows stamped with their project's next sync version on every save()."""
+    updated_at   = models.DateTimeField(auto_now=True)
+    sync_version = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def get_sync_project_id(self):
+        raise NotImplementedError
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "updated_at", "sync_version"}
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            self.sync_version = allocate_sync_versions(self.get_sync_project_id())[0]
+            super().save(*args, **kwargs)
+
+
+class VersionConflict(Exception):
+    """save() found the row at another version than the one it was read at."""
+
+
+class EditVersionedModel(models.Model):
+    """
+    Rows carrying an edit `version` for optimistic concurrency (ETag /
+    If-Match, see task_app/concurrency.py).  Unlike sync_version it counts
+    the row's own writes.  Saving a row read with its version is a
+    compare-and-swap:
+        UPDATE ... SET ..., version = <read> + 1 WHERE id = %s AND version = <read>
+    raising VersionConflict when another writer got there first; nothing is
+    locked, so concurrent writers never wait on each other.  Like an
+    IntegrityError, a conflict breaks an enclosing atomic block unless the
+    save has its own.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        if update_fields is not None:
+            if not update_fields:
+                return
+            kwargs["update_fields"] = {*update_fields, "version"}
+        if "version" not in self.__dict__:
+            # Read with only(): compare against the current version
+            self.refresh_from_db(fields=["version"])
+        self._expected_version = self.version
+        self.version += 1
+        try:
+            super().save(*args, **kwargs)
+        except BaseException:
+            self.version -= 1
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if not super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, True):
+            raise VersionConflict(f"{type(self).__name__} {pk_val} is no longer at version {expected}")
+        return True
+
+    @classmethod
+    def bulk_update_versioned(cls, rows, fields, **kwargs):
+        """bulk_update() that also advances every row's version, then reads the new versions back."""
+        for row in rows:
+            row.version = F("version") + 1
+        cls._default_manager.bulk_update(rows, [*fields, "version"], **kwargs)
+        versions = dict(cls._default_manager.filter(pk__in=[row.pk for row in rows]).values_list("pk", "version"))
+        for row in rows:
+            row.version = versions.get(row.pk)
+
 
 
 class ProjectMember(models.Model):
@@ -80,22 +235,28 @@ class ProjectMember(models.Model):
     project = models.ForeignKey(
         Project, related_name="members", on_delete=models.CASCADE
     )
+    # Indexed through member_user_project_idx below
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name="project_memberships",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=MEMBER)
 
     class Meta:
         unique_together = ("project", "user")
+        indexes = [
+            # a user's projects: the role map and filter_visible() (task_app/membership.py)
+            models.Index(fields=["user", "project"], name="member_user_project_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} ➜ {self.project} ({self.role})"
 
 
 
-class Task(models.Model):
+class Task(EditVersionedModel, SyncVersionedModel):
     TODO        = "todo"
     IN_PROGRESS = "in_progress"
     DONE        = "done"
@@ -127,12 +288,36 @@ class Task(models.Model):
     created_at   = models.DateTimeField(auto_now_add=True)
     due_date     = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "status"], name="task_project_status_idx"),
+            models.Index(fields=["assigned_to", "status"], name="task_assignee_status_idx"),
+            # keyset pagination: (created_at, id), globally and per project
+            models.Index(fields=["-created_at", "-id"], name="task_created_idx"),
+            models.Index(fields=["project", "-created_at", "-id"], name="task_project_created_idx"),
+            models.Index(fields=["project", "sync_version"], name="task_project_sync_idx"),
+            # overdue sweeps only ever look at unfinished tasks
+            models.Index(
+                fields=["due_date"],
+                name="task_open_due_idx",
+                condition=models.Q(due_date__isnull=False) & ~models.Q(status="done"),
+            ),
+            models.Index(
+                fields=["project", "due_date"],
+                name="task_project_open_due_idx",
+                condition=models.Q(due_date__isnull=False) & ~models.Q(status="done"),
+            ),
+        ]
+
     def __str__(self):
         return f"[{self.project}] {self.title}"
 
+    def get_sync_project_id(self):
+        return self.project_id
 
 
-class Comment(models.Model):
+
+class Comment(EditVersionedModel, SyncVersionedModel):
     task       = models.ForeignKey(
         Task, related_name="comments", on_delete=models.CASCADE
     )
@@ -141,7 +326,193 @@ class Comment(models.Model):
     )
     content    = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # The task's project, copied on save (and moved with the task, see
+    # task_app/signals.py) so delta sync reads one (project, sync_version) range
+    project    = models.ForeignKey(
+        Project, related_name="+", on_delete=models.CASCADE, db_index=False, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "-created_at", "-id"], name="comment_task_created_idx"),
+            models.Index(fields=["-created_at", "-id"], name="comment_created_idx"),
+            models.Index(fields=["project", "sync_version"], name="comment_project_sync_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} ➜ {self.task}"
 
+    def save(self, *args, **kwargs):
+        if self.project_id is None:
+            self.project_id = self.task.project_id
+        super().save(*args, **kwargs)
+
+    def get_sync_project_id(self):
+        return self.project_id
+
+
+
+
+class ProjectStats(models.Model):
+    """
+    Denormalized per-project counters, one row per (dimension, key):
+    ("tasks", ""), ("comments", ""), ("status", "todo"), ("priority", "high"),
+    ("assignee", "<user id>" or "").  Kept current by task_app/stats.py.
+    """
+    TASKS    = "tasks"
+    COMMENTS = "comments"
+    STATUS   = "status"
+    PRIORITY = "priority"
+    ASSIGNEE = "assignee"
+    DIMENSION_CHOICES = [
+        (TASKS, "Tasks"), (COMMENTS, "Comments"), (STATUS, "Status"),
+        (PRIORITY, "Priority"), (ASSIGNEE, "Assignee"),
+    ]
+
+    project   = models.ForeignKey(
+        Project, related_name="stats", on_delete=models.CASCADE
+    )
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key       = models.CharField(max_length=32, blank=True)
+    count     = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("project", "dimension", "key")
+        verbose_name_plural = "project stats"
+
+    def __str__(self):
+        return f"{self.project_id} {self.dimension}:{self.key} = {self.count}"
+
+
+
+class Tombstone(models.Model):
+    """A deleted task or comment, kept so delta sync can report the delete."""
+    TASK    = "task"
+    COMMENT = "comment"
+    KIND_CHOICES = [(TASK, "Task"), (COMMENT, "Comment")]
+
+    project      = models.ForeignKey(
+        Project, related_name="tombstones", on_delete=models.CASCADE
+    )
+    kind         = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id    = models.BigIntegerField()
+    sync_version = models.BigIntegerField()
+    deleted_at   = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "sync_version"], name="tombstone_project_sync_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at v{self.sync_version}"
+
+
+
+class Job(models.Model):
+    """
+    A unit of background work for `manage.py runworker` (task_app/jobs.py).
+
+    `name` picks the registered handler and `payload` holds its keyword
+    arguments.  Finished jobs are deleted; failed ones stay for inspection.
+    `key` makes a pending job unique (e.g. the periodic overdue sweep) and is
+    released when a worker picks the job up.
+    """
+    QUEUED  = "queued"
+    RUNNING = "running"
+    FAILED  = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    name         = models.CharField(max_length=100)
+    payload      = models.JSONField(default=dict, blank=True)
+    key          = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    status       = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts     = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at       = models.DateTimeField(default=timezone.now)
+    locked_by    = models.CharField(max_length=64, blank=True)
+    locked_at    = models.DateTimeField(null=True, blank=True)
+    last_error   = models.TextField(blank=True)
+    created_at   = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # workers poll for due jobs in run_at order
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+
+class Deletion(models.Model):
+    """Progress of a background project or user deletion (task_app/deletion.py)."""
+    PROJECT = "project"
+    USER    = "user"
+    KIND_CHOICES = [(PROJECT, "Project"), (USER, "User")]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE    = "done"
+    FAILED  = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    kind         = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id    = models.BigIntegerField()
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="requested_deletions",
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    status       = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total        = models.JSONField(default=dict, blank=True)   # rows to delete, counted when the purge starts
+    deleted      = models.JSONField(default=dict, blank=True)   # rows deleted so far
+    error        = models.TextField(blank=True)
+    created_at   = models.DateTimeField(auto_now_add=True)
+    finished_at  = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deletion ({self.status})"
+
+
+
+class InboxItem(models.Model):
+    """
+    One entry of a user's "my work" inbox (/me/inbox/): a task assigned to
+    them, or a comment on a task assigned to them.  Written by
+    task_app/inbox.py when tasks are (re)assigned and comments created, and
+    capped to the newest INBOX["MAX_ITEMS"] per user.
+    """
+    ASSIGNED = "assigned"
+    COMMENT  = "comment"
+    KIND_CHOICES = [(ASSIGNED, "Assigned"), (COMMENT, "Comment")]
+
+    # user and task are indexed through the composite indexes below
+    user       = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="inbox_items", on_delete=models.CASCADE, db_index=False
+    )
+    kind       = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # project is denormalized from the task so purges and hidden projects need no join
+    project    = models.ForeignKey(
+        Project, related_name="+", on_delete=models.CASCADE
+    )
+    task       = models.ForeignKey(
+        Task, related_name="+", on_delete=models.CASCADE, db_index=False
+    )
+    comment    = models.ForeignKey(
+        Comment, related_name="+", null=True, blank=True, on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # the inbox read: one range of (user, created_at, id), newest first
+            models.Index(fields=["user", "-created_at", "-id"], name="inbox_user_created_idx"),
+            # dropping a reassigned task from its previous assignee's inbox
+            models.Index(fields=["task", "user"], name="inbox_task_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} task {self.task_id}"
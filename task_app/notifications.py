@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .jobs import enqueue, enqueue_many, job
+from .models import *
+
+
+# Notifications are queued by the signals in task_app/signals.py and sent
+# by `manage.py runworker`, so requests only pay for the job INSERT.
+# Handlers re-read the rows: a task reassigned or a comment deleted before
+# the job runs sends nothing.
+
+def _config():
+    return getattr(settings, "NOTIFICATIONS", {})
+
+
+def notifications_enabled():
+    return _config().get("ENABLED", True)
+
+
+def sweep_interval():
+    return _config().get("OVERDUE_SWEEP_INTERVAL", 300)
+
+
+def queue_assignment_notices(tasks, chunk_size=500):
+    """Queue notices for tasks given a new assignee: one job per chunk, so bulk writes add one INSERT."""
+    if not notifications_enabled():
+        return
+    pairs = [[task.pk, task.assigned_to_id] for task in tasks]
+    if pairs:
+        enqueue_many("notify_task_assigned", [
+            {"assignments": pairs[i:i + chunk_size]} for i in range(0, len(pairs), chunk_size)
+        ])
+
+
+def queue_comment_notice(comment):
+    if notifications_enabled():
+        enqueue("notify_comment_created", {"comment_id": comment.pk})
+
+
+def deliver(messages):
+    """Send (subject, body, recipients) messages over one mail connection; errors make the job retry."""
+    from_email = _config().get("FROM_EMAIL") or settings.DEFAULT_FROM_EMAIL
+    datatuple = [(subject, body, from_email, recipients) for subject, body, recipients in messages if recipients]
+    return send_mass_mail(datatuple, fail_silently=False) if datatuple else 0
+
+
+@job("notify_task_assigned")
+def notify_task_assigned(assignments):
+    """`assignments` is [[task_id, user_id], ...]; tasks since reassigned or deleted are skipped."""
+    expected = dict(assignments)
+    tasks = Task.objects.select_related("project", "assigned_to").filter(pk__in=expected).order_by("pk")
+    deliver([
+        (
+            f"[{task.project.name}] You were assigned: {task.title}",
+            f"{task.title}\n\nStatus: {task.get_status_display()}\nPriority: {task.get_priority_display()}"
+            + (f"\nDue: {task.due_date:%Y-%m-%d %H:%M} UTC" if task.due_date else ""),
+            [task.assigned_to.email],
+        )
+        for task in tasks if task.assigned_to_id is not None and task.assigned_to_id == expected[task.pk]
+    ])
+
+
+@job("notify_comment_created")
+def notify_comment_created(comment_id):
+    comment = Comment.objects.select_related(
+        "user", "task__project__owner", "task__assigned_to"
+    ).filter(pk=comment_id).first()
+    if comment is None:
+        return
+    task = comment.task
+    recipients = {
+        user.email for user in (task.assigned_to, task.project.owner)
+        if user is not None and user.pk != comment.user_id
+    }
+    deliver([(
+        f"[{task.project.name}] New comment on {task.title}",
+        f"{comment.user.username} wrote:\n\n{comment.content}",
+        sorted(recipients),
+    )])
+
+
+@job("sweep_overdue_tasks", every=sweep_interval)
+def sweep_overdue_tasks(since=None):
+    """
+    One digest per assignee of the open tasks that fell due since the last
+    sweep.  Returns the next sweep's payload, so every task is reported
+    once even if the worker was down for a while.
+    """
+    now = timezone.now()
+    start = parse_datetime(since) if since else now - timedelta(seconds=sweep_interval())
+    overdue = Task.objects.filter(
+        due_date__isnull=False, due_date__gt=start, due_date__lte=now, assigned_to__isnull=False,
+    ).exclude(status=Task.DONE).select_related("project", "assigned_to").order_by("assigned_to_id", "due_date")
+
+    digests = {}
+    for task in overdue.iterator(chunk_size=500):
+        digests.setdefault(task.assigned_to, []).append(
+            f"- [{task.project.name}] {task.title} (due {task.due_date:%Y-%m-%d %H:%M} UTC)"
+        )
+    deliver([
+        (f"{len(lines)} task(s) are now overdue", "\n".join(lines), [user.email])
+        for user, lines in digests.items()
+    ])
+    return {"since": now.isoformat()}
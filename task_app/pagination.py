@@ -0,0 +1,175 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Opaque cursor pagination keyed on (ordering field, id), newest first by default.
+
+    Every page is fetched with a "WHERE (field, id) < (cursor)" seek instead
+    of an OFFSET, so page 10 000 costs the same as page 1.  Rows sharing a
+    value are tie-broken by id, which keeps the ordering total and stable
+    while rows are inserted between requests.
+
+    ?cursor=<opaque>      position to continue from (taken from next/previous)
+    ?page_size=<n>        rows per page, capped at max_page_size
+    ?ordering=<field>     any of the view's ordering_fields (via OrderingFilter);
+                          only the first field is used, NULLs always sort last
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = "-created_at"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching through the async ORM."""
+        page = self.get_page_queryset(queryset, request, view)
+        return self.set_page([row async for row in page])
+
+    def get_page_queryset(self, queryset, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field_name, descending = self.get_ordering(request, queryset, view)
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.reverse, self.position = self.decode_cursor(request)
+
+        # Walking backwards flips both the sort direction and where NULLs land
+        descending = descending != self.reverse
+        nulls_last = not self.reverse
+        queryset = queryset.order_by(*self.get_order_by(descending, nulls_last))
+        if self.position is not None:
+            queryset = queryset.filter(self.get_seek(self.position, descending, nulls_last))
+
+        # One extra row tells us whether another page exists without a COUNT(*)
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, self.position is not None
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """Return (field name, descending) from the view's OrderingFilter, if any."""
+        ordering = [self.ordering]
+        for backend in getattr(view, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+        first = ordering[0]
+        return first.lstrip("-"), first.startswith("-")
+
+    def get_order_by(self, descending, nulls_last):
+        if descending:
+            term, tie = F(self.field_name).desc, F("id").desc
+        else:
+            term, tie = F(self.field_name).asc, F("id").asc
+        if not self.field.null:
+            return term(), tie()
+        if nulls_last:
+            return term(nulls_last=True), tie()
+        return term(nulls_first=True), tie()
+
+    def get_seek(self, position, descending, nulls_last):
+        value, pk = position
+        after = "__lt" if descending else "__gt"
+        name = self.field_name
+        if value is None:
+            seek = Q(**{name + "__isnull": True, "id" + after: pk})
+            if not nulls_last:
+                seek |= Q(**{name + "__isnull": False})
+            return seek
+        seek = Q(**{name + after: value}) | Q(**{name: value, "id" + after: pk})
+        if self.field.null and nulls_last:
+            seek |= Q(**{name + "__isnull": True})
+        return seek
+
+    # ----- cursor encoding -----
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # A .values() row (task_app.fast_serializers.FastListMixin)
+            obj = SimpleNamespace(pk=obj[self.field.model._meta.pk.attname],
+                                  **{self.field.attname: obj[self.field.attname]})
+        value = self.field.value_from_object(obj)
+        value = None if value is None else self.field.value_to_string(obj)
+        raw = json.dumps([int(reverse), obj.pk, value], separators=(",", ":"))
+        return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            raw = urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8")
+            reverse, pk, value = json.loads(raw)
+            if reverse not in (0, 1) or not isinstance(pk, int):
+                raise ValueError(raw)
+            if value is not None:
+                value = self.field.to_python(value)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), (value, pk)
+
+    def get_link(self, obj, reverse):
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(obj, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,151 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.urls import resolve
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import count_queries
+
+logger = logging.getLogger(__name__)
+
+
+# Query budgets: a viewset declares the most queries each action may run,
+#     query_budget = {"list": 4, "retrieve": 3, "bulk:post": 13}
+# ("action:method" for an action serving several methods), counted over the whole request (authentication, permissions, the view and
+# its serializers).  Requests over budget log a warning; in strict mode
+# (development, CI) reads raise instead.  A write over budget has committed
+# by the time it is counted, so it is only logged, as an error: failing it
+# would answer 500 for a change that was made.  `manage.py
+# check_query_budgets` is the harness: it runs every benchmark scenario of a
+# budgeted action, cold and warm, against data sets of several sizes and
+# fails when a count grows with the data (an N+1) or exceeds the budget.
+
+def _config():
+    return getattr(settings, "QUERY_BUDGET", {})
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def lookup_budget(budgets, action, method):
+    """The budget for `action` served by `method`: "action:method", else "action"."""
+    return budgets.get(f"{action}:{method.lower()}", budgets.get(action))
+
+
+def check_query_budget(view, count):
+    """Warn about, or in strict mode raise for, a request of `view` that ran `count` queries."""
+    action = getattr(view, "action", None)
+    budget = lookup_budget(getattr(view, "query_budget", {}), action, view.request.method)
+    if budget is None or count <= budget:
+        return
+    message = f"{type(view).__name__}.{action} ran {count} queries (budget {budget})"
+    if not _config().get("STRICT", False):
+        logger.warning(message)
+    elif view.request.method not in SAFE_METHODS:
+        logger.error(message)
+    else:
+        raise QueryBudgetExceeded(message)
+
+
+class QueryBudgetMixin:
+    """Enforces the viewset's `query_budget` on every request it dispatches."""
+    query_budget = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        if not _config().get("ENABLED", True):
+            return super().dispatch(request, *args, **kwargs)
+        with count_queries() as counter:
+            response = super().dispatch(request, *args, **kwargs)
+        check_query_budget(self, counter.count)
+        return response
+
+
+# ----- harness -----
+class _Rollback(Exception):
+    pass
+
+
+def budget_for(path, method):
+    """(viewset class, action, budget or None) serving `method` on `path`; (None, None, None) for other views."""
+    func = resolve(path.split("?")[0]).func
+    actions = getattr(func, "actions", None)
+    if actions:
+        viewset, action = func.cls, actions.get(method.lower())
+    else:
+        # AsyncReadView mirrors a viewset action
+        view_class, initkwargs = getattr(func, "view_class", None), getattr(func, "view_initkwargs", {})
+        viewset = initkwargs.get("viewset_class", getattr(view_class, "viewset_class", None))
+        action = initkwargs.get("action", getattr(view_class, "action", None))
+    if viewset is None or not hasattr(viewset, "query_budget"):
+        return None, None, None
+    return viewset, action, lookup_budget(viewset.query_budget, action, method)
+
+
+def scale_for(size):
+    """A data set where every list the scenarios read has about `size` rows."""
+    return {"users": size + 5, "projects": size, "members_per_project": size,
+            "tasks_per_project": size, "comments_per_task": size}
+
+
+def measure_budgets(names, sizes, capture_on_commit):
+    """
+    Run each benchmark scenario twice per data set size and count its
+    queries: cold (caches and role maps cleared, as for a new worker or the
+    first write of a row) and warm.  Each size is seeded in its own
+    transaction, rolled back afterwards, so on_commit callbacks would never
+    run: `capture_on_commit(execute=True)` (TestCase.captureOnCommitCallbacks)
+    runs them, counted with the request as they are outside the harness.
+    Returns one row per scenario served by a viewset with a query_budget.
+    """
+    from .benchmark import SCENARIOS, BenchmarkData, Runner
+    from .membership import resolver
+
+    def measure(runner, scenario):
+        path, kwargs = runner.prepare(scenario)
+        with count_queries() as counter, capture_on_commit(execute=True):
+            response, _ = runner.send(scenario, path, kwargs)
+        return path, response.status_code, counter.count
+
+    rows = {}
+    for size in sizes:
+        try:
+            with transaction.atomic():
+                runner = Runner(BenchmarkData(**scale_for(size)))
+                for name in names:
+                    scenario = SCENARIOS[name]
+                    for alias in settings.CACHES:
+                        caches[alias].clear()
+                    resolver.clear()
+                    path, cold_status, cold = measure(runner, scenario)
+                    viewset, action, budget = budget_for(path, scenario.method)
+                    if viewset is None:
+                        continue
+                    _, status, warm = measure(runner, scenario)
+                    row = rows.setdefault(name, {
+                        "scenario": name, "viewset": viewset.__name__, "action": action,
+                        "budget": budget, "queries": {}, "cold": {}, "statuses": {},
+                    })
+                    row["queries"][size] = warm
+                    row["cold"][size] = cold
+                    row["statuses"][size] = [cold_status, status]
+                    row["expect"] = scenario.expect
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    for row in rows.values():
+        warm, cold = list(row["queries"].values()), list(row["cold"].values())
+        if any(status != row["expect"] for statuses in row["statuses"].values() for status in statuses):
+            row["verdict"] = "error"
+        elif len(set(warm)) > 1 or len(set(cold)) > 1:
+            row["verdict"] = "grows"
+        elif row["budget"] is None:
+            row["verdict"] = "no budget"
+        elif max(warm + cold) > row["budget"]:
+            row["verdict"] = "over budget"
+        else:
+            row["verdict"] = "ok"
+    return list(rows.values())
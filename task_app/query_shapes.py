@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import *
+from .search import full_text_search
+
+
+# Query shapes the API issues on its hot paths.  Each entry maps a name to a
+# callable that receives a sample row context (user, project, task) and
+# returns the queryset exactly as the view would build it.
+# `manage.py index_advisor` EXPLAINs every shape and flags full table scans,
+# so register new shapes here when adding list/filter endpoints.
+QUERY_SHAPES = {}
+
+
+def query_shape(name):
+    def register(func):
+        QUERY_SHAPES[name] = func
+        return func
+    return register
+
+
+@query_shape("tasks-list")
+def tasks_list(ctx):
+    return Task.objects.order_by("-created_at", "-id")[:51]
+
+
+@query_shape("project-tasks-list")
+def project_tasks_list(ctx):
+    return Task.objects.filter(project=ctx["project"]).order_by("-created_at", "-id")[:51]
+
+
+@query_shape("tasks-by-project-status")
+def tasks_by_project_status(ctx):
+    return Task.objects.filter(project=ctx["project"], status=Task.TODO)
+
+
+@query_shape("tasks-by-assignee-status")
+def tasks_by_assignee_status(ctx):
+    return Task.objects.filter(assigned_to=ctx["user"], status=Task.IN_PROGRESS)
+
+
+@query_shape("tasks-overdue-sweep")
+def tasks_overdue_sweep(ctx):
+    now = timezone.now()
+    return Task.objects.filter(
+        due_date__isnull=False, due_date__gt=now - timedelta(minutes=5), due_date__lte=now,
+        assigned_to__isnull=False,
+    ).exclude(status=Task.DONE).order_by("assigned_to_id", "due_date")
+
+
+@query_shape("jobs-due")
+def jobs_due(ctx):
+    return Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).order_by("run_at", "id")[:8]
+
+
+@query_shape("comments-list")
+def comments_list(ctx):
+    return Comment.objects.order_by("-created_at", "-id")[:51]
+
+
+@query_shape("task-comments-list")
+def task_comments_list(ctx):
+    return Comment.objects.filter(task=ctx["task"]).order_by("-created_at", "-id")[:51]
+
+
+@query_shape("user-memberships")
+def user_memberships(ctx):
+    return ProjectMember.objects.filter(user=ctx["user"]).values_list("project_id", "role")
+
+
+@query_shape("tasks-search")
+def tasks_search(ctx):
+    return full_text_search(Task.objects.all(), "synthetic", connection)[:51]
+
+
+@query_shape("project-sync-tasks")
+def project_sync_tasks(ctx):
+    return Task.objects.filter(project=ctx["project"], sync_version__gt=1).order_by("sync_version")[:501]
+
+
+@query_shape("project-sync-comments")
+def project_sync_comments(ctx):
+    return Comment.objects.filter(project=ctx["project"], sync_version__gt=1).order_by("sync_version")[:501]
+
+
+@query_shape("project-sync-tombstones")
+def project_sync_tombstones(ctx):
+    return Tombstone.objects.filter(project=ctx["project"], sync_version__gt=1).order_by("sync_version")[:501]
@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional: FastJSONRenderer falls back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that encodes with orjson when it is installed and
+    FAST_SERIALIZATION is enabled (off by default).
+
+    Output is byte-for-byte what JSONRenderer writes for the API's data
+    (compact separators, raw UTF-8, escaped U+2028/U+2029); dates and other
+    non-JSON types still go through DRF's encoder.  Pretty-printing,
+    ASCII-only or non-compact settings, and anything orjson rejects (e.g.
+    integers beyond 64 bits) are rendered by JSONRenderer itself.
+    """
+    if orjson is not None:
+        orjson_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not getattr(settings, "FAST_SERIALIZATION", {}).get("ENABLED", False):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class StreamingOnlyRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation (Accept header or ?format=) select a
+    streamed format.  Views using it return a StreamingHttpResponse
+    themselves, so render() only ever sees error payloads (403, 404, and
+    the 406 for an Accept it cannot serve), which it hands to
+    JSONRenderer and labels as JSON.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data, JSONRenderer.media_type, renderer_context)
+
+
+class NDJSONRenderer(StreamingOnlyRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class CSVRenderer(StreamingOnlyRenderer):
+    media_type = "text/csv"
+    format = "csv"
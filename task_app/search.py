@@ -0,0 +1,104 @@
+import re
+
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+SQLITE_FTS_TABLE = "task_app_task_fts"
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        title, description, content='task_app_task', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON task_app_task BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON task_app_task BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF title, description ON task_app_task BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}",
+]
+
+# PostgreSQL: a GIN index over the same tsvector expression the filter uses,
+# so the planner can match the two.
+PG_SEARCH_CONFIG = "english"
+PG_TSVECTOR = (
+    f"to_tsvector('{PG_SEARCH_CONFIG}', "
+    "coalesce(\"task_app_task\".\"title\", '') || ' ' || coalesce(\"task_app_task\".\"description\", ''))"
+)
+PG_INDEX_NAME = "task_search_gin_idx"
+
+
+def install_search_index(connection, rebuild=False):
+    """
+    Create the full-text index for Task on `connection` if it is missing.
+
+    Idempotent.  SQLite drops triggers whenever Django rebuilds a table during
+    a migration, so this also runs on post_migrate with rebuild=False to put
+    them back.  Pass rebuild=True to re-index every existing row.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for sql in SQLITE_FTS_SQL:
+                cursor.execute(sql)
+            if rebuild:
+                cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX_NAME} ON task_app_task USING GIN ({PG_TSVECTOR})"
+            )
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for sql in SQLITE_FTS_DROP_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX_NAME}")
+
+
+def _fts5_query(text):
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the last term is a prefix match so search-as-you-type works.
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def full_text_search(queryset, text, connection):
+    """Restrict a Task queryset to rows whose title/description match `text`."""
+    if connection.vendor == "sqlite":
+        query = _fts5_query(text)
+        if query is None:
+            # Punctuation only: nothing to match, as websearch_to_tsquery() on PostgreSQL
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s", [query]
+        ))
+    if connection.vendor == "postgresql":
+        return queryset.filter(RawSQL(
+            f"{PG_TSVECTOR} @@ websearch_to_tsquery('{PG_SEARCH_CONFIG}', %s)",
+            [text],
+            output_field=BooleanField(),
+        ))
+    # No full-text index on other backends; fall back to a plain scan.
+    return queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
@@ -0,0 +1,75 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .models import *
+from .inbox import rebuild_inbox
+from .stats import rebuild_project_stats
+from .sync import stamp_unversioned
+
+
+def seed(users=20, projects=5, members_per_project=5, tasks_per_project=200,
+         comments_per_task=2, prefix="seed", rng=None):
+    """
+    Bulk-insert a synthetic data set shaped like sample_data.json.
+
+    Users get an unusable password so seeding never pays the hasher cost.
+    Returns a dict with the created users and projects.
+    """
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    unusable = make_password(None)
+
+    people = User.objects.bulk_create([
+        User(
+            email=f"{prefix}{i}@example.com",
+            username=f"{prefix}{i}",
+            first_name="Seed",
+            last_name=str(i),
+            password=unusable,
+        )
+        for i in range(users)
+    ])
+
+    owned = Project.objects.bulk_create([
+        Project(name=f"{prefix} project {i}", description="", owner=rng.choice(people))
+        for i in range(projects)
+    ])
+
+    memberships = []
+    for project in owned:
+        for user in rng.sample(people, min(members_per_project, len(people))):
+            role = ProjectMember.ADMIN if user.pk == project.owner_id else ProjectMember.MEMBER
+            memberships.append(ProjectMember(project=project, user=user, role=role))
+    ProjectMember.objects.bulk_create(memberships, ignore_conflicts=True)
+
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    priorities = [choice for choice, _ in Task.PRIORITY_CHOICES]
+    tasks = Task.objects.bulk_create([
+        Task(
+            project=project,
+            title=f"{prefix} task {project.pk}-{i}",
+            description="Synthetic task",
+            status=rng.choice(statuses),
+            priority=rng.choice(priorities),
+            assigned_to=rng.choice(people + [None]),
+            due_date=now + timedelta(days=rng.randint(-30, 30)) if rng.random() < 0.7 else None,
+        )
+        for project in owned
+        for i in range(tasks_per_project)
+    ], batch_size=1000)
+
+    Comment.objects.bulk_create([
+        Comment(task=task, project_id=task.project_id, user=rng.choice(people), content=f"Synthetic comment {i}")
+        for task in tasks
+        for i in range(comments_per_task)
+    ], batch_size=1000)
+
+    # bulk_create skips the signals that keep the counters, sync versions and inboxes current
+    rebuild_project_stats([project.pk for project in owned])
+    stamp_unversioned([project.pk for project in owned])
+    rebuild_inbox([user.pk for user in people])
+
+    return {"users": people, "projects": owned}
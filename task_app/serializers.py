@@ -5,6 +5,9 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from django.urls import path, include
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import *
+from .authentication import CLAIM_FIELDS, STAMP_CLAIM, remember_stamp
+from .expansion import ExpandableFieldsMixin
+from .sync import stamp_tasks
 
 User = get_user_model()
 
@@ -27,6 +30,13 @@ class UserDetailSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "first_name", "last_name", "date_joined"]
 
 
+class UserSummarySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Public view of a user, embedded by ?expand= (no email)."""
+    class Meta:
+        model = User
+        fields = ["id", "username", "first_name", "last_name"]
+
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -34,7 +44,18 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Claims read by ClaimsJWTAuthentication so requests skip the user lookup
+        token = super().get_token(user)
+        for claim in CLAIM_FIELDS:
+            token[claim] = getattr(user, claim)
+        token[STAMP_CLAIM] = remember_stamp(user)
+        return token
+
     def validate(self, attrs):
+        # authenticate() re-encodes the password when its hash is outdated
+        # (see task_app.hashers), so the upgrade costs no extra round trip
         data = super().validate(attrs)
         data["user"] = {
             "id": self.user.id,
@@ -45,7 +66,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
     
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Project
         fields = ['id', 'name', 'description', 'owner', 'created_at']
@@ -57,17 +78,130 @@ class ProjectMemberSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProjectMember
         fields = ['id', 'project', 'user', 'role']
+        extra_kwargs = {"project": {"queryset": Project.objects.filter(deleted_at__isnull=True)}}
         
         
-class TaskSerializer(serializers.ModelSerializer):
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Looks ids up in context["prefetched"][model] when the caller preloaded
+    them (bulk endpoints), instead of issuing one query per item.
+    """
+    def to_internal_value(self, data):
+        cache = self.context.get("prefetched", {}).get(self.get_queryset().model)
+        if cache is None:
+            return super().to_internal_value(data)
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            obj = cache.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class ChangedFieldsUpdateMixin:
+    """
+    update() that saves only the columns whose value changed
+    (save(update_fields=...)), and writes nothing when none did.
+    """
+    def update(self, instance, validated_data):
+        serializers.raise_errors_on_nested_writes("update", self, validated_data)
+        changed = []
+        for attr, value in validated_data.items():
+            field = instance._meta.get_field(attr)
+            new = value.pk if field.is_relation and value is not None else value
+            if getattr(instance, field.attname) != new:
+                changed.append(attr)
+            setattr(instance, attr, value)
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
+
+
+class BulkTaskListSerializer(serializers.ListSerializer):
+    """
+    many=True serializer for /tasks/bulk/.
+
+    For updates `instance` is a {id: Task} dict; every item carries its "id".
+    Writes go through bulk_create/bulk_update, so per-row save() and
+    post_save do not run; sync versions are stamped here instead.
+    """
+    batch_size = 500
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            self.child.instance = self.instance.get(data.get("id"))
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        stamp_tasks(tasks)
+        return Task.objects.bulk_create(tasks, batch_size=self.batch_size)
+
+    def update(self, instance, validated_data):
+        tasks, fields = [], set()
+        for item, attrs in zip(self.initial_data, validated_data):
+            task = instance[item["id"]]
+            for attr, value in attrs.items():
+                setattr(task, attr, value)
+            fields.update(attrs)
+            tasks.append(task)
+        if fields:
+            stamp_tasks(tasks)
+            fields.update(["sync_version", "updated_at"])
+            Task.bulk_update_versioned(tasks, sorted(fields), batch_size=self.batch_size)
+        return tasks
+
+
+class TaskSerializer(ExpandableFieldsMixin, ChangedFieldsUpdateMixin, serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    expandable_fields = {
+        "project": (ProjectSerializer, {}),
+        "assigned_to": (UserSummarySerializer, {}),
+        # The newest 20, plus comments_count
+        "comments": ("CommentSerializer", {"many": True, "limit": 20, "ordering": ["-created_at", "-id"]}),
+    }
+
     class Meta:
         model = Task
-        fields = ["id", "project", "title", "description", "status", "priority", "assigned_to", "created_at", "due_date"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "project", "title", "description", "status", "priority", "assigned_to", "created_at",
+                  "updated_at", "due_date", "version"]
+        read_only_fields = ["created_at", "updated_at", "version"]
+        # Projects being deleted take no new tasks
+        extra_kwargs = {"project": {"queryset": Project.objects.filter(deleted_at__isnull=True)}}
+        list_serializer_class = BulkTaskListSerializer
         
         
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(ExpandableFieldsMixin, ChangedFieldsUpdateMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        "user": (UserSummarySerializer, {}),
+        "task": (TaskSerializer, {}),
+    }
+
     class Meta:
         model = Comment
-        fields = ['id', 'task', 'user', 'content', 'created_at']
-        read_only_fields = ['task', 'user', 'created_at']
\ No newline at end of file
+        fields = ['id', 'task', 'user', 'content', 'created_at', 'updated_at', 'version']
+        read_only_fields = ['task', 'user', 'created_at', 'updated_at', 'version']
+
+
+class DeletionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Deletion
+        fields = ["id", "kind", "object_id", "status", "total", "deleted", "error", "created_at", "finished_at"]
+        read_only_fields = fields
+
+
+class InboxItemSerializer(serializers.ModelSerializer):
+    """An inbox entry with its task (and comment) embedded, as they are now."""
+    task = TaskSerializer(read_only=True)
+    comment = CommentSerializer(read_only=True)
+
+    class Meta:
+        model = InboxItem
+        fields = ["id", "kind", "project", "task", "comment", "created_at"]
+        read_only_fields = fields
@@ -0,0 +1,443 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .authentication import forget_stamp, remember_stamp
+from .caching import bump_versions, project_scope
+from .feed import publish
+from .inbox import add_comment, drop_member, move_inbox, reassign_inbox
+from .membership import resolver
+from .notifications import queue_assignment_notices, queue_comment_notice
+from .models import *
+from .serializers import CommentSerializer, ProjectMemberSerializer, ProjectSerializer, TaskSerializer
+from .stats import apply_deltas, new_deltas, task_deltas, task_snapshot
+from .sync import move_comments, record_tombstones, stamp_tasks
+
+
+# Sent by the /tasks/bulk/ endpoints, which bypass save()/delete() and
+# therefore post_save/post_delete.  Receives action ("create", "update" or
+# "delete") and tasks (the affected Task instances).  Sent inside the
+# write transaction.
+tasks_bulk_changed = Signal()
+
+# Rows saved with raw=True (loaddata) only invalidate caches: they are not
+# counted, notified, published or put in inboxes.  Rebuild the counters
+# afterwards with `manage.py rebuild_project_stats`.
+
+
+def comment_project_id(comment, origin=None):
+    """Project of a comment, without a query when the task is at hand."""
+    if isinstance(origin, Task) and origin.pk == comment.task_id:
+        return origin.project_id
+    pending = getattr(comment if origin is None else origin, "_stats_deletes", None)
+    if pending is not None and comment.task_id in pending["comments"]:
+        return deleted_comment_projects(pending)[comment.task_id]
+    if "_project_id" not in comment.__dict__:
+        task = comment._state.fields_cache.get("task")
+        if task is not None:
+            comment._project_id = task.project_id
+        else:
+            comment._project_id = (
+                Task.objects.filter(id=comment.task_id).values_list("project_id", flat=True).first()
+            )
+    return comment._project_id
+
+
+def deleted_with(origin, model):
+    """True if the delete cascaded from a `model` instance or queryset."""
+    return isinstance(origin, model) or getattr(origin, "model", None) is model
+
+
+def deleted_with_project(origin):
+    # Everything under a deleted project goes with it; skip per-row bookkeeping
+    return deleted_with(origin, Project)
+
+
+# Remember who a row pointed at when it was loaded, so moving a membership
+# or transferring a project also invalidates the user it was taken from.
+# __dict__ is read directly so deferred fields are never loaded here.
+@receiver(post_init, sender=ProjectMember)
+def remember_member_user(sender, instance, **kwargs):
+    instance._initial_user_id = instance.__dict__.get("user_id")
+
+
+@receiver(post_init, sender=Project)
+def remember_project_owner(sender, instance, **kwargs):
+    instance._initial_owner_id = instance.__dict__.get("owner_id")
+
+
+@receiver([post_save, post_delete], sender=ProjectMember)
+def invalidate_member_roles(sender, instance, **kwargs):
+    resolver.invalidate(instance.user_id)
+    if instance._initial_user_id != instance.user_id:
+        resolver.invalidate(instance._initial_user_id)
+    instance._initial_user_id = instance.user_id
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_owner_roles(sender, instance, **kwargs):
+    resolver.invalidate(instance.owner_id)
+    if instance._initial_owner_id != instance.owner_id:
+        resolver.invalidate(instance._initial_owner_id)
+    instance._initial_owner_id = instance.owner_id
+
+
+# ----- response cache invalidation (task_app/caching.py) -----
+@receiver([post_save, post_delete], sender=Project)
+def bump_project_cache(sender, instance, **kwargs):
+    bump_versions(project_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=ProjectMember)
+@receiver([post_save, post_delete], sender=Task)
+def bump_project_child_cache(sender, instance, **kwargs):
+    bump_versions(project_scope(instance.project_id))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def bump_comment_cache(sender, instance, origin=None, **kwargs):
+    project_id = comment_project_id(instance, origin)
+    bump_versions(*([project_scope(project_id)] if project_id else []))
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def bump_bulk_task_cache(sender, tasks, **kwargs):
+    bump_versions(*{project_scope(task.project_id) for task in tasks})
+
+
+# ----- project statistics counters (task_app/stats.py) -----
+@receiver(post_init, sender=Task)
+def remember_task_stats(sender, instance, **kwargs):
+    instance._stats_snapshot = task_snapshot(instance)
+
+
+@receiver(pre_save, sender=Task)
+def load_task_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Loaded with only()/defer(): fetch the counted columns before they change
+    if not instance._state.adding and instance._stats_snapshot is None:
+        row = Task.objects.filter(pk=instance.pk).values_list(
+            "project_id", "status", "priority", "assigned_to_id"
+        ).first()
+        instance._stats_snapshot = tuple(row) if row else None
+
+
+@receiver(post_save, sender=Task)
+def count_saved_task(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._stats_snapshot
+    new = task_snapshot(instance, fallback=old)
+    apply_deltas(task_deltas(new_deltas(), old, new))
+    instance._stats_snapshot = new
+
+
+# Every row of one delete() shares its `origin` (the instance or queryset
+# delete() was called on).  pre_delete collects the counted rows there and
+# the first post_delete applies them in a single apply_deltas, however many
+# tasks and cascaded comments went.
+def pending_deletes(origin, instance):
+    key = instance if origin is None else origin
+    pending = getattr(key, "_stats_deletes", None)
+    if pending is None or pending["applied"]:
+        pending = key._stats_deletes = {"tasks": [], "comments": Counter(), "projects": {}, "applied": False}
+    return pending
+
+
+@receiver(pre_delete, sender=Task)
+def collect_deleted_task(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        load_task_stats(sender, instance)
+        pending = pending_deletes(origin, instance)
+        pending["tasks"].append(instance._stats_snapshot)
+        pending["projects"][instance.pk] = instance.project_id
+
+
+@receiver(post_delete, sender=Task)
+def count_deleted_task(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        apply_pending_deletes(origin, instance)
+
+
+def deleted_comment_projects(pending):
+    """{task_id: project_id} for the deleted comments' tasks, looked up in one query for those not being deleted."""
+    projects = pending["projects"]
+    unknown = [task_id for task_id in pending["comments"] if task_id not in projects]
+    if unknown:
+        projects.update(dict.fromkeys(unknown))
+        projects.update(Task.objects.filter(pk__in=unknown).values_list("pk", "project_id"))
+    return projects
+
+
+def apply_pending_deletes(origin, instance):
+    pending = getattr(instance if origin is None else origin, "_stats_deletes", None)
+    if pending is None or pending["applied"]:
+        return
+    # Kept on the origin: the other post_delete receivers read "projects"
+    pending["applied"] = True
+    deltas = new_deltas()
+    for snapshot in pending["tasks"]:
+        task_deltas(deltas, snapshot, None)
+    projects = deleted_comment_projects(pending)
+    for task_id, count in pending["comments"].items():
+        if projects[task_id] is not None:
+            deltas[projects[task_id]][(ProjectStats.COMMENTS, "")] -= count
+    apply_deltas(deltas)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def count_bulk_tasks(sender, action, tasks, **kwargs):
+    # Bulk deletes go through QuerySet.delete(), which already sends post_delete
+    if action == "delete":
+        return
+    deltas = new_deltas()
+    for task in tasks:
+        old = None if action == "create" else task._stats_snapshot
+        new = task_snapshot(task, fallback=old)
+        task_deltas(deltas, old, new)
+        task._stats_snapshot = new
+    apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    project_id = comment_project_id(instance)
+    if created and project_id:
+        deltas = new_deltas()
+        deltas[project_id][(ProjectStats.COMMENTS, "")] += 1
+        apply_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Comment)
+def collect_deleted_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        pending = pending_deletes(origin, instance)
+        pending["comments"][instance.task_id] += 1
+        task = origin if isinstance(origin, Task) else instance._state.fields_cache.get("task")
+        if task is not None and task.pk == instance.task_id:
+            pending["projects"][task.pk] = task.project_id
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        apply_pending_deletes(origin, instance)
+
+
+@receiver(post_delete, sender=User)
+def count_unassigned_tasks(sender, instance, **kwargs):
+    # Task.assigned_to is SET_NULL, which Django applies with a bare UPDATE
+    rows = ProjectStats.objects.filter(dimension=ProjectStats.ASSIGNEE, key=str(instance.pk))
+    deltas = new_deltas()
+    for project_id, count in rows.values_list("project_id", "count"):
+        deltas[project_id][(ProjectStats.ASSIGNEE, "")] += count
+    rows.delete()
+    apply_deltas(deltas)
+
+
+# ----- change feed events (task_app/feed.py) -----
+@receiver(post_save, sender=Project)
+def publish_project_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        publish(instance.pk, "project", "updated", instance.pk, ProjectSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Project)
+def publish_project_deleted(sender, instance, **kwargs):
+    # Stands in for everything that cascades with it
+    publish(instance.pk, "project", "deleted", instance.pk)
+
+
+@receiver(post_save, sender=ProjectMember)
+def publish_member_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = "created" if created else "updated"
+    publish(instance.project_id, "member", action, instance.pk, ProjectMemberSerializer(instance).data)
+
+
+@receiver(post_delete, sender=ProjectMember)
+def publish_member_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        publish(instance.project_id, "member", "deleted", instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = "created" if created else "updated"
+    publish(instance.project_id, "task", action, instance.pk, TaskSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        publish(instance.project_id, "task", "deleted", instance.pk)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def publish_bulk_tasks(sender, action, tasks, **kwargs):
+    if action == "delete":
+        return
+    action = "created" if action == "create" else "updated"
+    for task in tasks:
+        publish(task.project_id, "task", action, task.pk, TaskSerializer(task).data)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = "created" if created else "updated"
+    publish(comment_project_id(instance), "comment", action, instance.pk, CommentSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Comment)
+def publish_comment_deleted(sender, instance, origin=None, **kwargs):
+    # A deleted task implies its comments
+    if not deleted_with_project(origin) and not deleted_with(origin, Task):
+        publish(comment_project_id(instance, origin), "comment", "deleted", instance.pk)
+
+
+# ----- delta sync tombstones and versions (task_app/sync.py) -----
+@receiver(post_delete, sender=Task)
+def tombstone_deleted_task(sender, instance, origin=None, **kwargs):
+    # Queryset deletes are recorded in one go from tasks_bulk_changed
+    if not deleted_with_project(origin) and getattr(origin, "model", None) is not Task:
+        record_tombstones(Tombstone.TASK, [(instance.project_id, instance.pk)])
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def tombstone_bulk_tasks(sender, action, tasks, **kwargs):
+    if action == "delete":
+        record_tombstones(Tombstone.TASK, [(task.project_id, task.pk) for task in tasks])
+
+
+@receiver(post_delete, sender=Comment)
+def tombstone_deleted_comment(sender, instance, origin=None, **kwargs):
+    # A task's tombstone covers its comments
+    if not deleted_with_project(origin) and not deleted_with(origin, Task):
+        record_tombstones(Tombstone.COMMENT, [(comment_project_id(instance, origin), instance.pk)])
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Comment)
+def stamp_raw_row(sender, instance, raw=False, **kwargs):
+    # loaddata saves with save_base(), bypassing SyncVersionedModel.save(); a
+    # row left at version 0 would be outside every sync window, even the snapshot
+    if raw and not instance.sync_version:
+        instance.sync_version = allocate_sync_versions(instance.get_sync_project_id())[0]
+
+
+@receiver(post_init, sender=Task)
+def remember_task_project(sender, instance, **kwargs):
+    instance._initial_project_id = instance.__dict__.get("project_id")
+
+
+def moved_tasks(tasks):
+    """The saved tasks whose project changed; call once per save."""
+    moved = []
+    for task in tasks:
+        # A deferred project is not written by save(), so it cannot have changed
+        if "project_id" not in task.__dict__:
+            continue
+        if task._initial_project_id not in (None, task.project_id):
+            moved.append(task)
+        task._initial_project_id = task.project_id
+    return moved
+
+
+def move_task_rows(tasks):
+    # Comments and inbox entries carry their task's project
+    move_comments(tasks)
+    move_inbox(tasks)
+
+
+@receiver(post_save, sender=Task)
+def move_saved_task(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        move_task_rows(moved_tasks([instance]))
+    instance._initial_project_id = instance.project_id
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def move_bulk_tasks(sender, action, tasks, **kwargs):
+    if action == "update":
+        move_task_rows(moved_tasks(tasks))
+
+
+@receiver(pre_delete, sender=User)
+def stamp_unassigned_tasks(sender, instance, **kwargs):
+    # SET_NULL on Task.assigned_to is a bare UPDATE; version those tasks first
+    tasks = list(Task.objects.filter(assigned_to=instance).only("pk", "project_id"))
+    if tasks:
+        stamp_tasks(tasks)
+        Task.bulk_update_versioned(tasks, ["sync_version", "updated_at"], batch_size=500)
+
+
+# ----- assignments and new comments (task_app/notifications.py, task_app/inbox.py) -----
+@receiver(post_init, sender=Task)
+def remember_task_assignee(sender, instance, **kwargs):
+    instance._initial_assignee_id = instance.__dict__.get("assigned_to_id")
+
+
+def assignee_changes(tasks, created=False):
+    """[(task, previous assignee id)] for the tasks whose save changed the assignee; call once per save."""
+    changes = []
+    for task in tasks:
+        # A deferred assigned_to is not written by save(), so it cannot have changed
+        if "assigned_to_id" not in task.__dict__:
+            continue
+        previous = None if created else task._initial_assignee_id
+        if task.assigned_to_id != previous:
+            changes.append((task, previous))
+        task._initial_assignee_id = task.assigned_to_id
+    return changes
+
+
+def apply_assignee_changes(changes, created=False):
+    queue_assignment_notices([task for task, _ in changes if task.assigned_to_id is not None])
+    reassign_inbox(changes, created)
+
+
+@receiver(post_save, sender=Task)
+def task_assignee_changed(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or update_fields is not None and not {"assigned_to", "assigned_to_id"} & update_fields:
+        return
+    apply_assignee_changes(assignee_changes([instance], created), created)
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def bulk_tasks_assignee_changed(sender, action, tasks, **kwargs):
+    if action != "delete":
+        created = action == "create"
+        apply_assignee_changes(assignee_changes(tasks, created), created)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        queue_comment_notice(instance)
+        add_comment(instance)
+
+
+@receiver(post_delete, sender=ProjectMember)
+def drop_member_inbox(sender, instance, origin=None, **kwargs):
+    if not deleted_with_project(origin):
+        drop_member(instance.user_id, instance.project_id)
+
+
+# ----- JWT claim stamps (task_app/authentication.py) -----
+@receiver(post_save, sender=User)
+def refresh_user_stamp(sender, instance, **kwargs):
+    remember_stamp(instance)
+
+
+@receiver(post_delete, sender=User)
+def drop_user_stamp(sender, instance, **kwargs):
+    forget_stamp(instance.pk)
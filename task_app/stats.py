@@ -0,0 +1,141 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .models import *
+
+
+def task_keys(snapshot):
+    """Counter keys a task with this (project_id, status, priority, assigned_to_id) snapshot contributes to."""
+    _, status, priority, assigned_to_id = snapshot
+    return [
+        (ProjectStats.TASKS, ""),
+        (ProjectStats.STATUS, status),
+        (ProjectStats.PRIORITY, priority),
+        (ProjectStats.ASSIGNEE, "" if assigned_to_id is None else str(assigned_to_id)),
+    ]
+
+
+SNAPSHOT_FIELDS = ("project_id", "status", "priority", "assigned_to_id")
+
+
+def task_snapshot(task, fallback=None):
+    """
+    (project_id, status, priority, assigned_to_id) of a task instance.
+
+    Reads __dict__ directly, since touching a deferred field here would cost
+    a query per row; deferred fields are taken from `fallback` (an earlier
+    snapshot) when given, otherwise the snapshot is None.
+    """
+    values = task.__dict__
+    snapshot = []
+    for i, name in enumerate(SNAPSHOT_FIELDS):
+        if name in values:
+            snapshot.append(values[name])
+        elif fallback is not None:
+            snapshot.append(fallback[i])
+        else:
+            return None
+    return tuple(snapshot)
+
+
+def task_deltas(deltas, old, new):
+    """Add the counter changes for a task moving from snapshot `old` to `new` (either may be None)."""
+    if old == new:
+        return deltas
+    if old is not None:
+        for key in task_keys(old):
+            deltas[old[0]][key] -= 1
+    if new is not None:
+        for key in task_keys(new):
+            deltas[new[0]][key] += 1
+    return deltas
+
+
+def new_deltas():
+    return defaultdict(Counter)
+
+
+def apply_deltas(deltas):
+    """
+    Apply {project_id: Counter({(dimension, key): delta})} in two queries
+    per project: create missing rows, then one UPDATE ... SET count = count + CASE ...
+    """
+    for project_id, counter in deltas.items():
+        changes = {key: delta for key, delta in counter.items() if delta}
+        if not changes:
+            continue
+        ProjectStats.objects.bulk_create(
+            [ProjectStats(project_id=project_id, dimension=dim, key=key) for dim, key in changes],
+            ignore_conflicts=True,
+        )
+        whens = [
+            When(dimension=dim, key=key, then=Value(delta))
+            for (dim, key), delta in changes.items()
+        ]
+        match = Q()
+        for dim, key in changes:
+            match |= Q(dimension=dim, key=key)
+        ProjectStats.objects.filter(match, project_id=project_id).update(
+            count=F("count") + Case(*whens, default=Value(0))
+        )
+
+
+def get_project_stats(project_id):
+    """The /projects/<id>/stats/ payload: one read of the counter rows plus an indexed overdue count."""
+    stats = {
+        "project": project_id,
+        "tasks": 0,
+        "comments": 0,
+        "by_status": {choice: 0 for choice, _ in Task.STATUS_CHOICES},
+        "by_priority": {choice: 0 for choice, _ in Task.PRIORITY_CHOICES},
+        "by_assignee": {},
+    }
+    rows = ProjectStats.objects.filter(project_id=project_id, count__gt=0).values_list("dimension", "key", "count")
+    for dimension, key, count in rows:
+        if dimension in (ProjectStats.TASKS, ProjectStats.COMMENTS):
+            stats[dimension] = count
+        elif dimension == ProjectStats.ASSIGNEE:
+            stats["by_assignee"][key or "unassigned"] = count
+        else:
+            stats["by_" + dimension][key] = count
+    # Time-dependent, so not a counter; served by task_project_open_due_idx
+    stats["overdue"] = (
+        Task.objects.filter(project_id=project_id, due_date__isnull=False, due_date__lt=timezone.now())
+        .exclude(status=Task.DONE)
+        .count()
+    )
+    return stats
+
+
+def rebuild_project_stats(project_ids=None, apps=global_apps):
+    """Recompute the counters from scratch (all projects, or only `project_ids`)."""
+    stats_model = apps.get_model("task_app", "ProjectStats")
+    task_model = apps.get_model("task_app", "Task")
+    comment_model = apps.get_model("task_app", "Comment")
+
+    tasks = task_model.objects.all()
+    comments = comment_model.objects.all()
+    existing = stats_model.objects.all()
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+        comments = comments.filter(task__project_id__in=project_ids)
+        existing = existing.filter(project_id__in=project_ids)
+
+    rows = []
+    for row in tasks.values("project_id").annotate(n=Count("id")):
+        rows.append(stats_model(project_id=row["project_id"], dimension="tasks", key="", count=row["n"]))
+    for dimension, field in (("status", "status"), ("priority", "priority"), ("assignee", "assigned_to_id")):
+        for row in tasks.values("project_id", field).annotate(n=Count("id")):
+            key = "" if row[field] is None else str(row[field])
+            rows.append(stats_model(project_id=row["project_id"], dimension=dimension, key=key, count=row["n"]))
+    for row in comments.values("task__project_id").annotate(n=Count("id")):
+        rows.append(stats_model(project_id=row["task__project_id"], dimension="comments", key="", count=row["n"]))
+
+    with transaction.atomic():
+        existing.delete()
+        stats_model.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,172 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import *
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class TokenExpired(Exception):
+    """The token predates pruned tombstones; the client must sync from scratch."""
+
+
+def encode_token(project_id, version):
+    raw = json.dumps([project_id, version], separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token, project_id):
+    if not token:
+        return 0
+    try:
+        token_project, version = json.loads(urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidToken(token)
+    if token_project != project_id or not isinstance(version, int) or version < 0:
+        raise InvalidToken(token)
+    return version
+
+
+def stamp_tasks(tasks):
+    """
+    Give tasks written with bulk_create()/bulk_update() their sync versions
+    (save() does this itself).  Call inside the writing transaction.
+    """
+    by_project = defaultdict(list)
+    for task in tasks:
+        by_project[task.project_id].append(task)
+    now = timezone.now()
+    for project_id, rows in by_project.items():
+        for task, version in zip(rows, allocate_sync_versions(project_id, len(rows))):
+            task.sync_version = version
+            task.updated_at = now
+
+
+def move_comments(tasks):
+    """
+    Move the comments of tasks that changed project along with them,
+    stamped with the new project's sync versions.  Call inside the
+    writing transaction.
+    """
+    projects = {task.pk: task.project_id for task in tasks}
+    comments = list(Comment.objects.filter(task_id__in=projects).only("pk", "task_id").order_by("pk"))
+    by_project = defaultdict(list)
+    for comment in comments:
+        comment.project_id = projects[comment.task_id]
+        by_project[comment.project_id].append(comment)
+    now = timezone.now()
+    for project_id, rows in by_project.items():
+        for comment, version in zip(rows, allocate_sync_versions(project_id, len(rows))):
+            comment.sync_version = version
+            comment.updated_at = now
+    Comment.objects.bulk_update(comments, ["project", "sync_version", "updated_at"], batch_size=500)
+
+
+def record_tombstones(kind, rows):
+    """Store tombstones for deleted (project_id, object_id) pairs."""
+    by_project = defaultdict(list)
+    for project_id, object_id in rows:
+        if project_id is not None:
+            by_project[project_id].append(object_id)
+    tombstones = []
+    for project_id, ids in by_project.items():
+        versions = allocate_sync_versions(project_id, len(ids))
+        tombstones += [
+            Tombstone(project_id=project_id, kind=kind, object_id=pk, sync_version=version)
+            for pk, version in zip(ids, versions)
+        ]
+    Tombstone.objects.bulk_create(tombstones)
+
+
+def get_changes(project, since=0, limit=500):
+    """
+    Tasks and comments changed, and ids deleted, after version `since`.
+
+    Returns (tasks, comments, deleted, version, has_more).  Every row
+    carries a unique per-project version, so paging is exact: resume from
+    `version`.  The counter is read before the rows, so anything committed
+    meanwhile is merely sent again next time.  since=0 is a full snapshot,
+    without tombstones.
+    """
+    if since and since < project.sync_floor:
+        raise TokenExpired(since)
+    current = current_sync_version(project.pk)
+    window = {"sync_version__gt": since, "sync_version__lte": current}
+
+    tasks = Task.objects.filter(project_id=project.pk, **window).order_by("sync_version")[:limit + 1]
+    comments = Comment.objects.filter(project_id=project.pk, **window).order_by("sync_version")[:limit + 1]
+    rows = [(task.sync_version, task) for task in tasks] + [(comment.sync_version, comment) for comment in comments]
+    if since:
+        tombstones = Tombstone.objects.filter(project_id=project.pk, **window).order_by("sync_version")
+        rows += [(tombstone.sync_version, tombstone) for tombstone in tombstones[:limit + 1]]
+    rows.sort(key=lambda row: row[0])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    version = rows[-1][0] if has_more else max(current, since)
+
+    changed = {Task: [], Comment: []}
+    deleted = {Tombstone.TASK: [], Tombstone.COMMENT: []}
+    for _, obj in rows:
+        if isinstance(obj, Tombstone):
+            deleted[obj.kind].append(obj.object_id)
+        else:
+            changed[type(obj)].append(obj)
+    return changed[Task], changed[Comment], deleted, version, has_more
+
+
+def prune_tombstones(before, project_ids=None):
+    """Delete tombstones older than `before`; tokens below them stop working."""
+    tombstones = Tombstone.objects.filter(deleted_at__lt=before)
+    if project_ids is not None:
+        tombstones = tombstones.filter(project_id__in=project_ids)
+    with transaction.atomic():
+        floors = tombstones.values("project_id").annotate(floor=Max("sync_version"))
+        for row in floors:
+            Project.objects.filter(pk=row["project_id"], sync_floor__lt=row["floor"]).update(sync_floor=row["floor"])
+        pruned, _ = tombstones.delete()
+    return pruned
+
+
+def stamp_unversioned(project_ids=None, apps=global_apps, batch_size=1000):
+    """
+    Version rows that were inserted without save() (fixtures, seeding,
+    rows that predate delta sync), so they show up in a full snapshot.
+    """
+    project_model = apps.get_model("task_app", "Project")
+    counter_model = apps.get_model("task_app", "SyncCounter")
+    task_model = apps.get_model("task_app", "Task")
+    comment_model = apps.get_model("task_app", "Comment")
+    projects = project_model.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+
+    stamped = 0
+    for project_id in list(projects.values_list("pk", flat=True)):
+        with transaction.atomic():
+            tasks = list(task_model.objects.filter(project_id=project_id, sync_version=0).only("pk").order_by("pk"))
+            comments = list(comment_model.objects.filter(
+                project_id=project_id, sync_version=0
+            ).only("pk").order_by("pk"))
+            rows = tasks + comments
+            if not rows:
+                continue
+            # Same reservation as allocate_sync_versions(), on the given app registry
+            counter_model.objects.get_or_create(project_id=project_id)
+            counter = counter_model.objects.filter(pk=project_id)
+            counter.update(value=F("value") + len(rows))
+            last = counter.values_list("value", flat=True).get()
+            for row, version in zip(rows, range(last - len(rows) + 1, last + 1)):
+                row.sync_version = version
+            task_model.objects.bulk_update(tasks, ["sync_version"], batch_size=batch_size)
+            comment_model.objects.bulk_update(comments, ["sync_version"], batch_size=batch_size)
+            stamped += len(rows)
+    return stamped
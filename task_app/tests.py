@@ -1,3 +1,1084 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import time
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, router as db_router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .authentication import ClaimsJWTAuthentication
+from .benchmark import SCENARIOS, BenchmarkData, Runner, Scenario
+from .db_routers import ReplicaRoutingMiddleware, check_shared_pin_cache
+from .deletion import Progress, purge_in_batches
+from .fast_serializers import FastSerializer
+from .feed import InProcessBroker, get_broker, make_event, set_broker, stream_events
+from .jobs import run_jobs
+from .management.commands.index_advisor import FULL_SCAN_PATTERNS
+from .membership import MembershipResolver, _config as membership_config, resolver
+from .models import *
+from .query_budget import QueryBudgetExceeded, measure_budgets, scale_for
+from .query_shapes import QUERY_SHAPES
+from .serializers import CustomTokenObtainPairSerializer, TaskSerializer
+from .stats import get_project_stats, rebuild_project_stats
+from .sync import get_changes
+from .throttling import CacheBucketStore, check_shared_store, set_store
+from .views import TaskViewSet
+
+
+def auth(user):
+    return {"HTTP_AUTHORIZATION": f"Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}"}
+
+
+def scrypt_cost(work_factor):
+    return override_settings(PASSWORD_HASHING={"SCRYPT": {"WORK_FACTOR": work_factor, "BLOCK_SIZE": 8, "PARALLELISM": 1}})
+
+
+class ScryptHasherTests(TestCase):
+    def test_verifies_hashes_made_at_a_higher_cost(self):
+        with scrypt_cost(2**15):
+            encoded = make_password("password123", hasher="scrypt")
+        with scrypt_cost(2**14):
+            self.assertTrue(check_password("password123", encoded))
+            self.assertFalse(check_password("password124", encoded))
+            self.assertTrue(get_hasher("scrypt").must_update(encoded))
+
+
+class MembershipResolverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("member@example.com", "member", "password123")
+        self.project = Project.objects.create(name="p", owner=self.user)
+        self.resolver = MembershipResolver()
+
+    def test_caches_roles(self):
+        self.assertEqual(self.resolver.get(self.user.pk), {self.project.pk: "owner"})
+        with self.assertNumQueries(0):
+            self.resolver.get(self.user.pk)
+
+    def test_invalidation_during_load_is_not_lost(self):
+        collect = MembershipResolver.collect
+
+        def invalidated_while_loading(rows):
+            self.resolver.invalidate(self.user.pk)
+            return collect(rows)
+
+        with mock.patch.object(MembershipResolver, "collect", staticmethod(invalidated_while_loading)):
+            self.resolver.get(self.user.pk)
+        self.assertIsNone(self.resolver.lookup(self.user.pk))
+        self.resolver.get(self.user.pk)
+        self.assertIsNotNone(self.resolver.lookup(self.user.pk))
+
+    def test_forgotten_invalidations_skip_older_loads(self):
+        resolver = MembershipResolver(maxsize=1)
+        started = resolver.generation()
+        resolver.invalidate(self.user.pk)
+        resolver.invalidate(self.user.pk + 1)  # evicts the first user's record
+        resolver.store(self.user.pk, {}, started)
+        self.assertIsNone(resolver.lookup(self.user.pk))
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class TaskCreateRuleTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.outsider = User.objects.create_user("outsider@example.com", "outsider", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+
+    def create(self, user, path, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path, data, content_type="application/json", **auth(user))
+
+    def test_single_and_bulk_create_need_membership(self):
+        task = {"project": self.project.pk, "title": "t"}
+        self.assertEqual(self.create(self.outsider, "/api/tasks/", task).status_code, 403)
+        self.assertEqual(self.create(self.outsider, "/api/tasks/bulk/", [task]).status_code, 403)
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(self.create(self.owner, "/api/tasks/", task).status_code, 201)
+        self.assertEqual(self.create(self.owner, "/api/tasks/bulk/", [task]).status_code, 201)
+        self.assertEqual(Task.objects.count(), 2)
+
+
+    def test_comments_only_on_visible_tasks(self):
+        task = Task.objects.create(project=self.project, title="t", assigned_to=self.owner)
+        url, jobs = f"/api/tasks/{task.pk}/comments/", Job.objects.count()
+        self.assertEqual(self.create(self.outsider, url, {"content": "c"}).status_code, 404)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Job.objects.count(), jobs)
+        self.assertEqual(self.create(self.outsider, "/api/comments/", {"content": "c"}).status_code, 404)
+        ProjectMember.objects.create(project=self.project, user=self.outsider, role=ProjectMember.MEMBER)
+        self.assertEqual(self.create(self.outsider, url, {"content": "c"}).status_code, 201)
+        self.assertEqual(InboxItem.objects.filter(user=self.owner, kind=InboxItem.COMMENT).count(), 1)
+
+class ClaimsAuthenticationTests(TestCase):
+    def test_stamp_expires_for_changes_made_elsewhere(self):
+        user = User.objects.create_superuser("admin@example.com", "admin", "password123")
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        authentication = ClaimsJWTAuthentication()
+        # Demoted by another worker: no signal reaches this process's stamp cache
+        User.objects.filter(pk=user.pk).update(is_superuser=False)
+        self.assertTrue(authentication.get_user(token).is_superuser)
+        later = time.time() + 61
+        with mock.patch("time.time", return_value=later):
+            self.assertFalse(authentication.get_user(token).is_superuser)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class StatsDeleteTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+
+    def new_tasks(self, n):
+        tasks = [Task.objects.create(project=self.project, title=f"t{i}", assigned_to=self.owner) for i in range(n)]
+        for task in tasks:
+            Comment.objects.create(task=task, user=self.owner, content="c")
+            Comment.objects.create(task=task, user=self.owner, content="d")
+        return [task.pk for task in tasks]
+
+    def bulk_delete(self, ids):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete("/api/tasks/bulk/", ids, content_type="application/json", **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assert_counters_match_rows(self):
+        counted = get_project_stats(self.project.pk)
+        rebuild_project_stats([self.project.pk])
+        self.assertEqual(counted, get_project_stats(self.project.pk))
+
+    def test_bulk_delete_applies_counters_once(self):
+        self.bulk_delete(self.new_tasks(1))  # loads the role map
+        small = self.bulk_delete(self.new_tasks(2))
+        large = self.bulk_delete(self.new_tasks(20))
+        self.assertEqual(small, large)
+        self.new_tasks(3)
+        self.assert_counters_match_rows()
+        self.assertEqual(get_project_stats(self.project.pk)["comments"], 6)
+
+    def test_single_and_queryset_deletes(self):
+        ids = self.new_tasks(4)
+        Task.objects.get(pk=ids[0]).delete()
+        Comment.objects.filter(task_id=ids[1]).first().delete()
+        Comment.objects.filter(task_id__in=ids[2:]).delete()
+        self.assert_counters_match_rows()
+        self.assertEqual(get_project_stats(self.project.pk)["comments"], 1)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class ProjectCounterTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+
+    def test_stale_project_save_keeps_sync_counters(self):
+        stale = Project.objects.get(pk=self.project.pk)
+        first = Task.objects.create(project=self.project, title="a")
+        Project.objects.filter(pk=self.project.pk).update(sync_floor=1)
+        stale.name = "renamed"
+        stale.save()
+        response = self.client.patch(f"/api/projects/{self.project.pk}/", {"description": "d"},
+                                     content_type="application/json", **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        second = Task.objects.create(project=self.project, title="b")
+        self.assertGreater(second.sync_version, first.sync_version)
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.name, project.sync_floor), ("renamed", 1))
+        self.assertEqual(current_sync_version(project.pk), second.sync_version)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class SyncCommentTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.other = Project.objects.create(name="q", owner=self.owner)
+        self.task = Task.objects.create(project=self.project, title="t")
+        self.comment = Comment.objects.create(task=self.task, user=self.owner, content="c")
+
+    def test_comment_delta_reads_the_project_index(self):
+        since = current_sync_version(self.project.pk)
+        comments = Comment.objects.filter(project_id=self.project.pk, sync_version__gt=since).order_by("sync_version")
+        sql, params = comments.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("comment_project_sync_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_comments_move_with_their_task(self):
+        since = current_sync_version(self.other.pk)
+        response = self.client.patch(f"/api/tasks/{self.task.pk}/", {"project": self.other.pk},
+                                     content_type="application/json", **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Comment.objects.get().project_id, self.other.pk)
+        tasks, comments, *_ = get_changes(Project.objects.get(pk=self.other.pk), since)
+        self.assertEqual([comment.pk for comment in comments], [self.comment.pk])
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class InboxVisibilityTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.member = User.objects.create_user("member@example.com", "member", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.membership = ProjectMember.objects.create(project=self.project, user=self.member, role=ProjectMember.MEMBER)
+        self.task = Task.objects.create(project=self.project, title="t", assigned_to=self.member)
+        Comment.objects.create(task=self.task, user=self.owner, content="c")
+
+    def inbox(self):
+        response = self.client.get("/api/me/inbox/", **auth(self.member))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["results"]
+
+    def test_former_member_keeps_only_assigned_tasks(self):
+        other = Task.objects.create(project=self.project, title="u")
+        InboxItem.objects.create(user=self.member, kind=InboxItem.ASSIGNED, project=self.project, task=other)
+        self.assertEqual(len(self.inbox()), 3)
+        self.membership.delete()
+        self.assertEqual(InboxItem.objects.filter(user=self.member).count(), 2)
+        self.assertEqual({item["task"]["id"] for item in self.inbox()}, {self.task.pk})
+
+    def test_moved_task_leaves_with_its_new_project(self):
+        target = Project.objects.create(name="q", owner=self.owner)
+        ProjectMember.objects.create(project=target, user=self.member, role=ProjectMember.MEMBER)
+        response = self.client.patch(f"/api/tasks/{self.task.pk}/", {"project": target.pk},
+                                     content_type="application/json", **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(set(InboxItem.objects.values_list("project_id", flat=True)), {target.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/projects/{target.pk}/", **auth(self.owner))
+        self.assertEqual(response.status_code, 202, response.content)
+        run_jobs()
+        connection.check_constraints()
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(InboxItem.objects.exists())
+
+    def test_entries_of_unreadable_projects_are_hidden(self):
+        Task.objects.filter(pk=self.task.pk).update(assigned_to=None)
+        ProjectMember.objects.filter(pk=self.membership.pk).delete()  # no signals
+        resolver.clear()
+        self.assertEqual(self.inbox(), [])
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False}, QUERY_BUDGET={"ENABLED": False})
+class QueryBudgetHarnessTests(TestCase):
+    def test_scenarios_keep_their_budgets(self):
+        rows = measure_budgets(list(SCENARIOS), [1, 3], self.captureOnCommitCallbacks)
+        failed = {row["scenario"]: row for row in rows if row["verdict"] != "ok"}
+        self.assertEqual(failed, {})
+        reassign = next(row for row in rows if row["scenario"] == "tasks.reassign")
+        self.assertGreater(reassign["queries"][1], next(row for row in rows if row["scenario"] == "tasks.update")["queries"][1])
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False},
+                   QUERY_BUDGET={"ENABLED": True, "STRICT": True})
+class StrictQueryBudgetTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.task = Task.objects.create(project=self.project, title="t")
+
+    def test_writes_over_budget_are_logged_not_failed(self):
+        url = f"/api/tasks/{self.task.pk}/"
+        with mock.patch.object(TaskViewSet, "query_budget", {"retrieve": 0, "partial_update": 0}):
+            with self.assertLogs("task_app.query_budget", "ERROR"):
+                response = self.client.patch(url, {"title": "u"}, content_type="application/json", **auth(self.owner))
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(Task.objects.get().title, "u")
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url, **auth(self.owner))
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class BenchmarkRunnerTests(TestCase):
+    def test_profile_counts_only_the_request(self):
+        runner = Runner(BenchmarkData(**scale_for(2)))
+
+        def build(data):
+            data.new_task_with_comments()  # setup, not part of the request
+            return f"/api/tasks/{data.task.pk}/"
+
+        scenario = Scenario("probe", "GET", build)
+        report = runner.run(scenario, iterations=1, warmup=1, profile=2)
+        path, kwargs = runner.prepare(scenario)
+        with CaptureQueriesContext(connection) as queries:
+            runner.send(scenario, path, kwargs)
+        self.assertEqual(report["unexpected"], 0)
+        self.assertEqual(report["queries_max"], len(queries))
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        project = Project.objects.create(name="p", owner=self.owner)
+        for i in range(3):
+            Task.objects.create(project=project, title=f"t\u2028{i}", assigned_to=self.owner)
+
+    def test_opt_in_and_identical(self):
+        self.assertIsNone(FastSerializer.compile(TaskSerializer()))
+        plain = self.client.get("/api/tasks/", **auth(self.owner))
+        with override_settings(FAST_SERIALIZATION={"ENABLED": True}):
+            self.assertIsNotNone(FastSerializer.compile(TaskSerializer()))
+            fast = self.client.get("/api/tasks/", **auth(self.owner))
+        self.assertEqual((plain.status_code, fast.status_code), (200, 200))
+        self.assertEqual(plain.content, fast.content)
+
+
+class ThrottleDeploymentTests(TestCase):
+    def setUp(self):
+        caches["api"].clear()
+        set_store(CacheBucketStore(alias="api"))
+        self.addCleanup(set_store, None)
+
+    def test_process_local_store_fails_the_deploy_check(self):
+        self.assertEqual([error.id for error in check_shared_store(None)], ["task_app.E002"])
+        redis = {"STORE": "task_app.throttling.RedisBucketStore", "OPTIONS": {}}
+        with override_settings(THROTTLING=redis):
+            self.assertEqual(check_shared_store(None), [])
+
+    @override_settings(THROTTLING={"RATES": {"login_ip": "2/min"}})
+    def test_forwarded_for_does_not_reset_the_ip_bucket(self):
+        statuses = [
+            self.client.post("/api/users/login/", {"email": f"{i}@example.com", "password": "x"},
+                             content_type="application/json", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}").status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses[-1], 429)
+        self.assertNotIn(429, statuses[:-1])
+
+
+class MetricsEndpointTests(TestCase):
+    def test_needs_a_token_outside_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+        with override_settings(METRICS={"ENABLED": True, "TOKEN": "secret"}):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+
+class FixtureLoadTests(TestCase):
+    def test_loaddata_has_no_side_effects(self):
+        call_command("loaddata", settings.BASE_DIR / "sample_data.json", verbosity=0)
+        self.assertTrue(Task.objects.filter(assigned_to__isnull=False).exists())
+        self.assertTrue(Comment.objects.exists())
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(InboxItem.objects.exists())
+        self.assertFalse(ProjectStats.objects.exists())
+
+    def test_loaded_rows_are_in_the_full_sync(self):
+        call_command("loaddata", settings.BASE_DIR / "sample_data.json", verbosity=0)
+        project = Project.objects.get(pk=8)
+        tasks, comments, *_ = get_changes(project)
+        self.assertEqual({task.pk for task in tasks}, set(Task.objects.filter(project=project).values_list("pk", flat=True)))
+        self.assertEqual([comment.pk for comment in comments], [3])
+        owner = project.owner
+        response = self.client.get(f"/api/projects/{project.pk}/sync/", **auth(owner))
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+def racing_get_object(viewset):
+    # get_object() that lets another writer bump the row right after it was read
+    real = viewset.get_object
+
+    def get_object(view):
+        obj = real(view)
+        type(obj).objects.filter(pk=obj.pk).update(version=F("version") + 1)
+        return obj
+    return mock.patch.object(viewset, "get_object", get_object)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class ConcurrentEditTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.task = Task.objects.create(project=self.project, title="t")
+        self.url = f"/api/tasks/{self.task.pk}/"
+
+    def patch(self, **headers):
+        return self.client.patch(self.url, {"title": "mine"}, content_type="application/json",
+                                 **auth(self.owner), **headers)
+
+    def test_update_with_current_etag(self):
+        etag = self.client.get(self.url, **auth(self.owner))["ETag"]
+        response = self.patch(HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response["ETag"], '"2"')
+
+    def test_stale_if_match_is_412(self):
+        Task.objects.filter(pk=self.task.pk).update(title="theirs", version=2)
+        self.assertEqual(self.patch(HTTP_IF_MATCH='"1"').status_code, 412)
+        self.assertEqual(self.client.delete(self.url, HTTP_IF_MATCH='"1"', **auth(self.owner)).status_code, 412)
+        self.assertEqual(Task.objects.get().title, "theirs")
+
+    # A failed conditional UPDATE breaks the enclosing (test) transaction,
+    # see EditVersionedModel: one update per test
+
+    def test_write_between_read_and_update_with_if_match(self):
+        with racing_get_object(TaskViewSet):
+            self.assertEqual(self.patch(HTTP_IF_MATCH='"1"').status_code, 412)
+
+    def test_write_between_read_and_update(self):
+        with racing_get_object(TaskViewSet):
+            self.assertEqual(self.patch().status_code, 409)
+
+    def test_write_between_read_and_delete(self):
+        with racing_get_object(TaskViewSet):
+            response = self.client.delete(self.url, HTTP_IF_MATCH='"1"', **auth(self.owner))
+            self.assertEqual(response.status_code, 412)
+            self.assertEqual(self.client.delete(self.url, **auth(self.owner)).status_code, 409)
+        self.assertTrue(Task.objects.exists())
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_delete_with_current_etag(self):
+        response = self.client.delete(self.url, HTTP_IF_MATCH='"1"', **auth(self.owner))
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(list(Tombstone.objects.values_list("object_id", flat=True)), [self.task.pk])
+
+    def test_sync_versions_leave_the_project_row_alone(self):
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.create(project=self.project, title="u")
+            self.task.title = "v"
+            self.task.save()
+        project_table = Project._meta.db_table
+        self.assertFalse([q["sql"] for q in queries if q["sql"].startswith(f'UPDATE "{project_table}"')])
+        self.assertEqual(current_sync_version(self.project.pk), self.task.sync_version)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.invoice = Task.objects.create(project=self.project, title="Send invoices", description="to ACME")
+        self.deploy = Task.objects.create(project=self.project, title="Deploy", description="release notes")
+
+    def search(self, text):
+        response = self.client.get("/api/tasks/", {"search": text}, **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row["id"] for row in response.json()["results"]}
+
+    def test_title_description_and_prefix(self):
+        self.assertEqual(self.search("acme"), {self.invoice.pk})
+        self.assertEqual(self.search("relea"), {self.deploy.pk})
+        self.assertEqual(self.search("deploy notes"), {self.deploy.pk})
+        self.assertEqual(self.search(""), {self.invoice.pk, self.deploy.pk})
+
+    def test_triggers_follow_updates_and_deletes(self):
+        self.deploy.title = "Rollback"
+        self.deploy.save()
+        self.assertEqual(self.search("deploy"), set())
+        self.assertEqual(self.search("rollback"), {self.deploy.pk})
+        self.deploy.delete()
+        self.assertEqual(self.search("rollback"), set())
+
+    def test_fts_syntax_is_quoted(self):
+        self.assertEqual(self.search('title:acme OR "deploy'), set())
+        self.assertEqual(self.search("acme*)"), {self.invoice.pk})
+
+    def test_text_without_words_matches_nothing(self):
+        self.assertEqual(self.search("!!!"), set())
+
+
+REPLICA_ROUTING = {"REPLICAS": ["replica1"], "PIN_SECONDS": 5, "CACHE_ALIAS": "api"}
+
+
+@override_settings(DATABASE_ROUTING=REPLICA_ROUTING)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        caches["api"].clear()
+        self.factory = RequestFactory()
+
+    def route(self, method, write=False, authorization="Bearer a"):
+        # The alias a read would use before and after the view writes
+        seen = []
+
+        def view(request):
+            seen.append(db_router.db_for_read(Task))
+            if write:
+                db_router.db_for_write(Task)
+                seen.append(db_router.db_for_read(Task))
+            return HttpResponse()
+        request = self.factory.generic(method, "/api/tasks/", HTTP_AUTHORIZATION=authorization)
+        ReplicaRoutingMiddleware(view)(request)
+        return seen
+
+    def test_reads_go_to_replicas_until_a_write(self):
+        self.assertEqual(self.route("GET"), ["replica1"])
+        self.assertEqual(self.route("POST"), ["default"])
+        self.assertEqual(self.route("GET", write=True), ["replica1", "default"])
+        self.assertEqual(db_router.db_for_read(Task), "default")  # outside requests
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.route("POST", write=True)
+        self.assertEqual(self.route("GET"), ["default"])
+        self.assertEqual(self.route("GET", authorization="Bearer b"), ["replica1"])
+        caches["api"].clear()
+        self.assertEqual(self.route("GET"), ["replica1"])
+
+    def test_pins_need_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_pin_cache(None)], ["task_app.E003"])
+        shared = {**settings.CACHES, "api": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                             "LOCATION": "/tmp/task_app_test_cache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_pin_cache(None), [])
+        with override_settings(DATABASE_ROUTING={**REPLICA_ROUTING, "REPLICAS": []}):
+            self.assertEqual(check_shared_pin_cache(None), [])
+
+    @override_settings(THROTTLING={"ENABLED": False}, DATABASE_ROUTING={**REPLICA_ROUTING, "REPLICAS": []})
+    def test_export_reads_from_the_database_picked_by_the_view(self):
+        resolver.clear()
+        owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        project = Project.objects.create(name="p", owner=owner)
+        with mock.patch("task_app.views.router") as views_router, \
+                mock.patch("task_app.views.iter_project_records", return_value=iter([])) as records:
+            views_router.db_for_read.return_value = "replica1"
+            response = self.client.get(f"/api/projects/{project.pk}/export/", **auth(owner))
+            b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        records.assert_called_once_with(project.pk, using="replica1")
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class ProjectExportTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.task = Task.objects.create(project=self.project, title="a, \"quoted\"\nline")
+        self.comment = Comment.objects.create(task=self.task, user=self.owner, content="c")
+        self.empty = Task.objects.create(project=self.project, title="b")
+        self.url = f"/api/projects/{self.project.pk}/export/"
+
+    def export(self, user=None, **params):
+        return self.client.get(self.url, params.pop("query", {}), **auth(user or self.owner), **params)
+
+    def body(self, response):
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson_lists_each_task_before_its_comments(self):
+        response = self.export(query={"format": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        records = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([(record["type"], record["id"]) for record in records],
+                         [("task", self.task.pk), ("comment", self.comment.pk), ("task", self.empty.pk)])
+        self.assertEqual(records[0]["title"], self.task.title)
+
+    def test_csv_by_accept_header(self):
+        response = self.export(HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="project-%d.csv"' % self.project.pk, response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(self.body(response))))
+        self.assertEqual([(row["type"], row["title"], row["content"]) for row in rows],
+                         [("task", self.task.title, ""), ("comment", "", "c"), ("task", "b", "")])
+
+    def test_errors_are_json(self):
+        response = self.export(HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("detail", response.json())
+        outsider = User.objects.create_user("x@example.com", "x", "password123")
+        response = self.export(outsider, query={"format": "csv"})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("message", response.json())
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class ExpansionTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.busy = Task.objects.create(project=self.project, title="busy")
+        self.quiet = Task.objects.create(project=self.project, title="quiet")
+        Comment.objects.bulk_create([
+            Comment(task=self.busy, project=self.project, user=self.owner, content=f"c{i}") for i in range(25)
+        ])
+
+    def get(self, url):
+        response = self.client.get(url, **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_sparse_fields(self):
+        rows = self.get("/api/tasks/?fields=id,title")["results"]
+        self.assertEqual({tuple(sorted(row)) for row in rows}, {("id", "title")})
+
+    def test_expanded_comments_are_capped(self):
+        rows = {row["id"]: row for row in self.get("/api/tasks/?expand=comments.user")["results"]}
+        busy = rows[self.busy.pk]
+        self.assertEqual(busy["comments_count"], 25)
+        self.assertEqual([comment["content"] for comment in busy["comments"]], [f"c{i}" for i in range(24, 4, -1)])
+        self.assertEqual(busy["comments"][0]["user"]["id"], self.owner.pk)
+        self.assertEqual((rows[self.quiet.pk]["comments"], rows[self.quiet.pk]["comments_count"]), ([], 0))
+        task = self.get(f"/api/tasks/{self.busy.pk}/?expand=comments&fields=id,comments")
+        self.assertEqual((len(task["comments"]), task["comments_count"]), (20, 25))
+
+    def test_expanded_page_costs_the_same_for_more_rows(self):
+        url = "/api/tasks/?expand=assigned_to,comments.user"
+        self.get(url)  # warm the role map
+        with CaptureQueriesContext(connection) as few:
+            self.get(url)
+        for n in range(5):
+            task = Task.objects.create(project=self.project, title=f"t{n}", assigned_to=self.owner)
+            Comment.objects.create(task=task, user=self.owner, content="c")
+        with CaptureQueriesContext(connection) as more:
+            self.get(url)
+        self.assertEqual(len(more), len(few))
+
+    def test_nested_expansion_is_capped_too(self):
+        comment = Comment.objects.filter(task=self.busy).first()
+        # Not prefetched: the embedded task fetches its own slice and count
+        with self.assertLogs("task_app.query_budget", "WARNING"):
+            row = self.get(f"/api/comments/{comment.pk}/?expand=task.comments")
+        self.assertEqual((len(row["task"]["comments"]), row["task"]["comments_count"]), (20, 25))
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        now = timezone.now()
+        self.tasks = []
+        for i in range(7):
+            task = Task.objects.create(project=self.project, title=f"t{i}",
+                                       due_date=None if i % 3 == 0 else now + timedelta(days=i % 2))
+            self.tasks.append(task)
+        # Two pairs share a created_at, so pages must tie-break on id
+        Task.objects.filter(pk__in=[self.tasks[1].pk, self.tasks[2].pk]).update(created_at=now)
+        Task.objects.filter(pk__in=[self.tasks[4].pk, self.tasks[5].pk]).update(created_at=now - timedelta(hours=1))
+
+    def get(self, url):
+        response = self.client.get(url, **auth(self.owner))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, url, link="next"):
+        pages = []
+        while url:
+            page = self.get(url)
+            pages.append([row["id"] for row in page["results"]])
+            url = page[link]
+        return pages
+
+    def test_pages_follow_the_ordering_with_id_ties(self):
+        expected = list(Task.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        pages = self.walk("/api/tasks/?page_size=3")
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_walks_back(self):
+        pages = self.walk("/api/tasks/?page_size=3")
+        last = self.get("/api/tasks/?page_size=3")
+        last = self.get(self.get(last["next"])["next"])
+        back = self.walk(last["previous"], link="previous")
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_nullable_ordering_keeps_nulls_last(self):
+        expected = list(Task.objects.order_by(F("due_date").asc(nulls_last=True), "id").values_list("pk", flat=True))
+        self.assertEqual(sum(self.walk("/api/tasks/?ordering=due_date&page_size=2"), []), expected)
+        expected = list(Task.objects.order_by(F("due_date").desc(nulls_last=True), "-id").values_list("pk", flat=True))
+        self.assertEqual(sum(self.walk("/api/tasks/?ordering=-due_date&page_size=2"), []), expected)
+
+    def test_rows_inserted_between_pages_do_not_shift_them(self):
+        first = self.get("/api/tasks/?page_size=3")
+        Task.objects.create(project=self.project, title="new")
+        second = self.get(first["next"])
+        seen = [row["id"] for row in first["results"] + second["results"]]
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_stale_cursor_resumes_after_the_deleted_row(self):
+        first = self.get("/api/tasks/?page_size=3")
+        expected = [row["id"] for row in self.get(first["next"])["results"]]
+        Task.objects.filter(pk=first["results"][-1]["id"]).delete()
+        self.assertEqual([row["id"] for row in self.get(first["next"])["results"]], expected)
+
+    def test_bad_cursors_are_404(self):
+        cursors = [b"garbage", b"[]", b'[0,"a",null]', b"[2,1,null]", b'[0,1,"not a date"]']
+        for raw in cursors:
+            cursor = raw.decode() if raw == b"garbage" else urlsafe_b64encode(raw).decode()
+            response = self.client.get("/api/tasks/", {"cursor": cursor}, **auth(self.owner))
+            self.assertEqual(response.status_code, 404, raw)
+            self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+    def test_comment_lists_page_too(self):
+        comments = [Comment.objects.create(task=self.tasks[0], user=self.owner, content=f"c{i}") for i in range(5)]
+        pages = self.walk(f"/api/tasks/{self.tasks[0].pk}/comments/?page_size=2")
+        self.assertEqual(sum(pages, []), [comment.pk for comment in reversed(comments)])
+
+
+class IndexAdvisorTests(TestCase):
+    def test_every_query_shape_uses_an_index(self):
+        out = io.StringIO()
+        call_command("index_advisor", "--seed", "30", "--fail-on-scan", stdout=out)
+        self.assertIn(f"{len(QUERY_SHAPES)}/{len(QUERY_SHAPES)} query shapes use an index.", out.getvalue())
+        self.assertFalse(Task.objects.exists())  # the seed is rolled back
+
+    def test_full_scans_are_recognised(self):
+        pattern = FULL_SCAN_PATTERNS["sqlite"]
+        self.assertEqual(pattern.findall("SCAN task_app_task"), ["task_app_task"])
+        self.assertEqual(pattern.findall("SCAN task_app_task USING INDEX task_project_created_idx"), [])
+        self.assertEqual(pattern.findall("SCAN task_app_task USING COVERING INDEX task_status_idx"), [])
+        self.assertEqual(pattern.findall("SCAN task_app_task_fts VIRTUAL TABLE INDEX 0:M1"), [])
+        self.assertEqual(FULL_SCAN_PATTERNS["postgresql"].findall("Seq Scan on task_app_task"), ["task_app_task"])
+
+    def test_a_scan_fails_the_command(self):
+        with mock.patch.dict(QUERY_SHAPES, {"unindexed": lambda ctx: Task.objects.filter(title="x")}, clear=True):
+            with self.assertRaisesMessage(CommandError, "Full table scans in: unindexed"):
+                call_command("index_advisor", "--seed", "5", "--fail-on-scan", stdout=io.StringIO())
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": True, "ALIAS": "api", "TIMEOUT": 300})
+class ListCacheTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        caches["api"].clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.other = User.objects.create_user("other@example.com", "other", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.task = Task.objects.create(project=self.project, title="first")
+        self.url = f"/api/projects/{self.project.pk}/tasks/"
+
+    def get(self, user=None, **headers):
+        return self.client.get(self.url, **auth(user or self.owner), **headers)
+
+    def test_repeat_list_is_a_hit_without_queries(self):
+        first = self.get()
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertIn("ETag", first)
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.content, first.content)
+
+    def test_matching_etag_gets_304(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_task_writes_invalidate_the_list(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(project=self.project, title="second")
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_comment_writes_invalidate_the_list(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(task=self.task, user=self.owner, content="hi")
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag)["X-Cache"], "MISS")
+
+    def test_other_projects_keep_their_entries(self):
+        self.get()
+        other_project = Project.objects.create(name="q", owner=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(project=other_project, title="elsewhere")
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+
+    def test_entries_are_per_user(self):
+        ProjectMember.objects.create(project=self.project, user=self.other)
+        self.get()
+        self.assertEqual(self.get(self.other)["X-Cache"], "MISS")
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.outsider = User.objects.create_user("outsider@example.com", "outsider", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.tasks = [Task.objects.create(project=self.project, title=f"t{i}") for i in range(3)]
+        Comment.objects.create(task=self.tasks[0], user=self.owner, content="hi")
+        Project.objects.create(name="hidden", owner=self.outsider)
+
+    async def assert_mirrors(self, path, user=None):
+        headers = auth(user or self.owner)
+        # Async first, so the membership cache is not warmed by the sync route
+        resolver.clear()
+        # AsyncClient takes headers by name, not as META keys
+        mirrored = await self.async_client.get(f"/api/async/{path}",
+                                               headers={"Authorization": headers["HTTP_AUTHORIZATION"]})
+        sync = await sync_to_async(self.client.get)(f"/api/{path}", **headers)
+        self.assertEqual(mirrored.status_code, sync.status_code)
+        # Pagination links point back at the route that was asked
+        self.assertEqual(json.loads(mirrored.content.replace(b"/api/async/", b"/api/")), sync.json())
+        return mirrored
+
+    async def test_lists_match_the_sync_routes(self):
+        for path in ["tasks/", "tasks/?page_size=2", f"projects/{self.project.pk}/tasks/",
+                     "projects/", "comments/", f"tasks/{self.tasks[0].pk}/comments/"]:
+            with self.subTest(path=path):
+                await self.assert_mirrors(path)
+
+    async def test_detail_matches_the_sync_route(self):
+        response = await self.assert_mirrors(f"tasks/{self.tasks[0].pk}/")
+        self.assertEqual(response.json()["id"], self.tasks[0].pk)
+
+    async def test_scoping_matches_the_sync_routes(self):
+        response = await self.assert_mirrors("tasks/", self.outsider)
+        self.assertEqual(response.json()["results"], [])
+        response = await self.assert_mirrors(f"tasks/{self.tasks[0].pk}/", self.outsider)
+        self.assertEqual(response.status_code, 404)
+        response = await self.assert_mirrors("tasks/0/")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_anonymous_requests_are_rejected(self):
+        response = await self.async_client.get("/api/async/tasks/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class ProjectFeedTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        set_broker(InProcessBroker(history=3))
+        self.addCleanup(set_broker, None)
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.outsider = User.objects.create_user("outsider@example.com", "outsider", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        self.url = f"/api/projects/{self.project.pk}/feed/"
+
+    def create_tasks(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Task.objects.create(project=self.project, title=f"t{i}") for i in range(count)]
+
+    def token(self, user=None):
+        return auth(user or self.owner)["HTTP_AUTHORIZATION"]
+
+    async def open(self, url=None, user=None, **headers):
+        return await self.async_client.get(url or self.url, headers={"Authorization": self.token(user), **headers})
+
+    async def read(self, response, count):
+        """The first `count` SSE messages after the retry hint, as (id, event, data)."""
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+        messages = []
+        for _ in range(count):
+            fields = dict(line.split(": ", 1) for line in (await anext(chunks)).decode().strip().split("\n"))
+            messages.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+        await chunks.aclose()
+        return messages
+
+    async def test_last_event_id_resumes_after_that_event(self):
+        tasks = await sync_to_async(self.create_tasks)(3)
+        response = await self.open(**{"Last-Event-ID": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        messages = await self.read(response, 2)
+        self.assertEqual([(seq, event) for seq, event, _ in messages], [(2, "change"), (3, "change")])
+        self.assertEqual([data["id"] for _, _, data in messages], [tasks[1].pk, tasks[2].pk])
+        self.assertEqual(messages[0][2]["action"], "created")
+
+    async def test_position_outside_the_history_resets(self):
+        await sync_to_async(self.create_tasks)(5)
+        response = await self.open(f"{self.url}?since=1")
+        self.assertEqual(await self.read(response, 1), [(5, "reset", {"seq": 5})])
+
+    async def test_token_query_parameter_authenticates(self):
+        await sync_to_async(self.create_tasks)(1)
+        response = await self.async_client.get(f"{self.url}?since=0&token={self.token().split()[1]}")
+        self.assertEqual([(seq, event) for seq, event, _ in await self.read(response, 1)], [(1, "change")])
+
+    async def test_refusals(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+        self.assertEqual((await self.open(user=self.outsider)).status_code, 403)
+        self.assertEqual((await self.open("/api/projects/0/feed/")).status_code, 404)
+        self.assertEqual((await self.open(f"{self.url}?since=x")).status_code, 400)
+
+    async def test_live_events_follow_the_replay_without_duplicates(self):
+        broker = get_broker()
+        for i in range(2):
+            broker.publish(self.project.pk, make_event(self.project.pk, "task", "created", i))
+        events = stream_events(self.project.pk, since=1, keepalive=60)
+        self.assertEqual(await anext(events), ("change", {"seq": 2, **make_event(self.project.pk, "task", "created", 1)}))
+        subscription = next(iter(broker._subscribers[self.project.pk]))
+        subscription.push({"seq": 2, "id": "duplicate"})
+        broker.publish(self.project.pk, make_event(self.project.pk, "task", "updated", 1))
+        kind, event = await anext(events)
+        self.assertEqual((kind, event["seq"], event["action"]), ("change", 3, "updated"))
+        await events.aclose()
+        self.assertNotIn(self.project.pk, broker._subscribers)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False}, DELETION={"BATCH_SIZE": 2})
+class BatchedPurgeTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.member = User.objects.create_user("member@example.com", "member", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        ProjectMember.objects.create(project=self.project, user=self.member, role=ProjectMember.MEMBER)
+        self.tasks = [Task.objects.create(project=self.project, title=f"t{i}") for i in range(5)]
+        for task in self.tasks[:3]:
+            Comment.objects.create(task=task, user=self.member, content="hi")
+
+    def delete(self, url, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(url, **auth(user or self.owner))
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()["data"]
+
+    def test_rows_go_in_bounded_batches(self):
+        progress = Progress()
+        with CaptureQueriesContext(connection) as ctx:
+            comments = purge_in_batches(Comment.objects.filter(task__project=self.project), 2, progress, "comments")
+            tasks = purge_in_batches(Task.objects.filter(project=self.project), 2, progress, "tasks")
+        connection.check_constraints()
+        self.assertEqual((comments, tasks), (3, 5))
+        self.assertEqual(progress.deleted, {"comments": 3, "tasks": 5})
+        deletes = [query["sql"] for query in ctx.captured_queries if query["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 5)  # 2 + 1 comments, 2 + 2 + 1 tasks
+
+    def test_project_deletion_hides_now_and_purges_in_the_worker(self):
+        data = self.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(data["status"], Deletion.PENDING)
+        self.assertEqual(self.client.get(f"/api/projects/{self.project.pk}/", **auth(self.owner)).status_code, 404)
+        self.assertEqual(self.client.get(f"/api/tasks/{self.tasks[0].pk}/", **auth(self.member)).status_code, 404)
+
+        run_jobs()
+        connection.check_constraints()
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(ProjectMember.objects.exists())
+        deletion = self.client.get(data["status_url"], **auth(self.owner)).json()
+        self.assertEqual(deletion["status"], Deletion.DONE)
+        self.assertEqual(deletion["total"], {"inbox_items": 0, "comments": 3, "tasks": 5, "tombstones": 0})
+        self.assertEqual(deletion["deleted"], {"comments": 3, "tasks": 5, "projects": 1})
+
+    def test_user_deletion_reaches_their_rows_in_other_projects(self):
+        other = Project.objects.create(name="q", owner=self.owner)
+        ProjectMember.objects.create(project=other, user=self.member, role=ProjectMember.MEMBER)
+        task = Task.objects.create(project=other, title="elsewhere", assigned_to=self.member)
+        Comment.objects.create(task=task, user=self.member, content="bye")
+        owned = Project.objects.create(name="mine", owner=self.member)
+        Task.objects.create(project=owned, title="own")
+
+        admin = User.objects.create_superuser("admin@example.com", "admin", "password123")
+        data = self.delete(f"/api/users/{self.member.pk}/", admin)
+        run_jobs()
+        connection.check_constraints()
+        self.assertFalse(User.objects.filter(pk=self.member.pk).exists())
+        self.assertFalse(Project.objects.filter(pk=owned.pk).exists())
+        self.assertFalse(Comment.objects.filter(user_id=self.member.pk).exists())
+        task.refresh_from_db()
+        self.assertIsNone(task.assigned_to_id)
+        deletion = Deletion.objects.get(pk=data["id"])
+        self.assertEqual(deletion.status, Deletion.DONE)
+        self.assertEqual(deletion.deleted, {"tasks": 1, "projects": 1, "comments": 4, "unassigned": 1})
+
+    @override_settings(JOBS={"MAX_ATTEMPTS": 1})
+    def test_a_failed_purge_is_recorded(self):
+        data = self.delete(f"/api/projects/{self.project.pk}/")
+        with mock.patch("task_app.deletion.purge_projects", side_effect=RuntimeError("disk full")), \
+                self.assertLogs("task_app.jobs", "ERROR"):
+            run_jobs()
+        deletion = Deletion.objects.get(pk=data["id"])
+        self.assertEqual(deletion.status, Deletion.FAILED)
+        self.assertIn("disk full", deletion.error)
+        self.assertEqual(Task.objects.count(), 5)
+
+    def test_deletions_are_visible_to_their_requester_only(self):
+        data = self.delete(f"/api/projects/{self.project.pk}/")
+        self.assertEqual(self.client.get(data["status_url"], **auth(self.member)).status_code, 404)
+
+
+@override_settings(THROTTLING={"ENABLED": False}, API_CACHE={"ENABLED": False})
+class VisibilityScopingTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.owner = User.objects.create_user("owner@example.com", "owner", "password123")
+        self.member = User.objects.create_user("member@example.com", "member", "password123")
+        self.assignee = User.objects.create_user("assignee@example.com", "assignee", "password123")
+        self.outsider = User.objects.create_user("outsider@example.com", "outsider", "password123")
+        self.admin = User.objects.create_superuser("admin@example.com", "admin", "password123")
+        self.project = Project.objects.create(name="p", owner=self.owner)
+        ProjectMember.objects.create(project=self.project, user=self.member, role=ProjectMember.MEMBER)
+        self.other = Project.objects.create(name="q", owner=self.outsider)
+        self.task = Task.objects.create(project=self.project, title="t")
+        self.assigned = Task.objects.create(project=self.project, title="mine", assigned_to=self.assignee)
+        self.foreign = Task.objects.create(project=self.other, title="elsewhere")
+        self.comment = Comment.objects.create(task=self.assigned, user=self.owner, content="c")
+        self.foreign_comment = Comment.objects.create(task=self.foreign, user=self.outsider, content="c")
+
+    def ids(self, user, url):
+        response = self.client.get(url, **auth(user))
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return {row["id"] for row in (data["results"] if isinstance(data, dict) else data)}
+
+    def assert_visible(self, user, projects, tasks, comments):
+        self.assertEqual(self.ids(user, "/api/projects/"), {project.pk for project in projects})
+        self.assertEqual(self.ids(user, "/api/tasks/"), {task.pk for task in tasks})
+        self.assertEqual(self.ids(user, "/api/comments/"), {comment.pk for comment in comments})
+
+    def test_lists_hold_only_visible_rows(self):
+        self.assert_visible(self.owner, [self.project], [self.task, self.assigned], [self.comment])
+        self.assert_visible(self.member, [self.project], [self.task, self.assigned], [self.comment])
+        self.assert_visible(self.assignee, [], [self.assigned], [self.comment])
+        self.assert_visible(self.outsider, [self.other], [self.foreign], [self.foreign_comment])
+        self.assert_visible(self.admin, [self.project, self.other], [self.task, self.assigned, self.foreign],
+                            [self.comment, self.foreign_comment])
+
+    def test_subquery_form_matches_the_inline_ids(self):
+        with mock.patch.dict(membership_config, {"INLINE_PROJECTS": 0}):
+            self.assert_visible(self.member, [self.project], [self.task, self.assigned], [self.comment])
+            self.assert_visible(self.assignee, [], [self.assigned], [self.comment])
+            with CaptureQueriesContext(connection) as ctx:
+                self.ids(self.member, "/api/tasks/")
+        self.assertIn("FROM \"task_app_projectmember\"", ctx.captured_queries[-1]["sql"])
+
+    def test_details_outside_the_scope_are_404(self):
+        for url in [f"/api/projects/{self.other.pk}/", f"/api/tasks/{self.foreign.pk}/",
+                    f"/api/comments/{self.foreign_comment.pk}/", f"/api/projects/{self.other.pk}/tasks/",
+                    f"/api/tasks/{self.task.pk}/"]:
+            with self.subTest(url=url):
+                response = self.client.get(url, **auth(self.assignee))
+                if url.endswith("/tasks/"):
+                    self.assertEqual(response.json()["results"], [])
+                else:
+                    self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(f"/api/tasks/{self.assigned.pk}/", **auth(self.assignee)).status_code, 200)
+        self.assertEqual(self.client.get(f"/api/projects/{self.other.pk}/", **auth(self.admin)).status_code, 200)
+
+    def test_list_filter_is_one_query(self):
+        self.client.get("/api/tasks/", **auth(self.member))  # warm the role cache
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/tasks/", **auth(self.member))
+        selects = [query["sql"] for query in ctx.captured_queries if "FROM \"task_app_task\"" in query["sql"]]
+        self.assertEqual(len(selects), 1)
+        self.assertIn(f"\"task_app_task\".\"project_id\" IN ({self.project.pk})", selects[0])
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+
+def _config():
+    return getattr(settings, "THROTTLING", {})
+
+
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60,
+           "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+def parse_rate(rate):
+    """
+    "10/min" or {"RATE": "10/min", "BURST": 30} -> (interval, burst).
+
+    A bucket holds `burst` tokens (default: the rate's count) and gains one
+    every `interval` seconds.
+    """
+    burst = None
+    if isinstance(rate, dict):
+        rate, burst = rate["RATE"], rate.get("BURST")
+    count, _, period = rate.partition("/")
+    count = int(count)
+    if count <= 0 or period not in PERIODS:
+        raise ValueError(f"Invalid throttle rate {rate!r}")
+    return PERIODS[period] / count, burst or count
+
+
+# ----- bucket stores -----
+# Buckets use GCRA (generic cell rate algorithm), an exact token bucket that
+# stores a single timestamp per key: the "theoretical arrival time" (TAT)
+# at which the bucket would be full again.  A request is allowed when
+# TAT + interval - now <= burst * interval.
+def gcra(tat, now, interval, burst):
+    """(new TAT, seconds to wait or 0) for one request against a bucket."""
+    new = max(tat or now, now) + interval
+    return new, max(new - now - burst * interval, 0)
+
+
+class CacheBucketStore:
+    """
+    Buckets in a Django cache: one get_many(), plus one set_many() when the
+    request is let through.  Read-modify-write is serialized per process
+    only, so this is exact for a process-local cache (locmem, the default
+    and the test stand-in) and approximate when several workers share the
+    cache; use RedisBucketStore there.
+    """
+
+    def __init__(self, alias="default", prefix="throttle"):
+        self.alias = alias
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consume(self, buckets, now=None):
+        """Take a token from every (key, interval, burst) bucket, or from none; returns seconds to wait."""
+        now = time.time() if now is None else now
+        buckets = [(f"{self.prefix}:{key}", interval, burst) for key, interval, burst in buckets]
+        with self._lock:
+            tats = self.cache.get_many([key for key, _, _ in buckets])
+            updates, wait = self.evaluate(buckets, tats, now)
+            if not wait:
+                # A TAT in the past means a full bucket, so outliving it is harmless
+                self.cache.set_many(updates, max(int(tat - now) + 1 for tat in updates.values()))
+        return wait
+
+    async def aconsume(self, buckets, now=None):
+        return await asyncio.to_thread(self.consume, buckets, now)
+
+    @staticmethod
+    def evaluate(buckets, tats, now):
+        updates, wait = {}, 0
+        for key, interval, burst in buckets:
+            updates[key], over = gcra(tats.get(key), now, interval, burst)
+            wait = max(wait, over)
+        return updates, wait
+
+
+class RedisBucketStore:
+    """
+    Buckets in a Redis-protocol server, checked and updated atomically by a
+    Lua script: one round trip per request however many buckets it uses.
+    `client` is anything redis-py compatible.
+    """
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local wait = 0
+    local tats = {}
+    for i, key in ipairs(KEYS) do
+        local interval = tonumber(ARGV[i * 2])
+        local burst = tonumber(ARGV[i * 2 + 1])
+        local tat = tonumber(redis.call('GET', key) or now)
+        if tat < now then tat = now end
+        tats[i] = tat + interval
+        local over = tats[i] - now - burst * interval
+        if over > wait then wait = over end
+    end
+    if wait > 0 then return tostring(wait) end
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    end
+    return '0'
+    """
+
+    def __init__(self, client=None, url="redis://127.0.0.1:6379/0", prefix="throttle"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(self.SCRIPT)
+
+    def consume(self, buckets, now=None):
+        now = time.time() if now is None else now
+        args = [now]
+        for _, interval, burst in buckets:
+            args += [interval, burst]
+        wait = self.script(keys=[f"{self.prefix}:{key}" for key, _, _ in buckets], args=args)
+        return float(wait)
+
+    async def aconsume(self, buckets, now=None):
+        return await asyncio.to_thread(self.consume, buckets, now)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = _config()
+            store_class = import_string(config.get("STORE", "task_app.throttling.CacheBucketStore"))
+            _store = store_class(**config.get("OPTIONS", {}))
+        return _store
+
+
+def set_store(store):
+    """Swap the process-wide bucket store (e.g. for a Redis stand-in in tests)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# Cache backends whose entries each process keeps to itself
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_shared_store(app_configs, **kwargs):
+    config = _config()
+    if not config.get("ENABLED", True):
+        return []
+    store_class = import_string(config.get("STORE", "task_app.throttling.CacheBucketStore"))
+    alias = config.get("OPTIONS", {}).get("alias", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if issubclass(store_class, CacheBucketStore) and backend in PROCESS_LOCAL_CACHES:
+        return [checks.Error(
+            f"Throttle buckets are kept in the process-local {alias!r} cache, so each worker enforces its own limits.",
+            hint="Set THROTTLE_STORE=redis, or give the cache store a shared cache.",
+            id="task_app.E002",
+        )]
+    return []
+
+
+# ----- throttle classes -----
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base class: get_buckets() names the buckets a request draws from as
+    (scope, identity) pairs; their rates come from THROTTLING["RATES"][scope]
+    and a scope without a rate is not throttled.  All buckets are checked
+    and charged in one store call, and only charged if all of them allow it.
+    """
+
+    def get_buckets(self, request, view):
+        raise NotImplementedError
+
+    def resolve(self, request, view):
+        if not _config().get("ENABLED", True):
+            return []
+        rates = _config().get("RATES", {})
+        buckets = []
+        for scope, identity in self.get_buckets(request, view):
+            if identity is None or not rates.get(scope):
+                continue
+            interval, burst = parse_rate(rates[scope])
+            buckets.append((f"{scope}:{identity}", interval, burst))
+        return buckets
+
+    def allow_request(self, request, view):
+        buckets = self.resolve(request, view)
+        self.wait_seconds = get_store().consume(buckets) if buckets else 0
+        return not self.wait_seconds
+
+    async def aallow_request(self, request, view):
+        buckets = self.resolve(request, view)
+        self.wait_seconds = await get_store().aconsume(buckets) if buckets else 0
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds or None
+
+    def get_identity(self, request):
+        """The user's id, or "ip-<address>" for anonymous requests."""
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return str(user.pk)
+        return f"ip-{self.get_ident(request)}"
+
+
+class ActionThrottle(TokenBucketThrottle):
+    """
+    Default throttle.  A view's `throttle_scopes` maps an action to a scope
+    ({"bulk_create": "bulk", "*": "user"}); actions not listed use "user"
+    for authenticated requests and "anon" otherwise.  Buckets are per user
+    (or client IP) and scope.
+    """
+
+    def get_buckets(self, request, view):
+        scopes = getattr(view, "throttle_scopes", {})
+        action = getattr(view, "action", None) or request.method.lower()
+        default = "user" if request.user and request.user.is_authenticated else "anon"
+        scope = scopes.get(action, scopes.get("*", default))
+        return [(scope, self.get_identity(request))]
+
+
+class CredentialThrottle(TokenBucketThrottle):
+    """
+    For endpoints that take an email and are open to anyone (login,
+    register): one bucket per client IP and one per email address, so
+    neither spraying one account from many addresses nor many accounts from
+    one address gets past the limit.  Scopes are "<scope>_ip" and
+    "<scope>_email".
+    """
+    scope = None
+
+    def get_buckets(self, request, view):
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        email_key = None
+        if isinstance(email, str) and email.strip():
+            email_key = hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:32]
+        return [
+            (f"{self.scope}_ip", self.get_ident(request)),
+            (f"{self.scope}_email", email_key),
+        ]
+
+
+class LoginThrottle(CredentialThrottle):
+    scope = "login"
+
+
+class RegisterThrottle(CredentialThrottle):
+    scope = "register"
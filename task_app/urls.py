@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_nested.routers import NestedDefaultRouter
-from . import views
+from . import views, async_views
 
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'projects', views.ProjectViewSet, basename='projects')
 router.register(r'project_members', views.ProjectMemberViewSet, basename='project_members')
 router.register(r'tasks', views.TaskViewSet, basename='tasks')
 router.register(r'comments', views.CommentViewSet, basename='comments')
+router.register(r'deletions', views.DeletionViewSet, basename='deletions')
 
 projects_router = NestedDefaultRouter(router, r'projects', lookup='project')
 projects_router.register(r'tasks', views.TaskViewSet, basename='project-tasks')
@@ -22,6 +23,18 @@ urlpatterns = [
     path("users/register/", views.RegisterView.as_view(), name="register"),
     path("users/login/", views.LoginView.as_view(), name="login"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("me/inbox/", views.InboxViewSet.as_view({"get": "list"}), name="inbox"),
+
+    # Native async read paths (serve them under ASGI)
+    path("async/tasks/", async_views.task_list, name="async-tasks-list"),
+    path("async/tasks/<int:pk>/", async_views.task_detail, name="async-tasks-detail"),
+    path("async/projects/", async_views.project_list, name="async-projects-list"),
+    path("async/projects/<int:project_pk>/tasks/", async_views.task_list, name="async-project-tasks-list"),
+    path("async/comments/", async_views.comment_list, name="async-comments-list"),
+    path("async/tasks/<int:task_pk>/comments/", async_views.comment_list, name="async-task-comments-list"),
+
+    # Change feed: Server-Sent Events, or WebSocket on the same path (ASGI only)
+    path("projects/<int:project_pk>/feed/", async_views.project_feed, name="project-feed"),
 
     path("", include(router.urls)),
     path("", include(projects_router.urls)),
@@ -1,12 +1,33 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, permissions, viewsets
+from rest_framework import mixins, status, permissions, viewsets
+from rest_framework.decorators import action
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.response import Response
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
 from .serializers import *
+from .filters import TaskFilter, TaskSearchFilter
+from .pagination import KeysetCursorPagination
+from .membership import aget_project_roles, filter_visible, is_project_member, is_project_owner
+from .caching import ListCacheMixin, project_scope
+from .expansion import ExpandableViewMixin
+from .fast_serializers import FastListMixin
+from .export import csv_lines, iter_project_records, ndjson_lines
+from .renderers import CSVRenderer, NDJSONRenderer
+from .throttling import LoginThrottle, RegisterThrottle
+from .query_budget import QueryBudgetMixin
+from .concurrency import OptimisticConcurrencyMixin
+from .stats import get_project_stats
+from .sync import InvalidToken, TokenExpired, decode_token, encode_token, get_changes
+from .deletion import request_project_deletion, request_user_deletion
+from .signals import tasks_bulk_changed
 from .models import *
 
 User = get_user_model()
@@ -14,6 +35,7 @@ User = get_user_model()
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterThrottle]
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -25,6 +47,7 @@ class RegisterView(APIView):
 
 class LoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginThrottle]
 
 
 class IsSelfOrReadOnly(permissions.BasePermission):
@@ -38,7 +61,8 @@ class IsSelfOrReadOnly(permissions.BasePermission):
 
 class IsTaskEditor(BasePermission):
     """
-    ─ create/list/retrieve ────────── any authenticated user (handled in has_permission)
+    ─ list/retrieve ───────────────── any authenticated user (rows are scoped by get_queryset)
+    ─ create ──────────────────────── superuser OR project‑member (TaskViewSet.perform_create, as /bulk/)
     ─ update/partial_update ──────── superuser OR project‑member OR assigned user
     ─ destroy ────────────────────── superuser OR project‑member
     """
@@ -56,8 +80,8 @@ class IsTaskEditor(BasePermission):
         if request.user.is_superuser:
             return True
 
-        # Is the caller a member of this project?
-        is_proj_member = obj.project.members.filter(id=request.user.id).exists()
+        # Is the caller a member of this project?  Resolved once per request.
+        is_proj_member = is_project_member(request, obj.project_id)
 
         if request.method == "DELETE":
             # Delete: superuser OR any project member
@@ -67,6 +91,12 @@ class IsTaskEditor(BasePermission):
         if is_proj_member:
             return True            # project member allowed
         return obj.assigned_to_id == request.user.id  # assignee allowed
+
+    async def ahas_object_permission(self, request, view, obj):
+        # Async views: load the role map without blocking, then reuse the rules above
+        if request.method not in SAFE_METHODS:
+            await aget_project_roles(request)
+        return self.has_object_permission(request, view, obj)
     
 
 class IsSelfOrAdminForDeleteOnly(BasePermission):
@@ -93,7 +123,7 @@ class IsSuperUserOrReadOnly(BasePermission):
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     permission_classes = [IsSelfOrAdminForDeleteOnly]
 
     def get_serializer_class(self):
@@ -128,11 +158,9 @@ class UserViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         user = self.get_object()
         self.check_object_permissions(request, user)
-        user.delete()
-        return Response(
-            {"message": "User deleted successfully"},
-            status=status.HTTP_204_NO_CONTENT
-        )
+        # Deactivated now; projects, comments and assignments are purged by the worker
+        deletion = request_user_deletion(user, request.user)
+        return deletion_accepted("User deletion started", deletion, request)
 
     def list(self, request, *args, **kwargs):
         return Response(
@@ -141,10 +169,20 @@ class UserViewSet(viewsets.ModelViewSet):
         )
     
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+class ProjectViewSet(QueryBudgetMixin, ListCacheMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = Project.objects.filter(deleted_at__isnull=True)
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    sync_limit = 500
+    sync_max_limit = 2000
+    throttle_scopes = {"export": "export", "sync": "sync"}
+    # Warm-cache counts plus 2 for a cold token stamp / role map (check_query_budgets)
+    query_budget = {"list": 3, "retrieve": 3, "create": 3, "update": 6, "partial_update": 7, "destroy": 10,
+                    "stats": 5, "sync": 6, "export": 5}
+
+    def get_queryset(self):
+        # Projects the caller owns or belongs to (all, for superusers)
+        return filter_visible(super().get_queryset(), self.request)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -158,7 +196,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     def update(self, request, *args, **kwargs):
         project = self.get_object()
-        if project.owner != request.user:
+        if not is_project_owner(request, project.id):
             return Response({
                 "message": "You do not have permission to update this project."
             }, status=status.HTTP_403_FORBIDDEN)
@@ -171,7 +209,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     def partial_update(self, request, *args, **kwargs):
         project = self.get_object()
-        if project.owner != request.user:
+        if not is_project_owner(request, project.id):
             return Response({
                 "message": "You do not have permission to update this project."
             }, status=status.HTTP_403_FORBIDDEN)
@@ -184,21 +222,75 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         project = self.get_object()
-        if project.owner != request.user:
+        if not is_project_owner(request, project.id):
             return Response({
                 "message": "You do not have permission to delete this project."
             }, status=status.HTTP_403_FORBIDDEN)
 
-        project.delete()
+        # Hidden now; tasks and comments are purged in batches by the worker
+        deletion = request_project_deletion(project, request.user)
+        return deletion_accepted("Project deletion started", deletion, request)
+
+    # /projects/<id>/stats/  counts by status, priority and assignee, overdue and comments
+    @action(detail=True, methods=["get"])
+    def stats(self, request, *args, **kwargs):
+        project = self.get_object()
+        return Response(get_project_stats(project.id))
+
+    # /projects/<id>/sync/?since=<token>  tasks and comments changed or deleted since the token
+    @action(detail=True, methods=["get"])
+    def sync(self, request, *args, **kwargs):
+        project = self.get_object()
+        if not (request.user.is_superuser or is_project_member(request, project.id)):
+            return Response({
+                "message": "You do not have permission to sync this project."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            since = decode_token(request.query_params.get("since"), project.id)
+            limit = min(max(int(request.query_params.get("limit", self.sync_limit)), 1), self.sync_max_limit)
+            tasks, comments, deleted, version, has_more = get_changes(project, since, limit)
+        except (InvalidToken, ValueError):
+            return Response({"message": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+        except TokenExpired:
+            return Response({
+                "message": "Sync token has expired; sync again without a token.",
+            }, status=status.HTTP_410_GONE)
+
         return Response({
-            "message": "Project deleted successfully"
-        }, status=status.HTTP_204_NO_CONTENT)
+            "token": encode_token(project.id, version),
+            "has_more": has_more,
+            "tasks": TaskSerializer(tasks, many=True).data,
+            "comments": CommentSerializer(comments, many=True).data,
+            "deleted": {"tasks": deleted[Tombstone.TASK], "comments": deleted[Tombstone.COMMENT]},
+        })
+
+    # /projects/<id>/export/?format=ndjson|csv  (or an Accept header)
+    @action(detail=True, methods=["get"], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        project_id = int(kwargs["pk"]) if str(kwargs["pk"]).isdigit() else None
+        if not Project.objects.filter(id=project_id, deleted_at__isnull=True).exists():
+            return Response({"message": "Project not found."}, status=status.HTTP_404_NOT_FOUND)
+        if not (request.user.is_superuser or is_project_member(request, project_id)):
+            return Response({
+                "message": "You do not have permission to export this project."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        renderer = request.accepted_renderer
+        # The body is read after this view returns, when requests no longer
+        # route to replicas (db_routers): pick the database now
+        records = iter_project_records(project_id, using=router.db_for_read(Task))
+        lines = csv_lines(records) if renderer.format == "csv" else ndjson_lines(records)
+        response = StreamingHttpResponse(lines, content_type=f"{renderer.media_type}; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="project-{project_id}.{renderer.format}"'
+        return response
         
         
-class ProjectMemberViewSet(viewsets.ModelViewSet):
+class ProjectMemberViewSet(QueryBudgetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = ProjectMember.objects.all()
     serializer_class = ProjectMemberSerializer
     permission_classes = [permissions.IsAuthenticated, IsSuperUserOrReadOnly]
+    query_budget = {"list": 2, "retrieve": 2, "create": 5, "update": 7, "partial_update": 5, "destroy": 4}
 
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
@@ -228,17 +320,43 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_204_NO_CONTENT)
         
         
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(QueryBudgetMixin, OptimisticConcurrencyMixin, ListCacheMixin, ExpandableViewMixin, FastListMixin,
+                  viewsets.ModelViewSet):
     queryset = Task.objects.select_related("project", "assigned_to")
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsTaskEditor]
+    required_fields = ["project", "assigned_to", "version"]  # always loaded under ?fields= (IsTaskEditor, ETag)
+    pagination_class = KeysetCursorPagination
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, OrderingFilter]
+    filterset_class = TaskFilter
+    ordering_fields = ["created_at", "due_date", "priority", "status", "title"]
+    ordering = ["-created_at"]
+    throttle_scopes = {"bulk": "bulk"}
+    # Updates allow for a reassignment (tasks.reassign), which also moves
+    # counters and inbox entries and queues a notice.  /bulk/ budgets cover a
+    # batch of up to 500 rows (BulkTaskListSerializer.batch_size) in one
+    # project; every further 500 rows or project adds statements.
+    query_budget = {"list": 4, "retrieve": 3, "create": 11, "update": 13, "partial_update": 13, "destroy": 13,
+                    "bulk:post": 13, "bulk:patch": 10, "bulk:delete": 13}
 
     # Optional nested route support: /projects/<project_pk>/tasks/
     def get_queryset(self):
         project_id = self.kwargs.get("project_pk")
-        base_qs = super().get_queryset()
+        # Tasks of the caller's projects, plus any assigned to them (IsTaskEditor lets assignees edit)
+        base_qs = filter_visible(super().get_queryset(), self.request, "project__", "assigned_to_id")
         return base_qs.filter(project_id=project_id) if project_id else base_qs
 
+    def get_cache_scopes(self):
+        project_id = self.kwargs.get("project_pk")
+        return [project_scope(project_id)] if project_id else super().get_cache_scopes()
+
+    def perform_create(self, serializer):
+        # Only members of the target project (or superusers) may create tasks
+        # in it, alone or through /bulk/; assignees may edit but not create
+        if not self.can_create_in(self.request, serializer.validated_data["project"].id):
+            self.permission_denied(self.request)
+        serializer.save()
+
     # Success‑message wrappers
     def create(self, request, *args, **kwargs):
         resp = super().create(request, *args, **kwargs)
@@ -257,9 +375,148 @@ class TaskViewSet(viewsets.ModelViewSet):
         super().destroy(request, *args, **kwargs)
         return Response({"message": "Task deleted successfully"},
                         status=status.HTTP_204_NO_CONTENT)
+
+    # ----- bulk: /tasks/bulk/ and /projects/<project_pk>/tasks/bulk/ -----
+    #   POST   [{task}, ...]              create
+    #   PATCH  [{"id": 1, ...}, ...]      partial update
+    #   DELETE [1, 2, ...]                delete
+    # All-or-nothing: any invalid or forbidden item rejects the whole batch
+    # with per-item errors; otherwise everything is written in one transaction.
+    bulk_max_items = 5000
+
+    @action(detail=False, methods=["post", "patch", "delete"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"message": "Expected a non-empty list."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response({"message": f"At most {self.bulk_max_items} items per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.method == "POST":
+            return self.bulk_create(request, items)
+        if request.method == "PATCH":
+            return self.bulk_update(request, items)
+        return self.bulk_destroy(request, items)
+
+    def bulk_create(self, request, items):
+        project_id = self.kwargs.get("project_pk")
+        if project_id:
+            items = [{"project": project_id, **item} if isinstance(item, dict) else item for item in items]
+
+        serializer = self.get_bulk_serializer(items)
+        if not serializer.is_valid():
+            return self.bulk_errors("Tasks not created", serializer.errors)
+
+        denied = [
+            {} if self.can_create_in(request, attrs["project"].id) else self.bulk_denied()
+            for attrs in serializer.validated_data
+        ]
+        if any(denied):
+            return self.bulk_errors("Tasks not created", denied, status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            tasks = serializer.save()
+            tasks_bulk_changed.send(sender=Task, action="create", tasks=tasks)
+        return Response({"message": f"{len(tasks)} tasks created successfully", "results": serializer.data},
+                        status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, items):
+        tasks, errors = self.get_bulk_tasks(items, lambda item: item.get("id") if isinstance(item, dict) else None)
+        if any(errors):
+            return self.bulk_errors("Tasks not updated", errors, status.HTTP_404_NOT_FOUND)
+
+        serializer = self.get_bulk_serializer(items, instance=tasks, partial=True)
+        if not serializer.is_valid():
+            return self.bulk_errors("Tasks not updated", serializer.errors)
+
+        denied = [
+            {} if self.permission_allows(request, tasks[item["id"]]) else self.bulk_denied()
+            for item in items
+        ]
+        if any(denied):
+            return self.bulk_errors("Tasks not updated", denied, status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            updated = serializer.save()
+            tasks_bulk_changed.send(sender=Task, action="update", tasks=updated)
+        return Response({"message": f"{len(updated)} tasks updated successfully", "results": serializer.data})
+
+    def bulk_destroy(self, request, items):
+        tasks, errors = self.get_bulk_tasks(items, lambda item: item)
+        if any(errors):
+            return self.bulk_errors("Tasks not deleted", errors, status.HTTP_404_NOT_FOUND)
+
+        denied = [{} if self.permission_allows(request, tasks[pk]) else self.bulk_denied() for pk in items]
+        if any(denied):
+            return self.bulk_errors("Tasks not deleted", denied, status.HTTP_403_FORBIDDEN)
+
+        with transaction.atomic():
+            Task.objects.filter(id__in=list(tasks)).delete()
+            tasks_bulk_changed.send(sender=Task, action="delete", tasks=list(tasks.values()))
+        return Response({"message": f"{len(tasks)} tasks deleted successfully",
+                         "results": [{"id": pk, "deleted": True} for pk in items]})
+
+    def get_bulk_serializer(self, items, instance=None, partial=False):
+        # Resolve every referenced project/user up front: one query each
+        # instead of one per item inside PrimaryKeyRelatedField.
+        project_ids, user_ids = set(), set()
+        for item in items:
+            if isinstance(item, dict):
+                project_ids.add(item.get("project"))
+                user_ids.add(item.get("assigned_to"))
+        context = self.get_serializer_context()
+        context["prefetched"] = {
+            Project: Project.objects.filter(deleted_at__isnull=True).in_bulk(self.clean_ids(project_ids)),
+            User: User.objects.in_bulk(self.clean_ids(user_ids)),
+        }
+        return TaskSerializer(instance, data=items, many=True, partial=partial, context=context)
+
+    def get_bulk_tasks(self, items, get_id):
+        ids = [get_id(item) for item in items]
+        tasks = self.get_queryset().in_bulk([pk for pk in ids if type(pk) is int])
+        seen, errors = set(), []
+        for pk in ids:
+            if type(pk) is not int or pk not in tasks:
+                errors.append({"id": [f"Task {pk!r} not found."]})
+            elif pk in seen:
+                errors.append({"id": ["Duplicate id in request."]})
+            else:
+                errors.append({})
+                seen.add(pk)
+        return tasks, errors
+
+    @staticmethod
+    def clean_ids(values):
+        ids = []
+        for value in values:
+            if type(value) is int:
+                ids.append(value)
+            elif isinstance(value, str) and value.isdigit():
+                ids.append(int(value))
+        return ids
+
+    def can_create_in(self, request, project_id):
+        return request.user.is_superuser or is_project_member(request, project_id)
+
+    def permission_allows(self, request, task):
+        # Same rules as the single-object endpoints, against the cached role map
+        return all(
+            permission.has_object_permission(request, self, task)
+            for permission in self.get_permissions()
+        )
+
+    @staticmethod
+    def bulk_denied():
+        return {"non_field_errors": ["You do not have permission to perform this action."]}
+
+    @staticmethod
+    def bulk_errors(message, errors, status_code=status.HTTP_400_BAD_REQUEST):
+        return Response({"message": message, "errors": errors}, status=status_code)
         
         
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QueryBudgetMixin, OptimisticConcurrencyMixin, ExpandableViewMixin, FastListMixin,
+                     viewsets.ModelViewSet):
     """
     • list   /comments/                     (all authenticated)
     • list   /tasks/<task_pk>/comments/     (nested)
@@ -267,19 +524,30 @@ class CommentViewSet(viewsets.ModelViewSet):
     • retrieve /comments/<id>/
     • update /comments/<id>/
     • destroy /comments/<id>/
+    GET requests accept ?fields= and ?expand=user,task (see ExpandableViewMixin).
+    Single comments carry an ETag; writes accept If-Match (OptimisticConcurrencyMixin).
     """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    required_fields = ["version"]  # always loaded under ?fields= (ETag)
+    # A comment on a task assigned to someone else also adds an inbox entry and queues a notice
+    query_budget = {"list": 3, "retrieve": 3, "create": 10, "update": 5, "partial_update": 5, "destroy": 10}
 
     def get_queryset(self):
-        qs = Comment.objects.select_related('user', 'task')
+        # Comments on the tasks the caller can see (TaskViewSet.get_queryset)
+        qs = filter_visible(Comment.objects.select_related('user', 'task'), self.request,
+                            "task__project__", "task__assigned_to_id")
         task_id = self.kwargs.get('task_pk')
         return qs.filter(task_id=task_id) if task_id else qs
 
     def perform_create(self, serializer):
-        # Assign the comment to the current user and, if nested, the parent task
-        task_id = self.kwargs.get('task_pk')
-        serializer.save(user=self.request.user, task_id=task_id)
+        # Assign the comment to the current user and the parent task, which
+        # must be one the caller can see (TaskViewSet.get_queryset); 404 otherwise
+        tasks = filter_visible(Task.objects.only("id", "project_id", "assigned_to_id"), self.request,
+                               "project__", "assigned_to_id")
+        task = get_object_or_404(tasks, pk=self.kwargs.get('task_pk'))
+        serializer.save(user=self.request.user, task=task)
 
     # Success‑message wrappers:
     def create(self, request, *args, **kwargs):
@@ -300,3 +568,44 @@ class CommentViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         super().destroy(request, *args, **kwargs)
         return Response({"message": "Comment deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
+
+
+def deletion_accepted(message, deletion, request):
+    """202 for a queued deletion, pointing at its status endpoint."""
+    url = request.build_absolute_uri(reverse("deletions-detail", args=[deletion.pk]))
+    return Response({
+        "message": message,
+        "data": {**DeletionSerializer(deletion).data, "status_url": url},
+    }, status=status.HTTP_202_ACCEPTED, headers={"Location": url})
+
+
+class DeletionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    • list     /deletions/        deletions you requested (all, for superusers)
+    • retrieve /deletions/<id>/   status and per-table progress of one
+    """
+    serializer_class = DeletionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = Deletion.objects.order_by("-id")
+        return qs if self.request.user.is_superuser else qs.filter(requested_by=self.request.user)
+
+
+class InboxViewSet(QueryBudgetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    • list /me/inbox/   tasks assigned to you and others' comments on them, newest first
+
+    A single indexed range read of the precomputed InboxItem rows
+    (task_app/inbox.py), cursor-paginated like the task lists.
+    """
+    serializer_class = InboxItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    filter_backends = []
+    query_budget = {"list": 3}
+
+    def get_queryset(self):
+        # Entries outlive a lost membership until it is cleaned up; show what the task list would
+        items = InboxItem.objects.filter(user_id=self.request.user.pk, project__deleted_at__isnull=True)
+        return filter_visible(items, self.request, "project__", "task__assigned_to_id").select_related("task", "comment")
@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup; Django itself does not speak WebSocket, so those
+# connections go straight to the change feed (task_app.async_views).
+from task_app.async_views import feed_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await feed_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -14,6 +14,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,14 +46,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     "rest_framework_simplejwt",
+    "django_filters",
     "task_app",
     "task",
 ]
 
 MIDDLEWARE = [
+    'task_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'task_app.db_routers.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -82,14 +86,144 @@ WSGI_APPLICATION = 'task_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_ENGINE selects the profile:
+#   sqlite    single file at SQLITE_PATH (default); SQLITE_WAL=1 switches it to
+#             WAL mode so readers no longer block on the single writer
+#   postgres  POSTGRES_* below, persistent connections with health checks, or
+#             a psycopg connection pool with DB_POOL=1 (needs psycopg[pool])
+# DB_REPLICAS is a comma-separated list of read replicas: hosts for postgres,
+# file paths for sqlite (opened read-only; the primary's own path works too).
+# SAFE_METHODS requests read from them via task_app.db_routers.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+DB_REPLICAS = [name for name in os.environ.get("DB_REPLICAS", "").split(",") if name]
+
+
+def _sqlite_database(path, read_only=False):
+    database = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': f"file:{path}?mode=ro" if read_only else path,
+        'OPTIONS': {},
+    }
+    if os.environ.get("SQLITE_WAL") == "1":
+        database['OPTIONS'] = {
+            'init_command': (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA busy_timeout=5000;"
+            ),
+            # Take the write lock up front instead of failing on upgrade
+            'transaction_mode': 'IMMEDIATE',
+        }
+    return database
+
+
+def _postgres_database(host):
+    host, _, port = host.partition(":")
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get("POSTGRES_DB", "task_project"),
+        'USER': os.environ.get("POSTGRES_USER", "postgres"),
+        'PASSWORD': os.environ.get("POSTGRES_PASSWORD", ""),
+        'HOST': host,
+        'PORT': port or os.environ.get("POSTGRES_PORT", "5432"),
+        'CONN_MAX_AGE': int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
+    if os.environ.get("DB_POOL") == "1":
+        # Django's pool replaces persistent connections; the two can't be combined
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get("DB_POOL_MIN", "2")),
+            'max_size': int(os.environ.get("DB_POOL_MAX", "10")),
+            'timeout': int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+    return database
+
+
+if DB_ENGINE == "postgres":
+    DATABASES = {'default': _postgres_database(os.environ.get("POSTGRES_HOST", "localhost"))}
+    _replica = _postgres_database
+else:
+    DATABASES = {'default': _sqlite_database(os.environ.get("SQLITE_PATH", str(BASE_DIR / 'db.sqlite3')))}
+    _replica = lambda path: _sqlite_database(path, read_only=True)
+
+for _index, _name in enumerate(DB_REPLICAS, start=1):
+    DATABASES[f"replica{_index}"] = {**_replica(_name), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['task_app.db_routers.PrimaryReplicaRouter']
+
+DATABASE_ROUTING = {
+    "REPLICAS": [alias for alias in DATABASES if alias != "default"],
+    "PIN_SECONDS": 5,       # keep a client on the primary this long after it writes
+    "CACHE_ALIAS": "api",   # pins; must be shared by all workers (task_app.E003)
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# API_CACHE_BACKEND picks where cached list responses live: "locmem" (per
+# process), "file" (shared by workers on one host) or "redis" (any
+# Redis-protocol server at REDIS_URL; needs the redis package).
+
+API_CACHE_BACKEND = os.environ.get("API_CACHE_BACKEND", "locmem")
+
+API_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("API_CACHE_DIR", os.path.join(tempfile.gettempdir(), "task_project_api_cache")),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "api": API_CACHE_BACKENDS[API_CACHE_BACKEND],
+}
+
+# Response cache for project/task list endpoints (task_app.caching)
+API_CACHE = {
+    "ENABLED": os.environ.get("API_CACHE_ENABLED", "1") == "1",
+    "ALIAS": "api",
+    "TIMEOUT": 300,
 }
 
 
+# Password hashing (task_app.hashers).  PASSWORD_HASHER picks the hasher
+# for new passwords; the others stay listed so existing hashes verify and
+# are upgraded on the next successful login.  Tune the cost with
+# `manage.py benchmark_hashers` against the login latency budget.
+PASSWORD_HASHING = {
+    "ALGORITHM": os.environ.get("PASSWORD_HASHER", "scrypt"),
+    "ARGON2": {"TIME_COST": 2, "MEMORY_COST": 19456, "PARALLELISM": 1},    # argon2id, 19 MiB
+    "SCRYPT": {"WORK_FACTOR": 2**14, "BLOCK_SIZE": 8, "PARALLELISM": 1},    # 16 MiB
+    "BCRYPT": {"ROUNDS": 12},
+    "PBKDF2": {"ITERATIONS": 600000},
+}
+
+PASSWORD_HASHER_CLASSES = {
+    "argon2": "task_app.hashers.Argon2PasswordHasher",
+    "scrypt": "task_app.hashers.ScryptPasswordHasher",
+    "bcrypt": "task_app.hashers.BCryptSHA256PasswordHasher",
+    "pbkdf2": "task_app.hashers.PBKDF2PasswordHasher",
+}
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHING["ALGORITHM"]]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHING["ALGORITHM"]
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -110,12 +244,22 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "task_app.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "task_app.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "task_app.throttling.ActionThrottle",
+    ),
+    # Client IPs (throttling) trust this many proxies' X-Forwarded-For
+    # entries; 0 uses REMOTE_ADDR alone, so clients cannot forge their address.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 SIMPLE_JWT = {
@@ -125,6 +269,129 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': False,
 }
 
+# Per-user {project_id: role} cache used by task_app.membership
+MEMBERSHIP_CACHE = {
+    "MAXSIZE": 10000,   # users kept in the process-local LRU
+    "TTL": 60,          # seconds before a user's roles are reloaded
+    # Lists are scoped with "project IN (<cached ids>)"; past this many
+    # projects, with subqueries instead (task_app.membership.filter_visible)
+    "INLINE_PROJECTS": 1000,
+}
+
+# Stateless fast path for JWT auth (task_app.authentication).  A User change
+# refreshes the claim stamp only in the cache of the process that made it;
+# other workers re-check the user row once their copy expires, so
+# STAMP_TIMEOUT bounds how long a demoted or deactivated user keeps their
+# old rights there (as MEMBERSHIP_CACHE["TTL"] does for project roles).
+JWT_FAST_PATH = {
+    "CACHE_ALIAS": "api",
+    "STAMP_TIMEOUT": int(os.environ.get("JWT_STAMP_TIMEOUT", 60)),
+}
+
+# Opt-in fast mode: with FAST_SERIALIZATION_ENABLED=1 list endpoints serialize
+# .values() rows directly (task_app.fast_serializers) and FastJSONRenderer
+# encodes with orjson.  The output is identical; off, both are plain DRF.
+FAST_SERIALIZATION = {
+    "ENABLED": os.environ.get("FAST_SERIALIZATION_ENABLED", "0") == "1",
+}
+
+# Change feed (task_app.feed).  The in-process broker only reaches clients
+# connected to the same worker; with several workers use
+#   "BROKER": "task_app.feed.RedisBroker",
+#   "OPTIONS": {"url": "redis://127.0.0.1:6379/0", "history": 1000},
+CHANGE_FEED = {
+    "ENABLED": os.environ.get("CHANGE_FEED_ENABLED", "1") == "1",
+    "BROKER": os.environ.get("CHANGE_FEED_BROKER", "task_app.feed.InProcessBroker"),
+    "OPTIONS": {"history": 1000},
+}
+
+# Token-bucket throttling (task_app.throttling).  A rate is "count/period"
+# (s, min, hour, day), optionally {"RATE": ..., "BURST": n} for a bucket
+# larger than one period's worth.  Views pick scopes per action with
+# `throttle_scopes`; login and register draw from a per-IP and a
+# per-email bucket.  THROTTLE_STORE "cache" keeps the buckets in the "api"
+# cache, per process on locmem, so every worker would allow the full rate.
+# Outside DEBUG the default is "redis" (REDIS_URL), which checks every bucket
+# of a request in one atomic round trip; `check --deploy` reports a store
+# that is not shared.
+THROTTLE_STORE = os.environ.get("THROTTLE_STORE", "cache" if DEBUG else "redis")
+
+THROTTLE_STORES = {
+    "cache": ("task_app.throttling.CacheBucketStore", {"alias": "api"}),
+    "redis": ("task_app.throttling.RedisBucketStore", {"url": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/1")}),
+}
+
+THROTTLING = {
+    "ENABLED": os.environ.get("THROTTLING_ENABLED", "1") == "1",
+    "STORE": THROTTLE_STORES[THROTTLE_STORE][0],
+    "OPTIONS": THROTTLE_STORES[THROTTLE_STORE][1],
+    "RATES": {
+        "anon": "60/min",
+        "user": {"RATE": "1200/min", "BURST": 300},
+        "bulk": "30/min",
+        "export": "10/min",
+        "sync": "120/min",
+        "login_ip": {"RATE": "30/min", "BURST": 10},
+        "login_email": {"RATE": "10/min", "BURST": 5},
+        "register_ip": "10/hour",
+        "register_email": "3/hour",
+    },
+}
+
+# Background jobs (task_app.jobs, `manage.py runworker`).  Failed jobs retry
+# after BACKOFF_BASE * 2**(attempt - 1) seconds, capped at BACKOFF_MAX; a job
+# held longer than LOCK_TIMEOUT is assumed lost with its worker and requeued.
+JOBS = {
+    "CONCURRENCY": int(os.environ.get("WORKER_CONCURRENCY", os.cpu_count() or 1)),
+    "POLL_INTERVAL": 1.0,
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_BASE": 10,
+    "BACKOFF_MAX": 3600,
+    "LOCK_TIMEOUT": 1800,
+}
+
+# Assignment, comment and overdue notices, sent by the worker
+NOTIFICATIONS = {
+    "ENABLED": os.environ.get("NOTIFICATIONS_ENABLED", "1") == "1",
+    "OVERDUE_SWEEP_INTERVAL": 300,
+}
+
+# Batched project purges (task_app.deletion)
+DELETION = {
+    "BATCH_SIZE": 1000,
+}
+
+# Per-user "my work" inbox (task_app.inbox, /api/me/inbox/): older entries
+# beyond MAX_ITEMS are evicted as new ones arrive
+INBOX = {
+    "MAX_ITEMS": 500,
+}
+
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "tasks@localhost")
+
+# Per-route latency/query histograms (task_app.metrics), scraped at /metrics
+# in the Prometheus text format; each process reports its own.  Scrapers
+# send "Authorization: Bearer <METRICS_TOKEN>"; without a token /metrics is
+# open under DEBUG and answers 404 otherwise.  PROFILE
+# lets superusers add ?_profile=1 to a request to get its cProfile and SQL
+# breakdown instead of the response.
+METRICS = {
+    "ENABLED": os.environ.get("METRICS_ENABLED", "1") == "1",
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+    "PROFILE": os.environ.get("METRICS_PROFILE", "1") == "1",
+    "PROFILE_LIMIT": 40,    # functions listed in a profile
+}
+
+# Per-action query budgets on the viewsets (task_app.query_budget): a
+# request over budget logs a warning.  With QUERY_BUDGET_STRICT=1 (use it in
+# development and CI) reads raise QueryBudgetExceeded and writes, already
+# committed, log an error.
+QUERY_BUDGET = {
+    "ENABLED": os.environ.get("QUERY_BUDGET_ENABLED", "1") == "1",
+    "STRICT": os.environ.get("QUERY_BUDGET_STRICT", "0") == "1",
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from task_app.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('task.urls')),
     path('api/', include('task_app.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]